@@ -1,19 +1,21 @@
-import os
-from google import genai
 from .state import AgentState
+from .clients import get_genai_client
+from .resilience import get_policy, CircuitOpen
+from .telemetry import FALLBACKS
 
-def analyst_node(state: AgentState) -> AgentState:
-    print("--- [Agent 4] Analyst: Generating Insights ---")
-    
+ANALYST_MODEL = "gemini-2.0-flash"
+
+def _build_prompt(state: AgentState):
+    """Returns (prompt, best_code, highest_runs), or None when there is nothing to analyse."""
     res = state.get("final_results", {})
     mappings = state.get("player_mappings", {})
     scores = state.get("match_scores", {})
-    
-    if not res or "error" in res: return state
+
+    if not res or "error" in res: return None
 
     winner = res["winner"]
     winner_codes = mappings.get(winner, [])
-    
+
     # Find MVP
     best_code = None
     highest_runs = -1
@@ -22,23 +24,55 @@ def analyst_node(state: AgentState) -> AgentState:
         if runs > highest_runs:
             highest_runs = runs
             best_code = code
-            
-    client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
-    
+
     prompt = f"""
     You are a Cricket Data Analyst.
     Winner: {winner} (Codes: {winner_codes}).
     Best Performer: {best_code} ({highest_runs} runs).
     Write a ONE sentence summary of why they won.
     """
-    
+    return prompt, best_code, highest_runs
+
+def _fallback(e: Exception):
+    print(f"⚠️ Analyst falling back: {e}")
+    FALLBACKS.inc(stage="analyst", reason="circuit_open" if isinstance(e, CircuitOpen) else "error")
+
+def analyst_node(state: AgentState) -> AgentState:
+    print("--- [Agent 4] Analyst: Generating Insights ---")
+
+    built = _build_prompt(state)
+    if built is None: return state
+    prompt, best_code, highest_runs = built
+
+    try:
+        client = get_genai_client()
+        response = get_policy("gemini").call(lambda: client.models.generate_content(
+            model=ANALYST_MODEL,
+            contents=prompt
+        ))
+        state["final_results"]["analysis"] = response.text.strip()
+    except Exception as e:
+        _fallback(e)
+        state["final_results"]["analysis"] = f"Led by {best_code} ({highest_runs} runs)."
+
+    return state
+
+async def analyst_node_async(state: AgentState) -> AgentState:
+    print("--- [Agent 4] Analyst: Generating Insights (async) ---")
+
+    built = _build_prompt(state)
+    if built is None: return state
+    prompt, best_code, highest_runs = built
+
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash",
+        client = get_genai_client()
+        response = await get_policy("gemini").acall(lambda: client.aio.models.generate_content(
+            model=ANALYST_MODEL,
             contents=prompt
-        )
+        ))
         state["final_results"]["analysis"] = response.text.strip()
     except Exception as e:
+        _fallback(e)
         state["final_results"]["analysis"] = f"Led by {best_code} ({highest_runs} runs)."
 
-    return state
\ No newline at end of file
+    return state
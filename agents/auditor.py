@@ -1,26 +1,16 @@
 from .state import AgentState
 
-def auditor_node(state: AgentState) -> AgentState:
-    print("--- [Step 3] Auditor: Calculating ---")
-    
-    if state.get("final_results") and "error" in state["final_results"]:
-        return state
-
-    mappings = state.get("player_mappings", {})
-    scores = state.get("match_scores", {})
-    
-    if not mappings or not scores:
-        state["final_results"] = {"error": "Missing data."}
-        return state
-
+def build_leaderboard(mappings: dict, scores: dict) -> dict:
     leaderboard = {}
     for player, codes in mappings.items():
         total = sum(scores.get(code, 0) for code in codes)
         leaderboard[player] = total
+    return leaderboard
 
+def settle_leaderboard(leaderboard: dict) -> dict:
+    """Winner takes (winner_score - score) / 5 GBP from everyone else."""
     if not leaderboard:
-        state["final_results"] = {"error": "Leaderboard empty."}
-        return state
+        return {"error": "Leaderboard empty."}
 
     winner_name = max(leaderboard, key=leaderboard.get)
     winner_score = leaderboard[winner_name]
@@ -35,11 +25,26 @@ def auditor_node(state: AgentState) -> AgentState:
             settlements[player] = amount
             total_pot += amount
 
-    state["final_results"] = {
+    return {
         "leaderboard": leaderboard,
         "winner": winner_name,
         "winner_score": winner_score,
         "settlements": settlements,
         "total_pot_gbp": round(total_pot, 2)
     }
-    return state
\ No newline at end of file
+
+def auditor_node(state: AgentState) -> AgentState:
+    print("--- [Step 3] Auditor: Calculating ---")
+    
+    if state.get("final_results") and "error" in state["final_results"]:
+        return state
+
+    mappings = state.get("player_mappings", {})
+    scores = state.get("match_scores", {})
+    
+    if not mappings or not scores:
+        state["final_results"] = {"error": "Missing data."}
+        return state
+
+    state["final_results"] = settle_leaderboard(build_leaderboard(mappings, scores))
+    return state
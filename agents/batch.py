@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+import contextlib
+from .state import AgentState
+from .vision import vision_node_async, state_cache_key
+from .scraper import scraper_node_async, resolve_commentary
+from .auditor import auditor_node
+from .preprocess import preprocess_images_async
+from .workflow import run_stage, run_intelligence_layer_async
+from .telemetry import span
+
+# --- Batch Settlement ---
+# Many leagues usually bet on the same few matches. Everything that can be shared is done once:
+# one scrape per (match_url, commentary_url), one vision call per distinct screenshot set,
+# one auditor pass over every league. Only the per-league intelligence layer scales with leagues.
+
+def new_league_state(match_url: str, commentary_url: str, image_bytes, mime_types, digests=None) -> AgentState:
+    return {
+        "image_bytes": image_bytes,
+        "image_mime_types": mime_types,
+        "image_digests": digests or [],
+        "match_url": match_url,
+        "commentary_url": commentary_url,
+        "player_mappings": {},
+        "match_scores": {},
+        "match_commentary": [],
+        "final_results": {}
+    }
+
+def _match_key(state: AgentState):
+    return state["match_url"], state["commentary_url"]
+
+def _screenshot_key(state: AgentState):
+    return state_cache_key(state)
+
+def batch_plan(states) -> dict:
+    """How much shared work a batch needs, e.g. for logging or the API response."""
+    return {
+        "leagues": len(states),
+        "unique_matches": len({_match_key(s) for s in states}),
+        "unique_screenshot_sets": len({_screenshot_key(s) for s in states}),
+    }
+
+async def _scrape_matches(states):
+    """One scraper run per distinct match. Returns {match_key: scraped state}."""
+    keys = list(dict.fromkeys(_match_key(s) for s in states))
+
+    async def scrape(match_url, commentary_url):
+        state = await run_stage("scraper", scraper_node_async, new_league_state(match_url, commentary_url, [], []))
+        # Every league's commentator reads it, so wait for the commentary once here.
+        return await resolve_commentary(state)
+
+    scraped = await asyncio.gather(*[scrape(*key) for key in keys])
+    return dict(zip(keys, scraped))
+
+async def _extract_mappings(states):
+    """One vision run per distinct screenshot set; the stage limit bounds how many run at once."""
+    groups = {}
+    for state in states:
+        groups.setdefault(_screenshot_key(state), []).append(state)
+
+    leaders = [group[0] for group in groups.values()]
+    await asyncio.gather(*[run_stage("vision", vision_node_async, state) for state in leaders])
+
+    for group in groups.values():
+        leader = group[0]
+        for state in group[1:]:
+            state["image_bytes"] = []
+            if "error" in (leader.get("final_results") or {}):
+                state["final_results"] = dict(leader["final_results"])
+            else:
+                state["player_mappings"] = {p: list(codes) for p, codes in leader["player_mappings"].items()}
+
+def audit_leagues(states, scraped):
+    """Single pass of the auditor over every league that made it through vision."""
+    with span("batch.auditor"):
+        for state in states:
+            if "error" in (state.get("final_results") or {}):
+                continue
+            match = scraped[_match_key(state)]
+            if "error" in (match.get("final_results") or {}):
+                state["final_results"] = dict(match["final_results"])
+                continue
+            state["match_scores"] = match["match_scores"]
+            state["match_commentary"] = match["match_commentary"]
+            auditor_node(state)
+
+async def run_batch_async(states, intelligence: bool = True):
+    """
+    Settles every league state. Async generator of (index, final_state), yielded as each
+    league finishes, so callers can stream results instead of waiting for the slowest one.
+    """
+    # Scrapes and vision calls don't depend on each other; overlap them.
+    scraped, _ = await asyncio.gather(_scrape_matches(states), _extract_mappings(states))
+    audit_leagues(states, scraped)
+
+    async def finish(index, state):
+        if intelligence and "error" not in (state.get("final_results") or {}):
+            try:
+                state = await run_intelligence_layer_async(state)
+            except Exception as e:
+                print(f"❌ Intelligence layer failed for league {index}: {e}")
+        return index, state
+
+    for next_done in asyncio.as_completed([finish(i, s) for i, s in enumerate(states)]):
+        yield await next_done
+
+# --- CLI ---
+# python -m agents.batch leagues.json [--out results.jsonl] [--no-intelligence]
+# leagues.json: [{"league": "Office", "match_url": ..., "commentary_url": ..., "images": ["office.jpg"]}, ...]
+# Image paths are relative to the manifest. Prints one JSON line per league as it settles.
+
+def _result_line(entry: dict, state: AgentState) -> dict:
+    res = state.get("final_results") or {}
+    line = {"league": entry.get("league"), "match_url": state["match_url"]}
+    if "error" in res:
+        line.update(status="error", error=res["error"])
+    else:
+        line.update(status="success", data={
+            **res,
+            "player_mappings": state.get("player_mappings"),
+            "detailed_scores": state.get("match_scores"),
+        })
+    return line
+
+async def _settle_manifest(manifest_path: str, out, intelligence: bool):
+    base = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path) as f:
+        entries = json.load(f)
+
+    states = []
+    for entry in entries:
+        images = []
+        for path in entry["images"]:
+            with open(os.path.join(base, path), "rb") as img:
+                images.append(img.read())
+        images, mime_types, _ = await preprocess_images_async(images)
+        states.append(new_league_state(entry["match_url"], entry.get("commentary_url", entry["match_url"]), images, mime_types))
+
+    print(f"📦 Batch plan: {batch_plan(states)}", file=sys.stderr)
+    async for index, state in run_batch_async(states, intelligence=intelligence):
+        out.write(json.dumps(_result_line(entries[index], state)) + "\n")
+        out.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Settle many leagues against their matches in one run.")
+    parser.add_argument("manifest", help="JSON list of leagues: league, match_url, commentary_url, images")
+    parser.add_argument("--out", help="Write JSON lines here instead of stdout")
+    parser.add_argument("--no-intelligence", action="store_true", help="Skip analyst, forecaster and commentator")
+    args = parser.parse_args(argv)
+
+    out = open(args.out, "w") if args.out else sys.stdout
+    try:
+        # The agents log with print(); keep stdout clean for the JSON lines.
+        with contextlib.redirect_stdout(sys.stderr):
+            asyncio.run(_settle_manifest(args.manifest, out, not args.no_intelligence))
+    finally:
+        if args.out:
+            out.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import os
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, InvalidStateError
+from .clients import get_vertex_endpoint
+from .resilience import get_policy
+from .telemetry import BATCH_SIZE, BATCH_FILL
+
+# --- Micro-Batching ---
+# Concurrent workflows each want one Gemma completion. The Vertex endpoint takes a list of
+# instances per predict call, so instead of N single-instance calls we hold prompts for up to
+# max_delay (or until max_size are waiting), send one predict, and hand each caller its own
+# prediction. While every in-flight slot is busy, prompts keep collecting, so batches fill up
+# exactly when the endpoint is the bottleneck.
+
+VERTEX_BATCH_MAX_SIZE = int(os.getenv("VERTEX_BATCH_MAX_SIZE", "8"))
+VERTEX_BATCH_MAX_DELAY = float(os.getenv("VERTEX_BATCH_MAX_DELAY_MS", "5")) / 1000
+VERTEX_BATCH_MAX_INFLIGHT = int(os.getenv("VERTEX_BATCH_MAX_INFLIGHT", "4"))
+
+class MicroBatcher:
+    """
+    submit(item) from any thread returns a concurrent Future (await it with asyncio.wrap_future).
+    fn(items) must return one result per item, in order; if it raises, every caller in that batch gets the error.
+    """
+
+    def __init__(self, name: str, fn, max_size: int = 8, max_delay: float = 0.005, max_inflight: int = 4):
+        self.name = name
+        self.fn = fn
+        self.max_size = max(1, max_size)
+        self.max_delay = max_delay
+        self.max_inflight = max(1, max_inflight)
+
+        self._cond = threading.Condition()
+        self._pending = []   # (item, future, submitted_at)
+        self._slots = threading.BoundedSemaphore(self.max_inflight)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_inflight, thread_name_prefix=f"{name}-batch")
+        self._thread = None
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self._stats = {"submitted": 0, "batches": 0, "items": 0, "flushed_full": 0, "flushed_on_delay": 0,
+                       "failed_batches": 0, "inflight": 0}
+
+    def submit(self, item) -> Future:
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name} batcher is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._collect, name=f"{self.name}-batcher", daemon=True)
+                self._thread.start()
+            self._pending.append((item, future, time.monotonic()))
+            self._cond.notify()
+        with self._stats_lock:
+            self._stats["submitted"] += 1
+        return future
+
+    # --- Collector ---
+
+    def _wait_for_batch(self) -> bool:
+        """Blocks until max_size items are waiting or the oldest has waited max_delay. False once closed and drained."""
+        with self._cond:
+            while not self._pending:
+                if self._closed:
+                    return False
+                self._cond.wait()
+            deadline = self._pending[0][2] + self.max_delay
+            while len(self._pending) < self.max_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return True
+
+    def _collect(self):
+        while self._wait_for_batch():
+            # Hold the batch open until the endpoint has room; anything arriving meanwhile rides along.
+            self._slots.acquire()
+            with self._cond:
+                batch, self._pending = self._pending[:self.max_size], self._pending[self.max_size:]
+            # Callers that gave up (cancelled futures) don't get a slot in the batch.
+            batch = [(item, future) for item, future, _ in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                self._slots.release()
+                continue
+            self._record(len(batch))
+            self._pool.submit(self._flush, batch)
+
+    def _flush(self, batch):
+        try:
+            results = self.fn([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"{self.name}: got {len(results)} results for a batch of {len(batch)}")
+        except BaseException as e:
+            with self._stats_lock:
+                self._stats["failed_batches"] += 1
+            for _, future in batch:
+                self._settle(future.set_exception, e)
+        else:
+            for (_, future), result in zip(batch, results):
+                self._settle(future.set_result, result)
+        finally:
+            with self._stats_lock:
+                self._stats["inflight"] -= 1
+            self._slots.release()
+
+    @staticmethod
+    def _settle(setter, value):
+        try:
+            setter(value)
+        except InvalidStateError:
+            pass
+
+    # --- Metrics ---
+
+    def _record(self, size: int):
+        full = size >= self.max_size
+        BATCH_SIZE.observe(size, batcher=self.name, trigger="size" if full else "delay")
+        BATCH_FILL.observe(size / self.max_size, batcher=self.name)
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["items"] += size
+            self._stats["inflight"] += 1
+            self._stats["flushed_full" if full else "flushed_on_delay"] += 1
+
+    def stats(self):
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        with self._cond:
+            snapshot["pending"] = len(self._pending)
+        batches = snapshot["batches"]
+        snapshot["avg_batch_size"] = round(snapshot["items"] / batches, 2) if batches else 0.0
+        snapshot["fill_rate"] = round(snapshot["items"] / (batches * self.max_size), 3) if batches else 0.0
+        snapshot["max_size"] = self.max_size
+        snapshot["max_delay_ms"] = self.max_delay * 1000
+        snapshot["max_inflight"] = self.max_inflight
+        return snapshot
+
+    def close(self):
+        """Flushes whatever is still waiting, then stops the collector."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout=5)
+        self._pool.shutdown(wait=True)
+
+# --- Vertex AI (Gemma commentator) ---
+
+def _vertex_predict(endpoint_id: str):
+    def predict(instances):
+        # One policy call per batch: one deadline, one breaker outcome, hedged as a whole.
+        response = get_policy("vertex").call(lambda: get_vertex_endpoint(endpoint_id).predict(instances=instances))
+        return list(response.predictions)
+    return predict
+
+_vertex_batchers = {}
+_vertex_batchers_lock = threading.Lock()
+
+def get_vertex_batcher(endpoint_id: str = None) -> MicroBatcher:
+    endpoint_id = endpoint_id or os.getenv("VERTEX_ENDPOINT_ID")
+    with _vertex_batchers_lock:
+        if endpoint_id not in _vertex_batchers:
+            _vertex_batchers[endpoint_id] = MicroBatcher(
+                "vertex",
+                _vertex_predict(endpoint_id),
+                max_size=VERTEX_BATCH_MAX_SIZE,
+                max_delay=VERTEX_BATCH_MAX_DELAY,
+                max_inflight=VERTEX_BATCH_MAX_INFLIGHT,
+            )
+        return _vertex_batchers[endpoint_id]
+
+def set_vertex_batcher(endpoint_id: str, batcher):
+    """Swap in another batcher (e.g. in tests). Pass None to rebuild it from the environment."""
+    with _vertex_batchers_lock:
+        previous = _vertex_batchers.pop(endpoint_id, None)
+        if batcher is not None:
+            _vertex_batchers[endpoint_id] = batcher
+    if previous is not None and previous is not batcher:
+        previous.close()
+
+def vertex_batch_stats() -> dict:
+    """Stats for the configured endpoint's batcher; empty until the first commentary is requested."""
+    with _vertex_batchers_lock:
+        batcher = _vertex_batchers.get(os.getenv("VERTEX_ENDPOINT_ID"))
+    return batcher.stats() if batcher is not None else {}
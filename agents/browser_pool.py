@@ -0,0 +1,239 @@
+import os
+import time
+import atexit
+import asyncio
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
+from .telemetry import STAGE_DURATION
+
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"
+STEALTH_SCRIPT = "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+
+class _ContextSlot:
+    def __init__(self, context):
+        self.context = context
+        self.uses = 0
+
+class BrowserPool:
+    """
+    One long-lived Chromium shared by every scrape.
+
+    Playwright objects are bound to the event loop that created them, so the pool
+    owns a private loop on a background thread. Sync callers use run(), async
+    callers use arun(); both hand a fresh page to the job and return its result.
+    """
+
+    def __init__(self, max_concurrency=None, headless=None, max_uses=None):
+        self.max_concurrency = max_concurrency or int(os.getenv("BROWSER_POOL_SIZE", "4"))
+        if headless is None:
+            headless = os.getenv("BROWSER_HEADLESS", "false").lower() in ("1", "true", "yes")
+        self.headless = headless
+        self.max_uses = max_uses or int(os.getenv("BROWSER_CONTEXT_MAX_USES", "25"))
+
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._playwright = None
+        self._browser = None
+        self._browser_lock = None
+        self._semaphore = None
+        self._idle = []
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "jobs": 0,
+            "failed_jobs": 0,
+            "in_use": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+            "browser_launches": 0,
+            "contexts_created": 0,
+            "contexts_recycled": 0,
+        }
+
+    # --- Lifecycle ---
+
+    def start(self):
+        self._ensure_loop()
+        # Warm the browser up front; if this fails, the next job retries the launch.
+        asyncio.run_coroutine_threadsafe(self._ensure_browser(), self._loop).result()
+
+    def _ensure_loop(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+            self._thread.start()
+            asyncio.run_coroutine_threadsafe(self._start_primitives(), self._loop).result()
+
+    async def _start_primitives(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._browser_lock = asyncio.Lock()
+
+    def close(self):
+        with self._start_lock:
+            if self._thread is None:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._close(), self._loop).result(timeout=30)
+            except Exception as e:
+                print(f"⚠️ Browser pool shutdown error: {e}")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    async def _close(self):
+        for slot in self._idle:
+            await self._discard(slot)
+        self._idle.clear()
+        if self._browser is not None:
+            await self._browser.close()
+            self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    # --- Browser & contexts ---
+
+    async def _ensure_browser(self):
+        async with self._browser_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            if self._playwright is None:
+                # Imported here so processes that never scrape (or scrape via workers) never load it.
+                from playwright.async_api import async_playwright
+                self._playwright = await async_playwright().start()
+            # A dead browser takes its contexts with it.
+            self._idle.clear()
+            self._browser = await self._playwright.chromium.launch(
+                headless=self.headless,
+                args=["--disable-blink-features=AutomationControlled"]
+            )
+            self._bump("browser_launches")
+
+    async def _acquire_context(self):
+        await self._ensure_browser()
+        while self._idle:
+            slot = self._idle.pop()
+            if slot.uses < self.max_uses:
+                return slot
+            await self._discard(slot)
+
+        context = await self._browser.new_context(
+            user_agent=USER_AGENT,
+            viewport={"width": 1280, "height": 720}
+        )
+        await context.add_init_script(STEALTH_SCRIPT)
+        self._bump("contexts_created")
+        return _ContextSlot(context)
+
+    async def _release_context(self, slot, healthy):
+        slot.uses += 1
+        browser_alive = self._browser is not None and self._browser.is_connected()
+        if healthy and browser_alive and slot.uses < self.max_uses:
+            self._idle.append(slot)
+        else:
+            await self._discard(slot)
+
+    async def _discard(self, slot):
+        self._bump("contexts_recycled")
+        try:
+            await slot.context.close()
+        except Exception:
+            pass
+
+    # --- Jobs ---
+
+    async def _run(self, job, submitted_at):
+        async with self._semaphore:
+            self._record_wait(time.monotonic() - submitted_at)
+            self._bump("in_use")
+            slot = page = None
+            healthy = True
+            try:
+                # Launching the browser, opening a context or a page can fail too; the slot is still given back.
+                slot = await self._acquire_context()
+                page = await slot.context.new_page()
+                return await job(page)
+            except Exception:
+                # Don't hand a context that just failed to the next request.
+                healthy = False
+                self._bump("failed_jobs")
+                raise
+            finally:
+                if page is not None:
+                    try:
+                        await page.close()
+                    except Exception:
+                        healthy = False
+                if slot is not None:
+                    await self._release_context(slot, healthy)
+                self._bump("in_use", -1)
+
+    def run(self, job, timeout: float = None):
+        """Runs `await job(page)` on the pool and blocks until it returns (or cancels it after timeout)."""
+        self._ensure_loop()
+        future = asyncio.run_coroutine_threadsafe(self._run(job, time.monotonic()), self._loop)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            # Cancelling the coroutine closes its page and hands the context back.
+            future.cancel()
+            raise TimeoutError(f"Browser job did not finish within {timeout}s")
+
+    async def arun(self, job):
+        """Async flavour of run() for callers living on another event loop."""
+        if self._thread is None:
+            await asyncio.to_thread(self._ensure_loop)
+        future = asyncio.run_coroutine_threadsafe(self._run(job, time.monotonic()), self._loop)
+        return await asyncio.wrap_future(future)
+
+    # --- Metrics ---
+
+    def _bump(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _record_wait(self, seconds):
+        STAGE_DURATION.observe(seconds, stage="browser_pool.wait", outcome="ok")
+        with self._stats_lock:
+            self._stats["jobs"] += 1
+            self._stats["wait_seconds_total"] += seconds
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], seconds)
+
+    def stats(self):
+        with self._stats_lock:
+            snapshot = dict(self._stats)
+        jobs = snapshot["jobs"]
+        snapshot["wait_seconds_avg"] = round(snapshot["wait_seconds_total"] / jobs, 4) if jobs else 0.0
+        snapshot["max_concurrency"] = self.max_concurrency
+        snapshot["headless"] = self.headless
+        snapshot["running"] = self._thread is not None
+        return snapshot
+
+# --- Process-wide pool ---
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_browser_pool() -> BrowserPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+        return _pool
+
+def start_browser_pool() -> BrowserPool:
+    pool = get_browser_pool()
+    pool.start()
+    return pool
+
+def shutdown_browser_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+atexit.register(shutdown_browser_pool)
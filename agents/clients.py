@@ -0,0 +1,105 @@
+import os
+import time
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from google import genai
+    from google.cloud import aiplatform
+
+# Process-wide SDK clients. Built on first use, then shared by every request,
+# thread and asyncio task so the TLS handshake and client setup happen once.
+# The async side of the genai client pools its connections on the event loop
+# that first uses it, which is the API server's loop.
+#
+# The SDKs themselves are imported on first use too: google.cloud.aiplatform alone takes
+# seconds to import, which every cold start (and every test of pure logic) would otherwise pay.
+# warm_up() pays it ahead of the first request instead.
+
+_lock = threading.Lock()
+_genai_client = None
+_vertex_initialised = set()
+_vertex_endpoints = {}
+
+def _connection_limits():
+    import httpx
+    return httpx.Limits(
+        max_connections=int(os.getenv("GENAI_MAX_CONNECTIONS", "100")),
+        max_keepalive_connections=int(os.getenv("GENAI_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=float(os.getenv("GENAI_KEEPALIVE_EXPIRY", "60")),
+    )
+
+def _http_options():
+    from google.genai import types
+    timeout_ms = os.getenv("GENAI_TIMEOUT_MS")
+    return types.HttpOptions(
+        timeout=int(timeout_ms) if timeout_ms else None,
+        client_args={"limits": _connection_limits()},
+        async_client_args={"limits": _connection_limits()},
+    )
+
+def get_genai_client() -> "genai.Client":
+    global _genai_client
+    if _genai_client is not None:
+        return _genai_client
+    with _lock:
+        if _genai_client is None:
+            from google import genai
+            api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise ValueError("GOOGLE_API_KEY not found in environment.")
+            _genai_client = genai.Client(api_key=api_key, http_options=_http_options())
+        return _genai_client
+
+def get_vertex_endpoint(endpoint_id: str = None) -> "aiplatform.Endpoint":
+    endpoint_id = endpoint_id or os.getenv("VERTEX_ENDPOINT_ID")
+    project = os.getenv("GOOGLE_PROJECT_ID")
+    region = os.getenv("GOOGLE_REGION", "us-central1")
+    key = (project, region, endpoint_id)
+
+    endpoint = _vertex_endpoints.get(key)
+    if endpoint is not None:
+        return endpoint
+    with _lock:
+        if key not in _vertex_endpoints:
+            from google.cloud import aiplatform
+            if (project, region) not in _vertex_initialised:
+                aiplatform.init(project=project, location=region)
+                _vertex_initialised.add((project, region))
+            # Resolving the endpoint is a network round trip; the gRPC channel it opens is kept alive.
+            _vertex_endpoints[key] = aiplatform.Endpoint(endpoint_id)
+        return _vertex_endpoints[key]
+
+def reset_clients():
+    """Drops every cached client, e.g. after rotating credentials."""
+    global _genai_client
+    with _lock:
+        _genai_client = None
+        _vertex_initialised.clear()
+        _vertex_endpoints.clear()
+
+# --- Warm-up ---
+
+# Imported in the background at startup so the first request doesn't pay for them.
+WARM_UP_MODULES = ("google.genai", "google.genai.types", "google.cloud.aiplatform", "httpx")
+
+def warm_up(connect: bool = True) -> dict:
+    """
+    Imports the SDKs and, when connect is set and credentials are configured, builds the genai
+    client and resolves the Vertex endpoint. Returns seconds spent per step; failures are logged, not raised.
+    """
+    import importlib
+    timings = {}
+    steps = [(name, lambda name=name: importlib.import_module(name)) for name in WARM_UP_MODULES]
+    if connect and os.getenv("GOOGLE_API_KEY"):
+        steps.append(("genai_client", get_genai_client))
+    if connect and os.getenv("VERTEX_ENDPOINT_ID"):
+        steps.append(("vertex_endpoint", get_vertex_endpoint))
+    for name, step in steps:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"⚠️ Warm-up of {name} failed: {e}")
+        timings[name] = round(time.perf_counter() - started, 3)
+    return timings
@@ -1,4 +1,6 @@
 from .state import AgentState
+from .form import get_form_book
+from .store import match_id_from_url
 
 def forecaster_node(state: AgentState) -> AgentState:
     print("--- [Agent 5] Forecaster: Identifying Trends ---")
@@ -6,12 +8,7 @@ def forecaster_node(state: AgentState) -> AgentState:
     scores = state.get("match_scores", {})
     if not scores: return state
         
-    mvp_code = max(scores, key=scores.get)
-    mvp_score = scores[mvp_code]
-    
-    state["final_results"]["forecast"] = {
-        "hot_pick": mvp_code,
-        "reason": f"Scored {mvp_score} runs (Match High)",
-        "recommendation": "Buy for next round."
-    }
-    return state
\ No newline at end of file
+    # Reads precomputed rolling form; history is folded in when a finished match is stored.
+    match_id = match_id_from_url(state["match_url"]) if state.get("match_url") else None
+    state["final_results"]["forecast"] = get_form_book().forecast(scores, match_id)
+    return state
@@ -0,0 +1,136 @@
+import os
+import math
+import threading
+from collections import deque
+
+# --- Rolling Form ---
+# Per-position (T1-1, T2-4, ...) statistics over past matches, updated one match at a time.
+# Nothing is ever recomputed from history: ingesting a match touches only the ~22 codes in it,
+# and forecast() reads the precomputed aggregates, so the forecaster stage costs microseconds.
+
+EWMA_ALPHA = float(os.getenv("FORM_EWMA_ALPHA", "0.3"))
+FORM_WINDOW = int(os.getenv("FORM_WINDOW", "5"))
+# How many past matches' worth of weight history can carry against the current match.
+HISTORY_WEIGHT_CAP = float(os.getenv("FORM_HISTORY_WEIGHT_CAP", "4"))
+
+class FormStats:
+    """EWMA mean and variance, plus a plain running mean (Welford) and the last few scores."""
+
+    __slots__ = ("n", "ewma", "ewvar", "mean", "m2", "best", "recent")
+
+    def __init__(self):
+        self.n = 0
+        self.ewma = 0.0
+        self.ewvar = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.best = 0
+        self.recent = deque(maxlen=FORM_WINDOW)
+
+    def update(self, runs: float):
+        self.n += 1
+        if self.n == 1:
+            self.ewma = float(runs)
+        else:
+            diff = runs - self.ewma
+            incr = EWMA_ALPHA * diff
+            self.ewma += incr
+            self.ewvar = (1 - EWMA_ALPHA) * (self.ewvar + diff * incr)
+        delta = runs - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (runs - self.mean)
+        self.best = max(self.best, runs)
+        self.recent.append(runs)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.ewvar)
+
+    def confidence(self) -> float:
+        """0..1: grows with matches seen, shrinks as scores get erratic."""
+        if self.n == 0:
+            return 0.0
+        volatility = self.std / self.ewma if self.ewma > 0 else 1.0
+        return (self.n / (self.n + 2)) / (1 + volatility)
+
+class FormBook:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._ingested = set()
+
+    def ingest(self, match_id: str, scores: dict) -> bool:
+        """Folds one finished match into the aggregates. Returns False if it was already counted."""
+        with self._lock:
+            if match_id in self._ingested:
+                return False
+            self._ingested.add(match_id)
+            for code, runs in scores.items():
+                if isinstance(runs, (int, float)):
+                    self._stats.setdefault(code, FormStats()).update(runs)
+            return True
+
+    def get(self, code: str):
+        return self._stats.get(code)
+
+    def forecast(self, current_scores: dict, match_id: str = None, top: int = 3) -> dict:
+        """
+        Ranks the current match's codes by expected runs: this match's score shrunk towards the
+        position's EWMA, weighted by how much history backs it. With no history it is just the match high.
+        """
+        ranked = []
+        with self._lock:
+            # A re-settled finished match is already in the EWMA; don't count it twice.
+            counted = match_id is not None and match_id in self._ingested
+            for code, runs in current_scores.items():
+                stats = self._stats.get(code)
+                weight = min(stats.n, HISTORY_WEIGHT_CAP) if stats else 0
+                if counted and stats:
+                    expected = stats.ewma
+                elif weight:
+                    expected = (runs + weight * stats.ewma) / (1 + weight)
+                else:
+                    expected = float(runs)
+                ranked.append({
+                    "code": code,
+                    "runs": runs,
+                    "expected": round(expected, 1),
+                    "ewma": round(stats.ewma, 1) if stats else None,
+                    "form": list(stats.recent) if stats else [],
+                    "matches": stats.n if stats else 0,
+                    "confidence": round(stats.confidence(), 2) if stats else 0.0,
+                })
+        ranked.sort(key=lambda r: (r["expected"], r["runs"]), reverse=True)
+
+        best = ranked[0]
+        if best["matches"]:
+            reason = (f"Scored {best['runs']} runs this match, averaging {best['ewma']:.0f} "
+                      f"over {best['matches']} past matches (form: {best['form']})")
+        else:
+            reason = f"Scored {best['runs']} runs (Match High)"
+        return {
+            "hot_pick": best["code"],
+            "reason": reason,
+            "confidence": best["confidence"],
+            "recommendation": "Buy for next round." if best["confidence"] >= 0.5 else "Speculative buy for next round.",
+            "ranked": ranked[:top],
+        }
+
+    def stats(self):
+        with self._lock:
+            return {"matches": len(self._ingested), "codes": len(self._stats)}
+
+_form_book = FormBook()
+
+def get_form_book() -> FormBook:
+    return _form_book
+
+def set_form_book(book):
+    """Swap in another book (e.g. in tests). Pass None for a fresh, empty one."""
+    global _form_book
+    _form_book = book if book is not None else FormBook()
+
+def load_form_history(store, book: FormBook = None) -> int:
+    """Replays finished matches from the results store, oldest first. Returns how many were new."""
+    book = book or get_form_book()
+    return sum(book.ingest(match_id, scores) for match_id, scores in store.finished_matches())
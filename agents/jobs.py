@@ -0,0 +1,106 @@
+import os
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+class Job:
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.created_at = time.time()
+        self.finished_at = None
+        self.events = []
+        self.result = None
+        self.error = None
+        self.task = None
+        self.trace_id = None
+        self._changed = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def publish(self, event: str, data: dict):
+        self.events.append({"event": event, "data": data, "at": time.time()})
+        # Wake every subscriber, then arm a fresh event for the next publish.
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def start(self):
+        self.status = "running"
+        self.publish("status", {"status": self.status})
+
+    def succeed(self, result: dict):
+        self.result = result
+        self.status = "succeeded"
+        self.finished_at = time.time()
+        self.publish("done", {"status": self.status, "result": result})
+
+    def fail(self, error: str, status_code: int = 500):
+        self.error = error
+        self.status = "failed"
+        self.finished_at = time.time()
+        self.publish("done", {"status": self.status, "error": error, "status_code": status_code})
+
+    async def stream(self):
+        """Yields every event from the start, then new ones as they are published, until the job ends."""
+        sent = 0
+        while True:
+            changed = self._changed
+            while sent < len(self.events):
+                yield self.events[sent]
+                sent += 1
+            if self.done:
+                return
+            await changed.wait()
+
+    def snapshot(self) -> dict:
+        return {
+            "job_id": self.id,
+            "trace_id": self.trace_id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "stages": [e["event"] for e in self.events if e["event"] not in ("status", "done")],
+            "partial": {
+                e["event"]: e["data"] for e in self.events if e["event"] not in ("status", "done")
+            },
+            "result": self.result,
+            "error": self.error,
+        }
+
+class JobStore:
+    """In-memory job registry. Finished jobs are kept for JOB_TTL seconds, and at most max_jobs overall."""
+
+    def __init__(self, max_jobs: int = None, ttl: float = None):
+        self.max_jobs = max_jobs or int(os.getenv("MAX_JOBS", "1000"))
+        self.ttl = ttl or float(os.getenv("JOB_TTL", "3600"))
+        self._jobs = OrderedDict()
+
+    def create(self, kind: str = "settlement") -> Job:
+        self._evict()
+        job = Job(kind)
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def _evict(self):
+        now = time.time()
+        for job_id in [j.id for j in self._jobs.values() if j.done and now - j.finished_at > self.ttl]:
+            del self._jobs[job_id]
+        while len(self._jobs) >= self.max_jobs:
+            # Prefer dropping the oldest finished job; never drop a running one.
+            finished = next((j.id for j in self._jobs.values() if j.done), None)
+            if finished is None:
+                break
+            del self._jobs[finished]
+
+    def __len__(self):
+        return len(self._jobs)
@@ -0,0 +1,174 @@
+import heapq
+import numpy as np
+
+# --- Season Ledger ---
+# Array-backed version of auditor_node for many players and many matches at once.
+# Players and codes are indexed once; every match becomes a row of a score matrix, and
+# leaderboards, winners and settlements for all matches come out of a few NumPy ops.
+# Single-match results are identical to auditor_node, ties and float rounding included.
+
+class SeasonLedger:
+    """
+    Result of settle_season. Per-match results are built lazily as auditor-style dicts;
+    balances are kept in integer pence so they never drift across hundreds of matches.
+    """
+
+    def __init__(self, players, match_players, errors, leaderboards, winners, amounts, pots, balance_history):
+        self.players = players                  # global player order (first appearance)
+        self._match_players = match_players     # per match: player indices in mapping order
+        self._errors = errors                   # per match: error message or None
+        self.leaderboards = leaderboards        # matches x players, runs
+        self.winners = winners                  # per match: player index (-1 on error)
+        self.amounts = amounts                  # matches x players, GBP owed to the winner
+        self._pots = pots                       # per match: unrounded pot, summed like auditor_node
+        self.balance_history = balance_history  # matches x players, cumulative pence (+ = owed money)
+
+    def __len__(self):
+        return len(self._errors)
+
+    def match_result(self, m: int) -> dict:
+        """final_results for match m, exactly as auditor_node would produce them."""
+        if self._errors[m]:
+            return {"error": self._errors[m]}
+        order = self._match_players[m]
+        names = [self.players[p] for p in order]
+        runs = self.leaderboards[m, order].tolist()
+        owed = self.amounts[m, order].tolist()
+        winner = self.winners[m]
+        return {
+            "leaderboard": dict(zip(names, runs)),
+            "winner": self.players[winner],
+            "winner_score": self.leaderboards[m, winner].item(),
+            "settlements": {name: amount for p, name, amount in zip(order, names, owed) if p != winner},
+            "total_pot_gbp": round(float(self._pots[m]), 2)
+        }
+
+    @property
+    def results(self):
+        return [self.match_result(m) for m in range(len(self))]
+
+    @property
+    def balances(self) -> dict:
+        """Season-to-date balance per player in GBP. Positive means the player is owed money."""
+        if not len(self):
+            return {}
+        final = self.balance_history[-1]
+        return {name: final[p].item() / 100 for p, name in enumerate(self.players)}
+
+    def transfers(self):
+        return minimise_transfers({name: pence for name, pence in zip(self.players, self.balance_history[-1].tolist())} if len(self) else {}, pence=True)
+
+def settle_match(mappings: dict, scores: dict) -> dict:
+    return settle_season([(mappings, scores)]).match_result(0)
+
+def settle_season(matches) -> SeasonLedger:
+    """matches: iterable of (player_mappings, match_scores), one per match, in season order."""
+    matches = list(matches)
+    n_matches = len(matches)
+
+    # --- Index players and codes once (the only per-entry Python work, kept to comprehensions) ---
+    player_ids, code_ids = {}, {}
+    match_players, errors = [], []
+    entry_match, entry_player, entry_code = [], [], []
+    score_match, score_code, score_value = [], [], []
+
+    for m, (mappings, scores) in enumerate(matches):
+        if not mappings or not scores:
+            match_players.append([])
+            errors.append("Missing data.")
+            continue
+        errors.append(None)
+
+        for player in mappings:
+            if player not in player_ids:
+                player_ids[player] = len(player_ids)
+        flat_codes = [code for codes in mappings.values() for code in codes]
+        for code in set(flat_codes).union(scores):
+            if code not in code_ids:
+                code_ids[code] = len(code_ids)
+
+        order = [player_ids[player] for player in mappings]
+        match_players.append(order)
+        entry_match.append(np.full(len(flat_codes), m, dtype=np.intp))
+        entry_player.append(np.repeat(np.asarray(order, dtype=np.intp), [len(codes) for codes in mappings.values()]))
+        entry_code.append(np.asarray([code_ids[code] for code in flat_codes], dtype=np.intp))
+
+        score_match.extend([m] * len(scores))
+        score_code.extend(code_ids[code] for code in scores)
+        score_value.extend(scores.values())
+
+    players = list(player_ids)
+    # A phantom column keeps the arrays well-formed when every match is missing data.
+    n_players = max(len(players), 1)
+    dtype = np.int64 if all(isinstance(v, (int, np.integer)) for v in score_value) else np.float64
+
+    # Score matrix: matches x codes. Missing codes score 0, like scores.get(code, 0).
+    score_matrix = np.zeros((n_matches, len(code_ids)), dtype=dtype)
+    score_matrix[score_match, score_code] = score_value
+
+    # Leaderboards: scatter-add each (match, player, code) entry's runs. Duplicated codes count twice.
+    leaderboards = np.zeros((n_matches, n_players), dtype=dtype)
+    entry_match, entry_player, entry_code = (
+        np.concatenate(parts) if parts else np.zeros(0, dtype=np.intp)
+        for parts in (entry_match, entry_player, entry_code)
+    )
+    np.add.at(leaderboards, (entry_match, entry_player), score_matrix[entry_match, entry_code])
+
+    # Mapping position of each player per match; non-participants rank past the end.
+    width = max((len(order) for order in match_players), default=0)
+    rank = np.full((n_matches, n_players), width, dtype=np.int64)
+    rank_match = np.repeat(np.arange(n_matches), [len(order) for order in match_players])
+    rank_player = np.asarray([p for order in match_players for p in order], dtype=np.intp)
+    rank[rank_match, rank_player] = np.concatenate([np.arange(len(order)) for order in match_players]) if len(rank_player) else []
+    playing = rank < width
+
+    # Winner: highest total, ties going to whoever comes first in that match's mappings (as max() does).
+    masked = np.where(playing, leaderboards.astype(np.float64), -np.inf)
+    best = masked.max(axis=1, initial=-np.inf)
+    winners = np.argmin(np.where(masked == best[:, None], rank, width + 1), axis=1)
+    valid = np.asarray([e is None for e in errors], dtype=bool)
+    winners = np.where(valid, winners, -1)
+
+    winner_scores = leaderboards[np.arange(n_matches), np.maximum(winners, 0)]
+    diffs = np.where(playing, winner_scores[:, None] - leaderboards, 0)
+    amounts = np.round(diffs / 5, 2)
+
+    # total_pot_gbp: auditor_node adds amounts one by one in mapping order, so lay them out
+    # in that order and use cumsum (strictly sequential) rather than sum (pairwise).
+    ordered = np.zeros((n_matches, max(width, 1)), dtype=np.float64)
+    ordered[rank_match, rank[rank_match, rank_player]] = amounts[rank_match, rank_player]
+    pots = np.cumsum(ordered, axis=1)[:, -1]
+
+    # Balances in pence: a run difference d costs d/5 GBP = 20*d pence, exactly.
+    owed_pence = np.where(playing & valid[:, None], np.rint(diffs * 20).astype(np.int64), 0)
+    delta = -owed_pence
+    delta[np.flatnonzero(valid), winners[valid]] += owed_pence[valid].sum(axis=1)
+    balance_history = np.cumsum(delta, axis=0)
+
+    return SeasonLedger(players, match_players, errors, leaderboards, winners, amounts, pots, balance_history)
+
+# --- Net Transfers ---
+
+def minimise_transfers(balances: dict, pence: bool = False):
+    """
+    Turns net balances (+ owed money, - owes money) into a short list of payments:
+    the biggest debtor pays the biggest creditor until everyone is square.
+    Needs at most (players with a non-zero balance - 1) payments.
+    """
+    cents = balances if pence else {name: round(value * 100) for name, value in balances.items()}
+    creditors = [(-amount, name) for name, amount in cents.items() if amount > 0]
+    debtors = [(amount, name) for name, amount in cents.items() if amount < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        owed, creditor = heapq.heappop(creditors)
+        owes, debtor = heapq.heappop(debtors)
+        paid = min(-owed, -owes)
+        transfers.append({"from": debtor, "to": creditor, "amount_gbp": paid / 100})
+        if -owed > paid:
+            heapq.heappush(creditors, (owed + paid, creditor))
+        if -owes > paid:
+            heapq.heappush(debtors, (owes + paid, debtor))
+    return transfers
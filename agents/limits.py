@@ -0,0 +1,84 @@
+import os
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+
+# --- Per-Stage Concurrency ---
+# Caps how many workflows may be inside each external dependency at once.
+STAGE_LIMITS = {
+    "vision": int(os.getenv("VISION_CONCURRENCY", "8")),
+    "scraper": int(os.getenv("SCRAPER_CONCURRENCY", "4")),
+    "analyst": int(os.getenv("ANALYST_CONCURRENCY", "16")),
+    "commentator": int(os.getenv("COMMENTATOR_CONCURRENCY", "16")),
+}
+
+# asyncio semaphores belong to the loop that first waits on them, so each running loop
+# (the API server's, or each asyncio.run in a benchmark or batch CLI) gets its own set.
+_stage_semaphores = weakref.WeakKeyDictionary()
+
+def stage_slot(stage: str) -> asyncio.Semaphore:
+    """Semaphore for a stage on the running loop. Stages without a configured limit get an effectively unbounded one."""
+    semaphores = _stage_semaphores.setdefault(asyncio.get_running_loop(), {})
+    if stage not in semaphores:
+        semaphores[stage] = asyncio.Semaphore(STAGE_LIMITS.get(stage, 1_000_000))
+    return semaphores[stage]
+
+# --- Admission Control ---
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: int, status_code: int):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+class AdmissionController:
+    """
+    Bounded admission for whole workflows: up to max_active run at once, up to
+    max_queued wait behind them, and everyone else is turned away immediately.
+    """
+
+    def __init__(self, max_active: int = None, max_queued: int = None,
+                 queue_timeout: float = None, retry_after: int = None):
+        self.max_active = max_active or int(os.getenv("MAX_CONCURRENT_WORKFLOWS", "8"))
+        self.max_queued = max_queued if max_queued is not None else int(os.getenv("MAX_QUEUED_WORKFLOWS", "32"))
+        self.queue_timeout = queue_timeout or float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+        self.retry_after = retry_after or int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+        self._semaphore = asyncio.Semaphore(self.max_active)
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+
+    def check(self):
+        """Raises Overloaded if a new workflow would be turned away right now."""
+        if self._semaphore.locked() and self.queued >= self.max_queued:
+            self.rejected += 1
+            raise Overloaded("Too many settlements in progress.", self.retry_after, 429)
+
+    @asynccontextmanager
+    async def admit(self):
+        self.check()
+
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Overloaded("Timed out waiting for a free worker.", self.retry_after, 503)
+        finally:
+            self.queued -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "max_active": self.max_active,
+            "max_queued": self.max_queued,
+        }
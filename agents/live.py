@@ -0,0 +1,168 @@
+import os
+import time
+import asyncio
+from .auditor import build_leaderboard, settle_leaderboard
+from .scraper import scrape_fresh_async, is_match_finished
+from .commentator import commentator_node_async
+from .vision import vision_node_async
+from .workflow import run_stage, run_intelligence_layer_async
+
+# --- Live Match Tracking ---
+# Mappings are extracted once; after that only the scorecard is polled. Each poll is diffed
+# against the previous snapshot and only the players holding a changed code are re-totalled.
+# Gemma is only asked for a new roast when something worth talking about happens.
+
+LIVE_POLL_INTERVAL = float(os.getenv("LIVE_POLL_INTERVAL", "30"))
+LIVE_MIN_POLL_INTERVAL = float(os.getenv("LIVE_MIN_POLL_INTERVAL", "5"))
+LIVE_MAX_DURATION = float(os.getenv("LIVE_MAX_DURATION", str(6 * 3600)))
+LIVE_COMMENTARY_MIN_GAP = float(os.getenv("LIVE_COMMENTARY_MIN_GAP", "120"))
+LIVE_MILESTONE = int(os.getenv("LIVE_MILESTONE", "50"))
+LIVE_MAX_FAILURES = int(os.getenv("LIVE_MAX_FAILURES", "5"))
+
+class LiveLeaderboard:
+    """Running totals for fixed mappings, updated from score diffs."""
+
+    def __init__(self, mappings: dict):
+        self.mappings = mappings
+        self.scores = {}
+        self.totals = build_leaderboard(mappings, {})
+        # code -> [(player, times held)], so a changed code touches only its holders.
+        self._holders = {}
+        for player, codes in mappings.items():
+            for code in set(codes):
+                self._holders.setdefault(code, []).append((player, codes.count(code)))
+
+    def apply(self, scores: dict) -> dict:
+        """Folds a new snapshot in. Returns {code: (old, new)} for every code that moved."""
+        changed = {}
+        for code in set(self.scores) | set(scores):
+            old, new = self.scores.get(code, 0), scores.get(code, 0)
+            if old != new:
+                changed[code] = (old, new)
+                for player, times in self._holders.get(code, ()):
+                    self.totals[player] += (new - old) * times
+        self.scores = dict(scores)
+        return changed
+
+    def players_for(self, codes) -> list:
+        """Players holding any of these codes, sorted."""
+        return sorted({player for code in codes for player, _ in self._holders.get(code, ())})
+
+    def results(self) -> dict:
+        return settle_leaderboard(dict(self.totals))
+
+def significant_events(changed: dict, before: dict, after: dict) -> list:
+    """Things worth a fresh roast: a new leader, or a batter reaching a milestone."""
+    events = []
+    if before.get("winner") != after.get("winner"):
+        events.append(f"{after.get('winner')} takes the lead from {before.get('winner')}")
+    for code, (old, new) in changed.items():
+        if new // LIVE_MILESTONE > old // LIVE_MILESTONE:
+            events.append(f"{code} reaches {(new // LIVE_MILESTONE) * LIVE_MILESTONE}")
+    return events
+
+class LiveTracker:
+    """
+    Drives one live match for one league. Progress goes out through job.publish:
+    "leaderboard" on every change, "commentary" when Gemma is re-run, then "done".
+    """
+
+    def __init__(self, job, interval: float = None):
+        self.job = job
+        self.state = None
+        self.interval = max(interval or LIVE_POLL_INTERVAL, LIVE_MIN_POLL_INTERVAL)
+        self.board = None
+        self.polls = 0
+        self.updates = 0
+        self.commentary_runs = 0
+        self._last_commentary = 0.0
+
+    async def _roast(self, results: dict, events: list):
+        self.commentary_runs += 1
+        self._last_commentary = time.monotonic()
+        state = {**self.state, "final_results": dict(results)}
+        state = await run_stage("commentator", commentator_node_async, state)
+        summary = state["final_results"].get("sarcastic_summary")
+        self.job.publish("commentary", {"sarcastic_summary": summary, "events": events})
+        return summary
+
+    async def poll_once(self):
+        """One scrape + diff. Returns (finished, results)."""
+        self.polls += 1
+        scraped = await scrape_fresh_async(self.state["match_url"], self.state["commentary_url"])
+        # Same rule as the auditor: no scores means nothing to settle, not an all-zero leaderboard.
+        if not scraped["match_scores"]:
+            raise ValueError("Missing data.")
+        self.state["match_commentary"] = scraped["match_commentary"]
+        finished = is_match_finished(scraped["match_commentary"])
+
+        before = self.board.results()
+        changed = self.board.apply(scraped["match_scores"])
+        self.state["match_scores"] = dict(self.board.scores)
+        results = self.board.results()
+
+        if changed:
+            self.updates += 1
+            affected = self.board.players_for(changed)
+            self.job.publish("leaderboard", {
+                "changed_codes": {code: new for code, (_, new) in changed.items()},
+                "changed_players": affected,
+                "results": results,
+                "poll": self.polls,
+            })
+            events = significant_events(changed, before, results)
+            # The first snapshot is the baseline, not news. After that, rate-limit so a flurry
+            # of boundaries doesn't turn into a flurry of Vertex calls.
+            if (events and self.polls > 1 and not finished
+                    and time.monotonic() - self._last_commentary >= LIVE_COMMENTARY_MIN_GAP):
+                await self._roast(results, events)
+        return finished, results
+
+    async def run(self, state: dict, extract_mappings=None):
+        """
+        Runs vision once (extract_mappings(state) -> state, defaulting to the vision stage), then
+        polls until the result banner appears, LIVE_MAX_DURATION passes, or the task is cancelled.
+        """
+        self.job.start()
+        extract_mappings = extract_mappings or (lambda s: run_stage("vision", vision_node_async, s))
+        self.state = await extract_mappings(state)
+        if "error" in (self.state.get("final_results") or {}):
+            self.job.fail(self.state["final_results"]["error"])
+            return
+        if not self.state.get("player_mappings"):
+            self.job.fail("Missing data.")
+            return
+        self.board = LiveLeaderboard(self.state["player_mappings"])
+        self.job.publish("vision", {"player_mappings": self.state["player_mappings"]})
+
+        started = time.monotonic()
+        failures = 0
+        finished = False
+        results = self.board.results()
+        while time.monotonic() - started < LIVE_MAX_DURATION:
+            try:
+                finished, results = await self.poll_once()
+                failures = 0
+            except Exception as e:
+                failures += 1
+                print(f"⚠️ Live poll {self.polls} failed ({failures}/{LIVE_MAX_FAILURES}): {e}")
+                if failures >= LIVE_MAX_FAILURES:
+                    self.job.fail(f"Live tracking stopped: {e}")
+                    return
+            if finished:
+                break
+            await asyncio.sleep(self.interval)
+
+        # Full intelligence layer once, on the final numbers.
+        self.state["final_results"] = results
+        if finished:
+            self.state = await run_intelligence_layer_async(self.state, self.job.publish)
+        self.job.succeed({**self.state["final_results"], "finished": finished, **self.stats()})
+
+    def stop(self):
+        """Final result for a session stopped before the match ended."""
+        results = self.board.results() if self.board else {}
+        self.job.succeed({**results, "finished": False, "stopped": True, **self.stats()})
+
+    def stats(self):
+        return {"polls": self.polls, "updates": self.updates, "commentary_runs": self.commentary_runs}
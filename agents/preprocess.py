@@ -0,0 +1,131 @@
+import io
+import os
+import math
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from PIL import Image, ImageChops, ImageOps
+
+# Gemini reads player lists fine well below phone-native resolution.
+MAX_DIM = int(os.getenv("IMAGE_MAX_DIM", "2048"))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+STITCH = os.getenv("IMAGE_STITCH", "false").lower() in ("1", "true", "yes")
+STITCH_COLUMNS = int(os.getenv("IMAGE_STITCH_COLUMNS", "3"))
+STITCH_MAX_DIM = int(os.getenv("IMAGE_STITCH_MAX_DIM", "3072"))
+
+MIME_TYPES = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+    "HEIF": "image/heif",
+}
+
+# Pillow releases the GIL while decoding, resizing and encoding, so threads are enough.
+_preprocess_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("IMAGE_WORKERS", "4")),
+    thread_name_prefix="preprocess",
+)
+
+def detect_mime_type(data: bytes) -> Optional[str]:
+    """MIME type for formats Gemini takes as-is; None for anything else (GIF, BMP, unreadable)."""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return MIME_TYPES.get(img.format)
+    except Exception:
+        return None
+
+def _to_rgb(img: Image.Image) -> Image.Image:
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        return background
+    return img.convert("RGB")
+
+def _trim_borders(img: Image.Image) -> Image.Image:
+    # Crop away solid margins (letterboxing, empty chat background) matching the top-left pixel.
+    background = Image.new(img.mode, img.size, img.getpixel((0, 0)))
+    bbox = ImageChops.difference(img, background).getbbox()
+    if bbox and bbox != (0, 0) + img.size:
+        return img.crop(bbox)
+    return img
+
+def _encode(img: Image.Image) -> bytes:
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return out.getvalue()
+
+def _load(data: bytes) -> Image.Image:
+    img = Image.open(io.BytesIO(data))
+    img = ImageOps.exif_transpose(img)
+    return _trim_borders(_to_rgb(img))
+
+def preprocess_image(data: bytes) -> Tuple[bytes, str]:
+    """Returns (bytes, mime_type): downscaled, border-trimmed JPEG, or the original if that is smaller."""
+    try:
+        img = _load(data)
+    except Exception as e:
+        # Not something Pillow can read; let Gemini have a go at the raw upload.
+        print(f"   ⚠️ Preprocess skipped: {e}")
+        return data, "image/jpeg"
+
+    img.thumbnail((MAX_DIM, MAX_DIM), Image.LANCZOS)
+    encoded = _encode(img)
+
+    original_mime = detect_mime_type(data)
+    if len(encoded) >= len(data) and original_mime is not None:
+        return data, original_mime
+    return encoded, "image/jpeg"
+
+def stitch_images(images: List[bytes]) -> bytes:
+    """Tiles the screenshots into one grid image so Gemini gets a single part."""
+    tiles = [_load(data) for data in images]
+    columns = min(STITCH_COLUMNS, len(tiles))
+    rows = math.ceil(len(tiles) / columns)
+    cell_w = max(t.width for t in tiles)
+    cell_h = max(t.height for t in tiles)
+
+    sheet = Image.new("RGB", (cell_w * columns, cell_h * rows), (255, 255, 255))
+    for idx, tile in enumerate(tiles):
+        sheet.paste(tile, ((idx % columns) * cell_w, (idx // columns) * cell_h))
+
+    sheet.thumbnail((STITCH_MAX_DIM, STITCH_MAX_DIM), Image.LANCZOS)
+    return _encode(sheet)
+
+def _summarise(originals: List[bytes], processed: List[bytes]) -> dict:
+    bytes_in = sum(len(b) for b in originals)
+    bytes_out = sum(len(b) for b in processed)
+    return {
+        "images_in": len(originals),
+        "images_out": len(processed),
+        "bytes_in": bytes_in,
+        "bytes_out": bytes_out,
+        "bytes_saved": bytes_in - bytes_out,
+    }
+
+def preprocess_images(images: List[bytes], stitch: bool = None):
+    """Sync entry point. Returns (images, mime_types, stats)."""
+    stitch = STITCH if stitch is None else stitch
+    if stitch and len(images) > 1:
+        try:
+            sheet = stitch_images(images)
+            return [sheet], ["image/jpeg"], _summarise(images, [sheet])
+        except Exception as e:
+            print(f"   ⚠️ Stitching failed, sending images separately: {e}")
+
+    results = [preprocess_image(data) for data in images]
+    processed = [data for data, _ in results]
+    return processed, [mime for _, mime in results], _summarise(images, processed)
+
+async def preprocess_images_async(images: List[bytes], stitch: bool = None):
+    """Same as preprocess_images, with every image handled on the worker pool in parallel."""
+    loop = asyncio.get_running_loop()
+    stitch = STITCH if stitch is None else stitch
+    if stitch and len(images) > 1:
+        return await loop.run_in_executor(_preprocess_pool, preprocess_images, images, True)
+
+    results = await asyncio.gather(*[
+        loop.run_in_executor(_preprocess_pool, preprocess_image, data) for data in images
+    ])
+    processed = [data for data, _ in results]
+    return processed, [mime for _, mime in results], _summarise(images, processed)
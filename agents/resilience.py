@@ -0,0 +1,323 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .telemetry import DEPENDENCY_EVENTS
+
+# --- Resilience for Downstream Calls ---
+# Every call to Gemini, Vertex AI or the scraper goes through a Policy for its dependency:
+# an overall deadline, retries with jittered exponential backoff, an optional hedged duplicate
+# when the first attempt is slow, and a circuit breaker. While a breaker is open, calls fail
+# immediately with CircuitOpen, so nodes go straight to their fallback instead of waiting.
+#
+# Per dependency (GEMINI, VERTEX, SCRAPER), all optional:
+#   {NAME}_DEADLINE         seconds for the whole call, retries included
+#   {NAME}_RETRIES          extra attempts after the first
+#   {NAME}_BACKOFF          base backoff in seconds (doubles per attempt, full jitter)
+#   {NAME}_HEDGE_AFTER      seconds before a duplicate request is sent; unset disables hedging
+#   {NAME}_BREAKER_FAILURES consecutive failed calls (after retries; 4xx excluded) that open the breaker
+#   {NAME}_BREAKER_RESET    seconds the breaker stays open before a trial call
+
+MAX_BACKOFF = float(os.getenv("RETRY_MAX_BACKOFF", "8"))
+
+# Sync calls run here so a hung SDK call can be abandoned at its deadline.
+_call_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("RESILIENCE_WORKERS", "32")),
+    thread_name_prefix="resilience",
+)
+
+# When the current attempt must be finished by (time.monotonic()), for calls that can cut their own work short.
+_attempt_expires = contextvars.ContextVar("attempt_expires", default=None)
+
+def remaining_deadline():
+    """Seconds left in the enclosing policy attempt, or None outside one. Pass it to blocking waits."""
+    expires = _attempt_expires.get()
+    return None if expires is None else max(0.0, expires - time.monotonic())
+
+class CircuitOpen(Exception):
+    pass
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures; open -> half_open after
+    `reset_timeout`, letting one trial call through; its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._probing = False
+            return self._state
+
+    def allow(self):
+        """Raises CircuitOpen unless a call may go ahead right now."""
+        state = self.state
+        with self._lock:
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+        DEPENDENCY_EVENTS.inc(dependency=self.name, event="rejected")
+        raise CircuitOpen(f"{self.name} is unavailable (circuit open)")
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_abandoned(self):
+        """The call was cancelled before it had an outcome; a trial call gives way to the next one."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                    print(f"🔌 Circuit for {self.name} opened after {self._failures} failures")
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+                self._probing = False
+
+    def stats(self):
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "state_code": self.STATE_CODES[state],
+                "consecutive_failures": self._failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+def retryable(exc: BaseException) -> bool:
+    """Transient-looking failures only: a 4xx other than timeout / rate limit won't get better."""
+    if isinstance(exc, CircuitOpen):
+        return False
+    code = getattr(exc, "code", None)
+    if not isinstance(code, int):
+        code = getattr(exc, "status_code", None)
+    if isinstance(code, int) and 400 <= code < 500 and code not in (408, 429):
+        return False
+    return True
+
+class Policy:
+    def __init__(self, name: str, deadline: float = 30, retries: int = 2, backoff: float = 0.5,
+                 hedge_after: float = None, breaker: CircuitBreaker = None):
+        self.name = name
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker(name)
+
+    @classmethod
+    def from_env(cls, name: str, deadline: float, retries: int, backoff: float = 0.5):
+        prefix = name.upper()
+        hedge_after = os.getenv(f"{prefix}_HEDGE_AFTER")
+        return cls(
+            name,
+            deadline=float(os.getenv(f"{prefix}_DEADLINE", str(deadline))),
+            retries=int(os.getenv(f"{prefix}_RETRIES", str(retries))),
+            backoff=float(os.getenv(f"{prefix}_BACKOFF", str(backoff))),
+            hedge_after=float(hedge_after) if hedge_after else None,
+            breaker=CircuitBreaker(
+                name,
+                failure_threshold=int(os.getenv(f"{prefix}_BREAKER_FAILURES", "5")),
+                reset_timeout=float(os.getenv(f"{prefix}_BREAKER_RESET", "30")),
+            ),
+        )
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(MAX_BACKOFF, self.backoff * 2 ** attempt))
+
+    def _failed(self, exc: BaseException, attempt: int, expires: float):
+        """
+        Records a failed attempt. Returns how long to sleep before retrying, or re-raises.
+        The breaker only hears about the call's final outcome, and not at all about client errors:
+        a bad request says nothing about whether the dependency is up.
+        """
+        DEPENDENCY_EVENTS.inc(dependency=self.name, event="timeout" if isinstance(exc, DeadlineExceeded) else "error")
+        if not retryable(exc):
+            self.breaker.record_abandoned()
+            raise exc
+        delay = self._backoff(attempt)
+        if attempt >= self.retries or time.monotonic() + delay >= expires:
+            self.breaker.record_failure()
+            raise exc
+        print(f"🔁 {self.name} attempt {attempt + 1} failed ({exc}); retrying in {delay:.2f}s")
+        DEPENDENCY_EVENTS.inc(dependency=self.name, event="retry")
+        return delay
+
+    def _succeeded(self):
+        self.breaker.record_success()
+        DEPENDENCY_EVENTS.inc(dependency=self.name, event="ok")
+
+    # --- Sync ---
+
+    def _attempt(self, fn, remaining: float):
+        expires = time.monotonic() + remaining
+        token = _attempt_expires.set(expires)
+        try:
+            context = contextvars.copy_context()
+        finally:
+            _attempt_expires.reset(token)
+        futures = [_call_pool.submit(context.copy().run, fn)]
+        try:
+            if self.hedge_after is not None and self.hedge_after < remaining:
+                done, _ = wait(futures, timeout=self.hedge_after)
+                if not done:
+                    DEPENDENCY_EVENTS.inc(dependency=self.name, event="hedge")
+                    futures.append(_call_pool.submit(context.copy().run, fn))
+            pending = set(futures)
+            error = None
+            while pending:
+                done, pending = wait(pending, timeout=max(0.0, expires - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    raise DeadlineExceeded(f"{self.name} did not answer within {self.deadline}s")
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    error = future.exception()
+            raise error
+        finally:
+            # Queued duplicates never start; running ones are abandoned, not awaited.
+            for future in futures:
+                future.cancel()
+
+    def call(self, fn):
+        """Runs fn() under this policy from synchronous code."""
+        expires = time.monotonic() + self.deadline
+        attempt = 0
+        # Retries are part of the same call: one admission, one verdict for the breaker.
+        self.breaker.allow()
+        try:
+            while True:
+                try:
+                    result = self._attempt(fn, expires - time.monotonic())
+                except Exception as e:
+                    time.sleep(self._failed(e, attempt, expires))
+                    attempt += 1
+                    continue
+                self._succeeded()
+                return result
+        except Exception:
+            raise
+        except BaseException:
+            self.breaker.record_abandoned()
+            raise
+
+    # --- Async ---
+
+    async def _aattempt(self, coro_fn, remaining: float):
+        expires = time.monotonic() + remaining
+        tasks = [asyncio.ensure_future(coro_fn())]
+        try:
+            if self.hedge_after is not None and self.hedge_after < remaining:
+                done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+                if not done:
+                    DEPENDENCY_EVENTS.inc(dependency=self.name, event="hedge")
+                    tasks.append(asyncio.ensure_future(coro_fn()))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, expires - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise DeadlineExceeded(f"{self.name} did not answer within {self.deadline}s")
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # The loser of a hedge (or a call past its deadline) is cancelled, not left running.
+            for task in tasks:
+                task.cancel()
+
+    async def acall(self, coro_fn):
+        """Awaits coro_fn() under this policy. coro_fn is called again for each attempt."""
+        expires = time.monotonic() + self.deadline
+        attempt = 0
+        # Retries are part of the same call: one admission, one verdict for the breaker.
+        self.breaker.allow()
+        try:
+            while True:
+                try:
+                    result = await self._aattempt(coro_fn, expires - time.monotonic())
+                except Exception as e:
+                    await asyncio.sleep(self._failed(e, attempt, expires))
+                    attempt += 1
+                    continue
+                self._succeeded()
+                return result
+        except Exception:
+            raise
+        except BaseException:
+            # Cancelled mid-call or mid-backoff (an outer wait_for, a hedge loser, a graph cancel): no verdict either way.
+            self.breaker.record_abandoned()
+            raise
+
+    def stats(self):
+        return {
+            **self.breaker.stats(),
+            "deadline": self.deadline,
+            "retries": self.retries,
+            "hedge_after": self.hedge_after,
+        }
+
+# Gemini serves vision and the analyst, Vertex AI the commentator, the browser pool the scraper.
+_policy_defaults = {
+    "gemini": {"deadline": 60, "retries": 2},
+    "vertex": {"deadline": 30, "retries": 2},
+    "scraper": {"deadline": 90, "retries": 1, "backoff": 1.0},
+}
+_policies = {}
+_policies_lock = threading.Lock()
+
+def get_policy(name: str) -> Policy:
+    with _policies_lock:
+        if name not in _policies:
+            _policies[name] = Policy.from_env(name, **_policy_defaults.get(name, {"deadline": 30, "retries": 2}))
+        return _policies[name]
+
+def set_policy(name: str, policy):
+    """Swap in another policy (e.g. in tests). Pass None to rebuild it from the environment."""
+    with _policies_lock:
+        if policy is None:
+            _policies.pop(name, None)
+        else:
+            _policies[name] = policy
+
+def breaker_stats() -> dict:
+    return {name: get_policy(name).stats() for name in _policy_defaults}
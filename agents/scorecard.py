@@ -0,0 +1,79 @@
+from lxml import html as lxml_html
+
+# --- Scorecard Extraction ---
+# Pure HTML -> {"T1-1": runs, ...} so it can be tested offline against saved pages.
+# Batting tables are the ds-table tables whose header has B and R but no O (that one is bowling).
+# Positions count only rows with a linked player name and a numeric R cell, in page order.
+
+DS_TABLE = "//table[contains(concat(' ', normalize-space(@class), ' '), ' ds-table ')]"
+
+def _is_batting(headers) -> bool:
+    return "B" in headers and "R" in headers and "O" not in headers
+
+def _runs(text: str):
+    parts = text.split()
+    if not parts:
+        return None
+    val = parts[0].replace('*', '')
+    return int(val) if val.isdigit() else None
+
+def parse_scorecard(scorecard_html: str, max_innings: int = 2):
+    """lxml-backed parser. Stops once it has found the first max_innings batting tables."""
+    if not scorecard_html:
+        return {}
+    try:
+        doc = lxml_html.fromstring(scorecard_html)
+    except Exception:
+        # lxml rejects empty or encoding-declared documents passed as str.
+        return parse_scorecard_legacy(scorecard_html)
+
+    scores = {}
+    team_idx = 0
+    for table in doc.xpath(DS_TABLE):
+        headers = [th.text_content().strip() for th in table.iter("th")]
+        if not _is_batting(headers):
+            continue
+        team_idx += 1
+        pos = 1
+        for row in table.iter("tr"):
+            cols = list(row.iter("td"))
+            if len(cols) < 3 or next(cols[0].iter("a"), None) is None:
+                continue
+            runs = _runs(cols[2].text_content())
+            if runs is not None:
+                scores[f"T{team_idx}-{pos}"] = runs
+                pos += 1
+        if team_idx == max_innings:
+            break
+
+    return scores
+
+def parse_scorecard_legacy(scorecard_html: str):
+    """The original BeautifulSoup/html.parser walk. Kept as the parity and benchmark reference."""
+    from bs4 import BeautifulSoup
+    scores = {}
+
+    # Parse Tables
+    soup = BeautifulSoup(scorecard_html, 'html.parser')
+    all_tables = soup.find_all('table', class_='ds-table')
+
+    batting_tables = []
+    for table in all_tables:
+        headers = [th.text.strip() for th in table.find_all('th')]
+        if _is_batting(headers):
+            batting_tables.append(table)
+
+    for team_idx, table in enumerate(batting_tables[:2], 1):
+        rows = table.find_all('tr')
+        pos = 1
+        for row in rows:
+            cols = row.find_all('td')
+            if len(cols) >= 3 and cols[0].find('a'):
+                try:
+                    val = cols[2].text.strip().split()[0].replace('*', '')
+                    if val.isdigit():
+                        scores[f"T{team_idx}-{pos}"] = int(val)
+                        pos += 1
+                except: continue
+
+    return scores
@@ -0,0 +1,439 @@
+import os
+import sys
+import time
+import queue
+import asyncio
+import argparse
+import itertools
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeout
+from multiprocessing.connection import wait as wait_for_connections
+from multiprocessing.managers import BaseManager
+
+# --- Scrape Service ---
+# Scraping runs in its own worker processes instead of the API's browser thread. Each worker owns
+# a headless Chromium (a BrowserPool) and gets jobs from the service over its own pipe, so a browser
+# crash takes down one worker, not a request handler, and scrape capacity is sized apart from the API.
+#
+#   SCRAPER_MODE=local    browser pool inside the API process (default)
+#   SCRAPER_MODE=service  this process spawns the workers
+#   SCRAPER_MODE=remote   talk to a standalone service, shared by any number of API processes:
+#                         python -m agents.scrape_service --port 50051
+
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+SCRAPE_WORKER_CONCURRENCY = int(os.getenv("SCRAPE_WORKER_CONCURRENCY", "2"))
+SCRAPE_JOB_TIMEOUT = float(os.getenv("SCRAPE_JOB_TIMEOUT", "60"))
+SCRAPE_WORKER_MAX_JOBS = int(os.getenv("SCRAPE_WORKER_MAX_JOBS", "200"))
+# Extra time a worker gets past the job timeout before it is considered hung and killed.
+SCRAPE_HUNG_GRACE = float(os.getenv("SCRAPE_HUNG_GRACE", "15"))
+SCRAPE_SERVICE_ADDRESS = os.getenv("SCRAPE_SERVICE_ADDRESS", "127.0.0.1:50051")
+# No default: the standalone service runs pickled calls from any client that knows the key.
+SCRAPE_SERVICE_AUTHKEY = os.getenv("SCRAPE_SERVICE_AUTHKEY")
+
+class ScrapeError(Exception):
+    pass
+
+class WorkerCrashed(ScrapeError):
+    pass
+
+# --- Worker process ---
+
+def _worker_main(worker_id: int, conn, fetch, concurrency: int, job_timeout: float):
+    # Workers never need a display: one headless Chromium each.
+    os.environ["BROWSER_HEADLESS"] = "true"
+    if fetch is None:
+        from .scraper import fetch_match as fetch
+
+    jobs = queue.Queue()
+    send_lock = threading.Lock()
+
+    def loop():
+        while (job := jobs.get()) is not None:
+            job_id, match_url, commentary_url = job
+            try:
+                message = ("ok", job_id, fetch(match_url, commentary_url, timeout=job_timeout))
+            except Exception as e:
+                message = ("error", job_id, f"{type(e).__name__}: {e}")
+            with send_lock:
+                conn.send(message)
+
+    threads = [threading.Thread(target=loop, name=f"scrape-worker-{worker_id}-{i}") for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    # None from the service (or the service going away) means finish what we have and exit.
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        jobs.put(job)
+    for _ in threads:
+        jobs.put(None)
+    for thread in threads:
+        thread.join()
+
+    from .browser_pool import shutdown_browser_pool
+    shutdown_browser_pool()
+
+# --- Service (parent side) ---
+
+class _Worker:
+    def __init__(self, worker_id, process, conn):
+        self.id = worker_id
+        self.process = process
+        self.conn = conn
+        self.started_at = time.monotonic()
+        self.assigned = {}   # job_id -> dispatched_at
+        self.dispatched = 0
+        self.retiring = False
+        self.hung = False
+        self.closed = False
+
+class ScrapeService:
+    """
+    Pool of scraper worker processes. fetch()/afetch() return (match_scores, match_commentary).
+    The service hands each worker at most `concurrency` jobs at a time over the worker's own pipe,
+    and keeps the rest in a backlog. Workers are retired after max_jobs, and replaced if they crash
+    or hang past the job timeout; jobs they held fail with WorkerCrashed so callers can retry.
+    """
+
+    def __init__(self, workers: int = None, concurrency: int = None, job_timeout: float = None,
+                 max_jobs: int = None, fetch=None):
+        self.workers = workers or SCRAPE_WORKERS
+        self.concurrency = concurrency or SCRAPE_WORKER_CONCURRENCY
+        self.job_timeout = job_timeout or SCRAPE_JOB_TIMEOUT
+        self.max_jobs = max_jobs or SCRAPE_WORKER_MAX_JOBS
+        self._fetch = fetch
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self._worker_ids = itertools.count(1)
+        self._workers = {}
+        self._pending = {}     # job_id -> (Future, job)
+        self._backlog = deque()
+        self._next_spawn = 0.0
+        self._respawn_delay = 0.5
+        self._closing = threading.Event()
+        self._threads = []
+        self._stats = {"jobs": 0, "failed_jobs": 0, "workers_started": 0, "recycled": 0, "crashed": 0, "hung": 0}
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return self
+            for _ in range(self.workers):
+                self._spawn()
+            self._threads = [
+                threading.Thread(target=self._collect, name="scrape-service-results", daemon=True),
+                threading.Thread(target=self._supervise, name="scrape-service-supervisor", daemon=True),
+            ]
+        for thread in self._threads:
+            thread.start()
+        print(f"🕸️ Scrape service: {self.workers} workers x {self.concurrency} pages")
+        return self
+
+    # Everything below that touches workers, the backlog or pending jobs runs under self._lock.
+
+    def _spawn(self):
+        worker_id = next(self._worker_ids)
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, child_conn, self._fetch, self.concurrency, self.job_timeout),
+            name=f"scrape-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        self._workers[worker_id] = _Worker(worker_id, process, parent_conn)
+        self._stats["workers_started"] += 1
+
+    def _send(self, worker, message) -> bool:
+        try:
+            worker.conn.send(message)
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def _dispatch(self):
+        while self._backlog:
+            free = [w for w in self._workers.values()
+                    if not w.retiring and w.process.is_alive() and len(w.assigned) < self.concurrency]
+            if not free:
+                return
+            worker = min(free, key=lambda w: len(w.assigned))
+            job = self._backlog.popleft()
+            if job[0] not in self._pending:
+                continue
+            # The caller gave up while the job waited (deadline, hedge loser, disconnect): don't scrape it.
+            if self._pending[job[0]][0].cancelled():
+                del self._pending[job[0]]
+                continue
+            if not self._send(worker, job):
+                self._backlog.appendleft(job)
+                worker.retiring = True
+                continue
+            worker.assigned[job[0]] = time.monotonic()
+            worker.dispatched += 1
+            # Recycle after max_jobs so Chromium's slow leaks never build up.
+            if worker.dispatched >= self.max_jobs:
+                worker.retiring = True
+                self._send(worker, None)
+
+    def _settle(self, job_id, result=None, error=None):
+        with self._lock:
+            entry = self._pending.pop(job_id, None)
+            if error is not None and entry is not None:
+                self._stats["failed_jobs"] += 1
+        if entry is None:
+            return
+        future, _ = entry
+        # afetch() callers that were cancelled cancel this future too; their late answer is dropped.
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def _collect(self):
+        while not self._closing.is_set():
+            with self._lock:
+                conns = {w.conn: w for w in self._workers.values() if not w.closed}
+            if not conns:
+                time.sleep(0.1)
+                continue
+            try:
+                ready = wait_for_connections(list(conns), timeout=0.5)
+            except (OSError, ValueError):
+                # A pipe was closed by the supervisor under us; take a fresh snapshot.
+                continue
+            for conn in ready:
+                worker = conns[conn]
+                try:
+                    kind, job_id, payload = conn.recv()
+                except (EOFError, OSError, ValueError):
+                    # The worker is gone; the supervisor reaps it and fails its jobs.
+                    worker.closed = True
+                    continue
+                with self._lock:
+                    worker.assigned.pop(job_id, None)
+                    self._dispatch()
+                if kind == "ok":
+                    self._settle(job_id, result=tuple(payload))
+                else:
+                    self._settle(job_id, error=ScrapeError(payload))
+
+    def _reap(self, worker, now: float):
+        """Drops a dead worker; the jobs it held fail so callers can retry elsewhere."""
+        worker.process.join(timeout=0)
+        clean_exit = worker.retiring and worker.process.exitcode == 0
+        if clean_exit:
+            self._stats["recycled"] += 1
+        elif not worker.hung and not self._closing.is_set():
+            print(f"⚠️ Scrape worker {worker.id} died (exit code {worker.process.exitcode})")
+            self._stats["crashed"] += 1
+            # A worker that dies right after starting (no Chromium, bad install) would
+            # otherwise be respawned every second; back off instead.
+            if now - worker.started_at < 5:
+                self._respawn_delay = min(30.0, self._respawn_delay * 2)
+                self._next_spawn = now + self._respawn_delay
+        del self._workers[worker.id]
+        worker.closed = True
+        worker.conn.close()
+        return list(worker.assigned)
+
+    def _supervise(self):
+        while not self._closing.wait(0.5):
+            now = time.monotonic()
+            orphaned = []
+            with self._lock:
+                for worker in list(self._workers.values()):
+                    overdue = [t for t in worker.assigned.values() if now - t > self.job_timeout + SCRAPE_HUNG_GRACE]
+                    if overdue and worker.process.is_alive():
+                        print(f"⚠️ Scrape worker {worker.id} is hung; killing it")
+                        self._stats["hung"] += 1
+                        worker.hung = worker.retiring = True
+                        worker.process.kill()
+                        worker.process.join(timeout=5)
+                    # Reap only once the collector has read the pipe to EOF, so results a worker
+                    # sent just before exiting are never mistaken for lost jobs.
+                    if not worker.process.is_alive() and worker.closed:
+                        orphaned += self._reap(worker, now)
+                while len(self._workers) < self.workers and now >= self._next_spawn and not self._closing.is_set():
+                    self._spawn()
+                self._dispatch()
+            for job_id in orphaned:
+                self._settle(job_id, error=WorkerCrashed("Scrape worker died mid-job"))
+
+    def submit(self, match_url: str, commentary_url: str) -> Future:
+        if not self._threads:
+            self.start()
+        future = Future()
+        with self._lock:
+            job_id = next(self._ids)
+            job = (job_id, match_url, commentary_url)
+            self._pending[job_id] = (future, job)
+            self._stats["jobs"] += 1
+            self._backlog.append(job)
+            self._dispatch()
+        # A caller that gives up (fetch timeout, cancelled afetch) takes its job out of the backlog.
+        future.add_done_callback(lambda f: f.cancelled() and self._drop(job_id))
+        return future
+
+    def _drop(self, job_id):
+        with self._lock:
+            self._pending.pop(job_id, None)
+
+    def fetch(self, match_url: str, commentary_url: str, timeout: float = None):
+        future = self.submit(match_url, commentary_url)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise TimeoutError(f"Scrape did not finish within {timeout}s")
+
+    async def afetch(self, match_url: str, commentary_url: str):
+        return await asyncio.wrap_future(self.submit(match_url, commentary_url))
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "mode": "service",
+                "workers": len(self._workers),
+                "alive": sum(w.process.is_alive() for w in self._workers.values()),
+                "running": sum(len(w.assigned) for w in self._workers.values()),
+                "backlog": len(self._backlog),
+                "job_timeout": self.job_timeout,
+            }
+
+    def close(self):
+        self._closing.set()
+        with self._lock:
+            workers = list(self._workers.values())
+            for worker in workers:
+                self._send(worker, None)
+        for worker in workers:
+            worker.process.join(timeout=10)
+            if worker.process.is_alive():
+                worker.process.kill()
+            worker.conn.close()
+        with self._lock:
+            self._workers.clear()
+            self._backlog.clear()
+            pending = list(self._pending)
+        for job_id in pending:
+            self._settle(job_id, error=ScrapeError("Scrape service shut down"))
+        self._threads = []
+
+# --- Standalone service over a socket ---
+
+class _ServiceManager(BaseManager):
+    pass
+
+class _ServiceClient(BaseManager):
+    pass
+
+_ServiceClient.register("service")
+
+def _address(address: str):
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+def _authkey(authkey: str = None) -> bytes:
+    authkey = authkey or SCRAPE_SERVICE_AUTHKEY
+    if not authkey:
+        raise ScrapeError("SCRAPE_SERVICE_AUTHKEY must be set to a secret shared by the scrape service and its clients")
+    return authkey.encode()
+
+class RemoteScrapeService:
+    """Client for `python -m agents.scrape_service`; same fetch/afetch/stats as ScrapeService."""
+
+    def __init__(self, address: str = None, authkey: str = None):
+        self.address = _address(address or SCRAPE_SERVICE_ADDRESS)
+        self.authkey = _authkey(authkey)
+        self._proxy = None
+        self._lock = threading.Lock()
+
+    def _service(self):
+        with self._lock:
+            if self._proxy is None:
+                manager = _ServiceClient(address=self.address, authkey=self.authkey)
+                manager.connect()
+                self._proxy = manager.service()
+            return self._proxy
+
+    def fetch(self, match_url: str, commentary_url: str, timeout: float = None):
+        # Proxies keep one connection per thread, so concurrent callers don't share a socket.
+        return self._service().fetch(match_url, commentary_url, timeout)
+
+    async def afetch(self, match_url: str, commentary_url: str):
+        return await asyncio.to_thread(self.fetch, match_url, commentary_url)
+
+    def stats(self):
+        try:
+            return {**self._service().stats(), "mode": "remote"}
+        except Exception as e:
+            return {"mode": "remote", "error": str(e)}
+
+    def close(self):
+        self._proxy = None
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_scrape_service():
+    """The local worker pool (SCRAPER_MODE=service) or a client for the standalone one (remote)."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            if os.getenv("SCRAPER_MODE", "local") == "remote":
+                _service = RemoteScrapeService()
+            else:
+                _service = ScrapeService()
+        return _service
+
+def set_scrape_service(service):
+    """Swap in another service (e.g. in tests). Pass None to reset to the default."""
+    global _service
+    with _service_lock:
+        _service = service
+
+def shutdown_scrape_service():
+    global _service
+    with _service_lock:
+        service, _service = _service, None
+    if service is not None:
+        service.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Standalone scraper worker pool for SCRAPER_MODE=remote")
+    parser.add_argument("--host", default=_address(SCRAPE_SERVICE_ADDRESS)[0])
+    parser.add_argument("--port", type=int, default=_address(SCRAPE_SERVICE_ADDRESS)[1])
+    parser.add_argument("--workers", type=int, default=SCRAPE_WORKERS)
+    parser.add_argument("--concurrency", type=int, default=SCRAPE_WORKER_CONCURRENCY)
+    args = parser.parse_args(argv)
+    try:
+        authkey = _authkey()
+    except ScrapeError as e:
+        parser.error(str(e))
+
+    service = ScrapeService(workers=args.workers, concurrency=args.concurrency).start()
+    _ServiceManager.register("service", callable=lambda: service)
+    manager = _ServiceManager(address=(args.host, args.port), authkey=authkey)
+    print(f"🕸️ Scrape service listening on {args.host}:{args.port}", file=sys.stderr)
+    try:
+        manager.get_server().serve_forever()
+    finally:
+        service.close()
+
+if __name__ == "__main__":
+    main()
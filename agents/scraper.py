@@ -1,96 +1,420 @@
-import time
-from bs4 import BeautifulSoup
-from playwright.sync_api import sync_playwright
+import os
+import json
+import asyncio
+import threading
 from .state import AgentState
+from .browser_pool import get_browser_pool
+from .scorecard import parse_scorecard
+from .cache import LRUCache, SQLiteCache, TieredCache, SingleFlight
+from .telemetry import span, record_payload, FALLBACKS
+from .resilience import get_policy, remaining_deadline
+from .scrape_service import get_scrape_service
 
-def scraper_node(state: AgentState) -> AgentState:
-    print(f"--- [Step 2] Scraper: Fetching Data ---")
-    
-    if state.get("final_results") and "error" in state["final_results"]:
-        return state
+# --- Scrape Result Cache ---
+# Live scorecards go stale quickly; a finished match never changes.
+LIVE_TTL = float(os.getenv("SCRAPE_CACHE_LIVE_TTL", "60"))
+FINISHED_TTL = float(os.getenv("SCRAPE_CACHE_FINISHED_TTL", "86400"))
+FINISHED_MARKERS = ("won by", "match tied", "no result", "abandoned", "drawn")
+
+_scrape_cache = None
+_scrape_cache_lock = threading.Lock()
+_scrape_flight = SingleFlight()
+
+def get_scrape_cache():
+    global _scrape_cache
+    with _scrape_cache_lock:
+        if _scrape_cache is None:
+            memory = LRUCache(int(os.getenv("SCRAPE_CACHE_SIZE", "256")))
+            db_path = os.getenv("SCRAPE_CACHE_DB")
+            disk = SQLiteCache(db_path, table="scrape_cache") if db_path else None
+            _scrape_cache = TieredCache(memory, disk, name="scrape")
+        return _scrape_cache
+
+def set_scrape_cache(cache):
+    """Swap in any object with get(key) / set(key, value, ttl). Pass None to reset to the default."""
+    global _scrape_cache
+    with _scrape_cache_lock:
+        _scrape_cache = cache
+
+def is_match_finished(commentary_text) -> bool:
+    for line in commentary_text:
+        if line.startswith("RESULT:"):
+            banner = line.lower()
+            return any(marker in banner for marker in FINISHED_MARKERS)
+    return False
+
+# local: the browser pool in this process. service / remote: hand scrapes to worker processes
+# (see scrape_service.py), so the API never runs a browser itself.
+SCRAPER_MODE = os.getenv("SCRAPER_MODE", "local")
+
+# --- Page Readiness ---
+# Wait for the content we read rather than for fixed sleeps, and skip what we never read.
+BLOCK_RESOURCES = os.getenv("SCRAPER_BLOCK_RESOURCES", "true").lower() in ("1", "true", "yes")
+USE_EMBEDDED_JSON = os.getenv("SCRAPER_EMBEDDED_JSON", "false").lower() in ("1", "true", "yes")
+SCORECARD_WAIT_MS = int(os.getenv("SCRAPER_SCORECARD_WAIT_MS", "15000"))
+COMMENTARY_WAIT_MS = int(os.getenv("SCRAPER_COMMENTARY_WAIT_MS", "10000"))
 
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+BLOCKED_HOSTS = (
+    "doubleclick.net", "googlesyndication.com", "googletagmanager.com", "google-analytics.com",
+    "googleadservices.com", "adservice.google.com", "amazon-adsystem.com", "scorecardresearch.com",
+    "facebook.net", "chartbeat.com", "taboola.com", "outbrain.com", "criteo.com", "adnxs.com",
+    "moatads.com", "hotjar.com", "newrelic.com", "nr-data.net", "comscore.com", "quantserve.com",
+)
+COMMENTARY_SELECTOR = "div.ci-html-content, p.ds-text-typo-body"
+
+async def _block_heavy_requests(route):
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or any(host in request.url for host in BLOCKED_HOSTS):
+        await route.abort()
+    else:
+        await route.continue_()
+
+def _find_innings(node):
+    """Depth-first search of __NEXT_DATA__ for the innings list (entries carry inningBatsmen)."""
+    if isinstance(node, dict):
+        innings = node.get("innings")
+        if isinstance(innings, list) and innings and isinstance(innings[0], dict) and "inningBatsmen" in innings[0]:
+            return innings
+        children = node.values()
+    elif isinstance(node, list):
+        children = node
+    else:
+        return None
+    for child in children:
+        found = _find_innings(child)
+        if found is not None:
+            return found
+    return None
+
+def parse_embedded_scores(next_data: dict):
+    """Scores from the page's embedded Next.js JSON, numbered like the batting tables (T1-1, T1-2, ...)."""
     scores = {}
-    commentary_text = []
+    innings = _find_innings(next_data) or []
+    for team_idx, inning in enumerate(innings[:2], 1):
+        pos = 1
+        for batsman in inning.get("inningBatsmen") or []:
+            runs = batsman.get("runs")
+            # Batters who did not bat are listed too, without runs.
+            if batsman.get("battedType", "yes") != "yes" or not isinstance(runs, int):
+                continue
+            scores[f"T{team_idx}-{pos}"] = runs
+            pos += 1
+    return scores
 
-    with sync_playwright() as p:
-        # Launch visible browser (Stealth Mode)
-        browser = p.chromium.launch(
-            headless=False, 
-            args=["--disable-blink-features=AutomationControlled"]
-        )
-        context = browser.new_context(
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
-            viewport={"width": 1280, "height": 720}
-        )
-        page = context.new_page()
-        page.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+async def _read_embedded_scores(page):
+    try:
+        raw = await page.locator("script#__NEXT_DATA__").text_content(timeout=2000)
+        return parse_embedded_scores(json.loads(raw)) if raw else {}
+    except Exception as e:
+        print(f"   ⚠️ Embedded JSON unavailable, rendering instead: {e}")
+        return {}
 
-        # --- A. SCORES ---
-        try:
-            print(f"   >>> Scorecard: {state['match_url']}")
-            page.goto(state["match_url"], timeout=60000, wait_until="domcontentloaded")
-            time.sleep(2)
-            page.evaluate("window.scrollTo(0, 600)")
-            
-            page.wait_for_selector("table.ds-table", timeout=15000)
-            scorecard_html = page.content()
-            
-            # Parse Tables
-            soup = BeautifulSoup(scorecard_html, 'html.parser')
-            all_tables = soup.find_all('table', class_='ds-table')
-            
-            batting_tables = []
-            for table in all_tables:
-                headers = [th.text.strip() for th in table.find_all('th')]
-                if "B" in headers and "R" in headers and "O" not in headers:
-                    batting_tables.append(table)
-            
-            for team_idx, table in enumerate(batting_tables[:2], 1):
-                rows = table.find_all('tr')
-                pos = 1
-                for row in rows:
-                    cols = row.find_all('td')
-                    if len(cols) >= 3 and cols[0].find('a'):
-                        try:
-                            val = cols[2].text.strip().split()[0].replace('*', '')
-                            if val.isdigit():
-                                scores[f"T{team_idx}-{pos}"] = int(val)
-                                pos += 1
-                        except: continue
-            
-        except Exception as e:
-            print(f"   ❌ Scorecard Failed: {e}")
-            browser.close()
-            state["final_results"] = {"error": f"Score scraping failed: {str(e)}"}
-            return state
-
-        # --- B. COMMENTARY ---
-        try:
-            print(f"   >>> Commentary: {state['commentary_url']}")
-            page.goto(state["commentary_url"], timeout=60000, wait_until="domcontentloaded")
-            time.sleep(2)
-            
+async def _fetch_scorecard(page, match_url: str):
+    """Returns (scorecard_html, embedded_scores); embedded_scores is filled instead of the HTML when SCRAPER_EMBEDDED_JSON finds them."""
+    print(f"   >>> Scorecard: {match_url}")
+    with span("scraper.scorecard_goto"):
+        await page.goto(match_url, timeout=60000, wait_until="domcontentloaded")
+
+    scorecard_html, embedded_scores = None, {}
+    if USE_EMBEDDED_JSON:
+        with span("scraper.embedded_json"):
+            embedded_scores = await _read_embedded_scores(page)
+
+    if not embedded_scores:
+        with span("scraper.wait_for_selector"):
+            try:
+                await page.wait_for_selector("table.ds-table", state="attached", timeout=SCORECARD_WAIT_MS)
+            except Exception:
+                # Some layouts only render the tables once scrolled into view.
+                await page.evaluate("window.scrollTo(0, 600)")
+                await page.wait_for_selector("table.ds-table", state="attached", timeout=SCORECARD_WAIT_MS)
+        with span("scraper.scorecard_content"):
+            scorecard_html = await page.content()
+        record_payload("scorecard_html", len(scorecard_html))
+
+    return scorecard_html, embedded_scores
+
+async def _fetch_commentary(page, commentary_url: str):
+    """Returns the result banner plus the latest few balls. Never raises: commentary is only colour."""
+    commentary_text = []
+    try:
+        print(f"   >>> Commentary: {commentary_url}")
+        with span("scraper.commentary_goto"):
+            await page.goto(commentary_url, timeout=60000, wait_until="domcontentloaded")
+        balls_loaded = True
+        with span("scraper.commentary_wait"):
+            try:
+                await page.wait_for_selector(COMMENTARY_SELECTOR, state="attached", timeout=COMMENTARY_WAIT_MS)
+            except Exception as e:
+                # The result banner decides whether the match counts as finished, so still read it.
+                print(f"   ⚠️ Ball-by-ball didn't load: {e}")
+                balls_loaded = False
+
+        with span("scraper.commentary_extract"):
             # Grab summary header
-            summary_elem = page.query_selector("div.ds-text-tight-m")
+            summary_elem = await page.query_selector("div.ds-text-tight-m")
             if summary_elem:
-                commentary_text.append(f"RESULT: {summary_elem.inner_text()}")
+                commentary_text.append(f"RESULT: {await summary_elem.inner_text()}")
 
             # Grab recent balls
-            comms = page.query_selector_all("div.ci-html-content") 
+            comms = await page.query_selector_all("div.ci-html-content")
             if not comms:
-                comms = page.query_selector_all("p.ds-text-typo-body")
-            
+                comms = await page.query_selector_all("p.ds-text-typo-body")
+
             for comm in comms[:5]:
-                text = comm.inner_text().strip()
+                text = (await comm.inner_text()).strip()
                 if len(text) > 10:
                     commentary_text.append(text)
-            
-        except Exception as e:
-            print(f"   ⚠️ Commentary Failed: {e}")
+
+        if not balls_loaded and not comms:
             commentary_text.append("Commentary unavailable.")
-        
-        browser.close()
 
-    state["match_scores"] = scores
-    state["match_commentary"] = commentary_text
-    return state
\ No newline at end of file
+    except Exception as e:
+        print(f"   ⚠️ Commentary Failed: {e}")
+        commentary_text.append("Commentary unavailable.")
+
+    return commentary_text
+
+async def _fetch_pages(page, match_url: str, commentary_url: str, on_scorecard=None):
+    """
+    Runs on the browser pool. Loads the scorecard on `page` and the commentary on a second page
+    of the same context, side by side. Returns (scorecard_html, embedded_scores, commentary_lines).
+    on_scorecard(scorecard_html, embedded_scores), if given, is called as soon as the scorecard is in,
+    while the commentary may still be loading.
+    """
+    commentary_page = await page.context.new_page()
+    commentary = None
+    try:
+        if BLOCK_RESOURCES:
+            await page.route("**/*", _block_heavy_requests)
+            await commentary_page.route("**/*", _block_heavy_requests)
+
+        commentary = asyncio.ensure_future(_fetch_commentary(commentary_page, commentary_url))
+        scorecard_html, embedded_scores = await _fetch_scorecard(page, match_url)
+        if on_scorecard is not None:
+            on_scorecard(scorecard_html, embedded_scores)
+        commentary_text = await commentary
+    finally:
+        if commentary is not None and not commentary.done():
+            commentary.cancel()
+        try:
+            await commentary_page.close()
+        except Exception:
+            pass
+
+    return scorecard_html, embedded_scores, commentary_text
+
+def _parse_scores(scorecard_html: str):
+    with span("scraper.parse"):
+        return parse_scorecard(scorecard_html)
+
+def fetch_match(match_url: str, commentary_url: str, timeout: float = None):
+    """Fetch and parse in this process. Returns (match_scores, match_commentary); scrape service workers run this."""
+    scorecard_html, embedded_scores, commentary_text = get_browser_pool().run(
+        lambda page: _fetch_pages(page, match_url, commentary_url), timeout=timeout
+    )
+    return embedded_scores or _parse_scores(scorecard_html), commentary_text
+
+async def _fetch_match_async(match_url: str, commentary_url: str):
+    scorecard_html, embedded_scores, commentary_text = await get_browser_pool().arun(
+        lambda page: _fetch_pages(page, match_url, commentary_url)
+    )
+    # Parsing is CPU-bound; keep it off the event loop.
+    return embedded_scores or await asyncio.to_thread(_parse_scores, scorecard_html), commentary_text
+
+# --- Commentary in the Background ---
+# Only the commentator reads commentary, so in the async workflow the scraper hands back scores as
+# soon as the scorecard is parsed. The commentary page keeps loading in the same browser job and
+# arrives as state["pending_commentary"], a task with its own deadline; resolve_commentary() awaits
+# it. The complete result goes into the scrape cache once the commentary is in.
+COMMENTARY_TIMEOUT = float(os.getenv("SCRAPER_COMMENTARY_TIMEOUT", "15"))
+COMMENTARY_FALLBACK = ["Commentary unavailable."]
+
+async def _commentary_lines(job):
+    try:
+        _, _, commentary_text = await asyncio.wait_for(job, COMMENTARY_TIMEOUT)
+        return commentary_text
+    except asyncio.TimeoutError:
+        print(f"   ⏱️ Commentary not in after {COMMENTARY_TIMEOUT}s; carrying on without it")
+        FALLBACKS.inc(stage="commentary", reason="timeout")
+    except Exception as e:
+        print(f"   ⚠️ Commentary Failed: {e}")
+        FALLBACKS.inc(stage="commentary", reason="error")
+    return list(COMMENTARY_FALLBACK)
+
+async def _fetch_match_split_async(match_url: str, commentary_url: str):
+    """Returns (match_scores, commentary task) as soon as the scorecard is parsed."""
+    loop = asyncio.get_running_loop()
+    scorecard = loop.create_future()
+
+    def on_scorecard(scorecard_html, embedded_scores):
+        # Called from the browser pool's loop.
+        loop.call_soon_threadsafe(lambda: scorecard.done() or scorecard.set_result((scorecard_html, embedded_scores)))
+
+    job = asyncio.ensure_future(get_browser_pool().arun(
+        lambda page: _fetch_pages(page, match_url, commentary_url, on_scorecard=on_scorecard)
+    ))
+    try:
+        await asyncio.wait({scorecard, job}, return_when=asyncio.FIRST_COMPLETED)
+        # If the job ended first it either failed (and raises here) or carries the scorecard itself.
+        scorecard_html, embedded_scores = scorecard.result() if scorecard.done() else job.result()[:2]
+        scores = embedded_scores or await asyncio.to_thread(_parse_scores, scorecard_html)
+    except BaseException:
+        job.cancel()
+        scorecard.cancel()
+        raise
+    return scores, asyncio.ensure_future(_commentary_lines(job))
+
+async def resolve_commentary(state: AgentState) -> AgentState:
+    """Waits for a pending background commentary fetch, if any, and puts it in match_commentary."""
+    pending = state.pop("pending_commentary", None)
+    if pending is not None:
+        # Shielded: the task may be shared by other requests for the same match.
+        state["match_commentary"] = list(await asyncio.shield(pending))
+    return state
+
+def _use_service() -> bool:
+    return SCRAPER_MODE in ("service", "remote")
+
+def _scrape(cache_key: str, match_url: str, commentary_url: str):
+    # Checked inside the flight, so a request that queued behind a scrape sees its result.
+    cached = get_scrape_cache().get(cache_key)
+    if cached is not None:
+        print("   ⚡ Scrape cache hit")
+        return cached
+
+    # The browser is shared and already warm; we only pay for a fresh page. Each attempt passes its
+    # deadline on, so a scrape the policy gives up on is cancelled rather than left holding a slot.
+    if _use_service():
+        scores, commentary_text = get_policy("scraper").call(
+            lambda: get_scrape_service().fetch(match_url, commentary_url, timeout=remaining_deadline())
+        )
+    else:
+        scores, commentary_text = get_policy("scraper").call(
+            lambda: fetch_match(match_url, commentary_url, timeout=remaining_deadline())
+        )
+    result = {"match_scores": scores, "match_commentary": commentary_text}
+
+    ttl = FINISHED_TTL if is_match_finished(commentary_text) else LIVE_TTL
+    get_scrape_cache().set(cache_key, result, ttl=ttl)
+    return result
+
+async def _scrape_async(cache_key: str, match_url: str, commentary_url: str, fresh: bool = False):
+    # The cache may be SQLite-backed; keep its reads and writes off the event loop.
+    cached = None if fresh else await asyncio.to_thread(get_scrape_cache().get, cache_key)
+    if cached is not None:
+        print("   ⚡ Scrape cache hit")
+        return cached
+
+    if _use_service():
+        scores, commentary_text = await get_policy("scraper").acall(
+            lambda: get_scrape_service().afetch(match_url, commentary_url)
+        )
+    else:
+        scores, commentary_text = await get_policy("scraper").acall(lambda: _fetch_match_async(match_url, commentary_url))
+    result = {"match_scores": scores, "match_commentary": commentary_text}
+
+    ttl = FINISHED_TTL if is_match_finished(commentary_text) else LIVE_TTL
+    await asyncio.to_thread(get_scrape_cache().set, cache_key, result, ttl=ttl)
+    return result
+
+# Split scrapes whose commentary is still loading. The flight ends as soon as the scores are in, so
+# until the full result reaches the cache, later requests for the match join the same pending task here.
+_split_inflight = {}
+
+async def _scrape_split_async(cache_key: str, match_url: str, commentary_url: str):
+    inflight = _split_inflight.get(cache_key)
+    if inflight is not None:
+        print("   ⚡ Joining in-flight scrape")
+        return inflight
+
+    cached = await asyncio.to_thread(get_scrape_cache().get, cache_key)
+    if cached is not None:
+        print("   ⚡ Scrape cache hit")
+        return cached
+
+    scores, commentary = await get_policy("scraper").acall(lambda: _fetch_match_split_async(match_url, commentary_url))
+
+    async def remember():
+        try:
+            commentary_text = await commentary
+            result = {"match_scores": scores, "match_commentary": commentary_text}
+            ttl = FINISHED_TTL if is_match_finished(commentary_text) else LIVE_TTL
+            try:
+                await asyncio.to_thread(get_scrape_cache().set, cache_key, result, ttl=ttl)
+            except Exception as e:
+                print(f"   ⚠️ Could not cache scrape: {e}")
+            return commentary_text
+        finally:
+            _split_inflight.pop(cache_key, None)
+
+    result = _split_inflight[cache_key] = {"match_scores": scores, "pending_commentary": asyncio.ensure_future(remember())}
+    return result
+
+def scraper_node(state: AgentState) -> AgentState:
+    print(f"--- [Step 2] Scraper: Fetching Data ---")
+
+    if state.get("final_results") and "error" in state["final_results"]:
+        return state
+
+    match_url = state["match_url"]
+    commentary_url = state["commentary_url"]
+    cache_key = f"{match_url}|{commentary_url}"
+
+    try:
+        # Concurrent requests for the same match share one cache lookup and one browser trip.
+        result = _scrape_flight.do(cache_key, lambda: _scrape(cache_key, match_url, commentary_url))
+    except Exception as e:
+        print(f"   ❌ Scorecard Failed: {e}")
+        state["final_results"] = {"error": f"Score scraping failed: {str(e)}"}
+        return state
+
+    # Copies, so downstream nodes can't mutate what's in the cache.
+    state["match_scores"] = dict(result["match_scores"])
+    state["match_commentary"] = list(result["match_commentary"])
+    return state
+
+
+async def scraper_node_async(state: AgentState) -> AgentState:
+    print("--- [Step 2] Scraper: Fetching Data (async) ---")
+
+    if state.get("final_results") and "error" in state["final_results"]:
+        return state
+
+    match_url = state["match_url"]
+    commentary_url = state["commentary_url"]
+    cache_key = f"{match_url}|{commentary_url}"
+
+    try:
+        if _use_service():
+            result = await _scrape_flight.ado(cache_key, lambda: _scrape_async(cache_key, match_url, commentary_url))
+        else:
+            # Scores now, commentary in the background. Its own flight key, so sync callers of
+            # the same match never receive a pending task.
+            result = await _scrape_flight.ado(
+                f"{cache_key}|split", lambda: _scrape_split_async(cache_key, match_url, commentary_url)
+            )
+    except Exception as e:
+        print(f"   ❌ Scorecard Failed: {e}")
+        state["final_results"] = {"error": f"Score scraping failed: {str(e)}"}
+        return state
+
+    state["match_scores"] = dict(result["match_scores"])
+    if "pending_commentary" in result:
+        state["match_commentary"] = []
+        state["pending_commentary"] = result["pending_commentary"]
+    else:
+        state["match_commentary"] = list(result["match_commentary"])
+    return state
+
+async def scrape_fresh_async(match_url: str, commentary_url: str) -> dict:
+    """
+    Always goes to the site (live polling), then refreshes the cache for everyone else.
+    Pollers of the same match still share one browser trip. Raises on failure.
+    """
+    cache_key = f"{match_url}|{commentary_url}"
+    result = await _scrape_flight.ado(
+        f"{cache_key}|fresh", lambda: _scrape_async(cache_key, match_url, commentary_url, fresh=True)
+    )
+    return {"match_scores": dict(result["match_scores"]), "match_commentary": list(result["match_commentary"])}
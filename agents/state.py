@@ -2,9 +2,12 @@ from typing import TypedDict, List, Dict, Optional, Any
 
 class AgentState(TypedDict):
     image_bytes: List[bytes]
+    image_mime_types: List[str]    # Set by the preprocessing stage; defaults to JPEG
+    image_digests: List[str]       # sha256 of each upload, taken while streaming; keys the vision cache
     match_url: str                 # URL 1: For Scores
     commentary_url: str            # URL 2: For Context/Roasting
     player_mappings: Dict[str, List[str]]
     match_scores: Dict[str, int]
     match_commentary: List[str]
+    pending_commentary: Any        # Async workflow only: task resolving to match_commentary (see scraper.resolve_commentary)
     final_results: Optional[Dict[str, Any]]
\ No newline at end of file
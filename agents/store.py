@@ -0,0 +1,223 @@
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+# --- Results Store ---
+# Every settlement is kept in SQLite (WAL), so history views and season totals are
+# indexed lookups instead of another paid run of the pipeline.
+
+DEFAULT_LEAGUE = "default"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    match_id TEXT PRIMARY KEY,
+    match_url TEXT NOT NULL,
+    scores TEXT NOT NULL,
+    finished INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS settlements (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    match_id TEXT NOT NULL,
+    league TEXT NOT NULL,
+    match_url TEXT NOT NULL,
+    trace_id TEXT,
+    created_at REAL NOT NULL,
+    winner TEXT,
+    winner_score INTEGER,
+    total_pot REAL,
+    data TEXT NOT NULL,
+    UNIQUE (match_id, league)
+);
+CREATE INDEX IF NOT EXISTS idx_settlements_league ON settlements (league, created_at);
+CREATE TABLE IF NOT EXISTS player_results (
+    settlement_id INTEGER NOT NULL REFERENCES settlements (id) ON DELETE CASCADE,
+    match_id TEXT NOT NULL,
+    league TEXT NOT NULL,
+    player TEXT NOT NULL,
+    codes TEXT NOT NULL,
+    runs INTEGER NOT NULL,
+    is_winner INTEGER NOT NULL,
+    net_gbp REAL NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (settlement_id, player)
+);
+CREATE INDEX IF NOT EXISTS idx_player_results_league_player ON player_results (league, player, created_at);
+CREATE INDEX IF NOT EXISTS idx_player_results_player ON player_results (player, created_at);
+CREATE INDEX IF NOT EXISTS idx_player_results_match ON player_results (match_id);
+"""
+
+_MATCH_ID = re.compile(r"-(\d{5,})/(?:full-scorecard|ball-by-ball-commentary|live-cricket-score|match-report)")
+
+def match_id_from_url(match_url: str) -> str:
+    """ESPNcricinfo's numeric match id when the URL has one, else a stable hash of the URL."""
+    found = _MATCH_ID.search(match_url or "")
+    if found:
+        return found.group(1)
+    return hashlib.sha1((match_url or "").strip().encode()).hexdigest()[:16]
+
+class ResultsStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self):
+        # Stores created before matches.finished existed.
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(matches)")}
+        if "finished" not in columns:
+            self._conn.execute("ALTER TABLE matches ADD COLUMN finished INTEGER NOT NULL DEFAULT 0")
+
+    def save_settlement(self, match_url: str, league: str, data: dict, trace_id: str = None, finished: bool = False) -> int:
+        """
+        Stores one settled league for one match, replacing an earlier run of the same pair.
+        data is the API's result payload (winner, settlements, leaderboard, player_mappings, ...).
+        finished marks the match's scores as final, which makes them count towards form.
+        """
+        league = league or DEFAULT_LEAGUE
+        match_id = match_id_from_url(match_url)
+        now = time.time()
+        winner = data.get("winner")
+        settlements = data.get("settlements") or {}
+        mappings = data.get("player_mappings") or {}
+        leaderboard = data.get("leaderboard") or {}
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO matches (match_id, match_url, scores, finished, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (match_id) DO UPDATE SET scores = excluded.scores, updated_at = excluded.updated_at, "
+                "finished = MAX(finished, excluded.finished)",
+                (match_id, match_url, json.dumps(data.get("detailed_scores") or {}), int(finished), now)
+            )
+            # Re-settling replaces the old rows (player_results go with it via ON DELETE CASCADE).
+            self._conn.execute("DELETE FROM settlements WHERE match_id = ? AND league = ?", (match_id, league))
+            settlement_id = self._conn.execute(
+                "INSERT INTO settlements (match_id, league, match_url, trace_id, created_at, winner, winner_score, total_pot, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (match_id, league, match_url, trace_id, now, winner, data.get("winner_score"),
+                 data.get("total_pot"), json.dumps(data))
+            ).lastrowid
+            self._conn.executemany(
+                "INSERT INTO player_results (settlement_id, match_id, league, player, codes, runs, is_winner, net_gbp, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (settlement_id, match_id, league, player, json.dumps(mappings.get(player, [])), runs,
+                     int(player == winner),
+                     (data.get("total_pot") or 0.0) if player == winner else -settlements.get(player, 0.0),
+                     now)
+                    for player, runs in leaderboard.items()
+                ]
+            )
+        return settlement_id
+
+    def _summary(self, row) -> dict:
+        return {
+            "match_id": row["match_id"],
+            "league": row["league"],
+            "match_url": row["match_url"],
+            "trace_id": row["trace_id"],
+            "created_at": row["created_at"],
+            "winner": row["winner"],
+            "winner_score": row["winner_score"],
+            "total_pot": row["total_pot"],
+        }
+
+    def get_settlement(self, match_id: str, league: str = DEFAULT_LEAGUE):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM settlements WHERE match_id = ? AND league = ?", (match_id, league)
+            ).fetchone()
+        if row is None:
+            return None
+        return {**self._summary(row), "data": json.loads(row["data"])}
+
+    def list_settlements(self, league: str = None, limit: int = 50):
+        query = "SELECT * FROM settlements"
+        params = []
+        if league:
+            query += " WHERE league = ?"
+            params.append(league)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._summary(row) for row in rows]
+
+    def match_scores(self, match_id: str):
+        with self._lock:
+            row = self._conn.execute("SELECT scores FROM matches WHERE match_id = ?", (match_id,)).fetchone()
+        return json.loads(row["scores"]) if row else None
+
+    def finished_matches(self):
+        """(match_id, scores) for every finished match, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT match_id, scores FROM matches WHERE finished = 1 ORDER BY updated_at"
+            ).fetchall()
+        return [(row["match_id"], json.loads(row["scores"])) for row in rows]
+
+    def player_history(self, player: str, league: str = None, limit: int = 100):
+        query = "SELECT match_id, league, codes, runs, is_winner, net_gbp, created_at FROM player_results WHERE player = ?"
+        params = [player]
+        if league:
+            query += " AND league = ?"
+            params.append(league)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {**dict(row), "codes": json.loads(row["codes"]), "is_winner": bool(row["is_winner"])}
+            for row in rows
+        ]
+
+    def season_totals(self, league: str = DEFAULT_LEAGUE):
+        """Per-player totals for a league, best balance first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT player, COUNT(*) AS matches, SUM(runs) AS runs, SUM(is_winner) AS wins, "
+                "ROUND(SUM(net_gbp), 2) AS net_gbp FROM player_results WHERE league = ? "
+                "GROUP BY player ORDER BY net_gbp DESC, runs DESC",
+                (league,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self):
+        with self._lock:
+            settlements = self._conn.execute("SELECT COUNT(*) FROM settlements").fetchone()[0]
+            matches = self._conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+        return {"settlements": settlements, "matches": matches}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_results_store = None
+_results_store_lock = threading.Lock()
+
+def get_results_store():
+    """Process-wide store at RESULTS_DB, e.g. results.db. Unset or empty (the default) keeps persistence off."""
+    global _results_store
+    with _results_store_lock:
+        if _results_store is None:
+            path = os.getenv("RESULTS_DB")
+            if not path:
+                return None
+            _results_store = ResultsStore(path)
+        return _results_store
+
+def set_results_store(store):
+    """Swap in another store (e.g. in tests). Pass None to reset to the default."""
+    global _results_store
+    with _results_store_lock:
+        _results_store = store
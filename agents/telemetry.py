@@ -0,0 +1,220 @@
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Minimal Prometheus-style metrics and per-request trace ids for the agent pipeline.
+# Rendered as text exposition format by /metrics in api.py.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 500_000, 1_000_000, 5_000_000, 10_000_000, 50_000_000)
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, key)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+class Gauge(Counter):
+    def set(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(_label_key(self.labelnames, labels))
+        return series["count"] if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series['count']}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+STAGE_DURATION = REGISTRY.register(Histogram(
+    "twelfth_man_stage_duration_seconds",
+    "Duration of each pipeline stage and scraper sub-step.",
+    ("stage", "outcome"),
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "twelfth_man_cache_requests_total",
+    "Cache lookups by cache and result.",
+    ("cache", "result"),
+))
+PAYLOAD_BYTES = REGISTRY.register(Histogram(
+    "twelfth_man_payload_bytes",
+    "Sizes of uploads, model requests and scraped pages.",
+    ("kind",),
+    buckets=SIZE_BUCKETS,
+))
+HTTP_DURATION = REGISTRY.register(Histogram(
+    "twelfth_man_http_request_duration_seconds",
+    "End-to-end HTTP request latency.",
+    ("route", "method", "status"),
+))
+FALLBACKS = REGISTRY.register(Counter(
+    "twelfth_man_fallbacks_total",
+    "Intelligence-layer nodes replaced by their fallback value.",
+    ("stage", "reason"),
+))
+DEPENDENCY_EVENTS = REGISTRY.register(Counter(
+    "twelfth_man_dependency_events_total",
+    "Calls to Gemini, Vertex AI and the scraper: successes, failures, retries, hedges, timeouts, breaker rejections.",
+    ("dependency", "event"),
+))
+BATCH_SIZE = REGISTRY.register(Histogram(
+    "twelfth_man_batch_size",
+    "Items per micro-batch sent downstream, by what triggered the flush (size or delay).",
+    ("batcher", "trigger"),
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+))
+BATCH_FILL = REGISTRY.register(Histogram(
+    "twelfth_man_batch_fill_ratio",
+    "Micro-batch size as a fraction of the configured maximum.",
+    ("batcher",),
+    buckets=(0.125, 0.25, 0.5, 0.75, 1.0),
+))
+GAUGES = REGISTRY.register(Gauge(
+    "twelfth_man_component_state",
+    "Point-in-time values from pools, caches and admission control.",
+    ("component", "field"),
+))
+
+# --- Tracing ---
+
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+def set_trace_id(trace_id: str):
+    return _trace_id.set(trace_id)
+
+def current_trace_id():
+    return _trace_id.get()
+
+_span_listeners = []
+
+def add_span_listener(listener):
+    """listener(span) is called after every span ends, e.g. to keep raw samples for benchmarks."""
+    _span_listeners.append(listener)
+    return listener
+
+def remove_span_listener(listener):
+    if listener in _span_listeners:
+        _span_listeners.remove(listener)
+
+class Span:
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.outcome = "ok"
+        self.duration = 0.0
+
+@contextmanager
+def span(stage: str):
+    """
+    Times a block into STAGE_DURATION. Exceptions mark it as "error";
+    the block may also set span.outcome itself (e.g. "cache_hit", "fallback").
+    Works around awaits as well, since it only reads the clock.
+    """
+    current = Span(stage)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException:
+        current.outcome = "error"
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        STAGE_DURATION.observe(current.duration, stage=stage, outcome=current.outcome)
+        for listener in _span_listeners:
+            listener(current)
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+def record_payload(kind: str, size: int):
+    PAYLOAD_BYTES.observe(size, kind=kind)
+
+def set_component_stats(component: str, stats: dict):
+    """Publishes the numeric fields of a stats() dict as gauges."""
+    for field, value in stats.items():
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            GAUGES.set(value, component=component, field=field)
@@ -0,0 +1,154 @@
+import io
+import os
+import json
+import hashlib
+
+# --- Upload Intake ---
+# Starlette has already spooled each file of the multipart body (memory while small, disk once
+# large) by the time an endpoint sees it. The request as a whole is capped while its body is
+# received (see BodySizeLimit), so an oversized upload is cut off before it is parsed, chunked or not.
+# Each file is then hashed and size-checked in place: the sha256 is taken on the way through so
+# the vision cache never hashes the bytes again, and the Upload takes over Starlette's spool
+# instead of copying it, so the bytes outlive the request for background jobs.
+
+MAX_UPLOAD_FILE_BYTES = int(float(os.getenv("MAX_UPLOAD_FILE_MB", "10")) * 1024 * 1024)
+MAX_UPLOAD_TOTAL_BYTES = int(float(os.getenv("MAX_UPLOAD_TOTAL_MB", "40")) * 1024 * 1024)
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_KB", "256")) * 1024
+# Multipart framing adds a little on top of the files themselves.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+class UploadTooLarge(Exception):
+    status_code = 413
+
+class Upload:
+    """One uploaded file: the spooled bytes plus the size and sha256 taken while checking them."""
+
+    def __init__(self, filename: str = None, content_type: str = None, spool=None):
+        self.filename = filename
+        self.content_type = content_type
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._spool = spool if spool is not None else io.BytesIO()
+
+    def update(self, chunk: bytes):
+        self._hash.update(chunk)
+        self.size += len(chunk)
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def read(self) -> bytes:
+        self._spool.seek(0)
+        return self._spool.read()
+
+    def close(self):
+        self._spool.close()
+
+def check_declared_size(declared, max_total: int = None):
+    """Rejects a request whose Content-Length (or body received so far) is already too big."""
+    max_total = MAX_UPLOAD_TOTAL_BYTES if max_total is None else max_total
+    try:
+        declared = int(declared)
+    except (TypeError, ValueError):
+        return
+    if declared > max_total + MULTIPART_OVERHEAD_BYTES:
+        raise UploadTooLarge(f"Request body is at least {declared} bytes; uploads are capped at {max_total} bytes in total.")
+
+class BodySizeLimit:
+    """
+    ASGI middleware capping multipart request bodies: refused up front from Content-Length when
+    there is one, and cut off mid-stream otherwise (chunked uploads), before the form is parsed.
+    """
+
+    def __init__(self, app, max_total: int = None):
+        self.app = app
+        self.max_total = max_total
+
+    async def __call__(self, scope, receive, send):
+        headers = dict(scope.get("headers") or []) if scope["type"] == "http" else {}
+        if scope["type"] != "http" or scope["method"] != "POST" or not headers.get(b"content-type", b"").startswith(b"multipart/"):
+            return await self.app(scope, receive, send)
+
+        max_total = MAX_UPLOAD_TOTAL_BYTES if self.max_total is None else self.max_total
+        content_length = headers.get(b"content-length")
+        try:
+            check_declared_size(content_length.decode() if content_length else None, max_total)
+        except UploadTooLarge as e:
+            return await self._reject(send, e)
+
+        received = 0
+        started = rejected = False
+
+        async def counting_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                try:
+                    check_declared_size(received, max_total)
+                except UploadTooLarge as e:
+                    # Answer now and tell the app the client went away, so it stops reading the body.
+                    rejected = True
+                    if not started:
+                        await self._reject(send, e)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if rejected:
+                return
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        await self.app(scope, counting_receive, guarded_send)
+
+    @staticmethod
+    async def _reject(send, error: UploadTooLarge):
+        body = json.dumps({"detail": str(error)}).encode()
+        await send({"type": "http.response.start", "status": error.status_code,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+async def read_uploads(files, max_file: int = None, max_total: int = None):
+    """
+    Hashes each UploadFile in chunks and wraps its spool in an Upload, enforcing the per-file and
+    per-request caps. Raises UploadTooLarge as soon as either is crossed; anything read so far is released.
+    """
+    max_file = MAX_UPLOAD_FILE_BYTES if max_file is None else max_file
+    max_total = MAX_UPLOAD_TOTAL_BYTES if max_total is None else max_total
+
+    # Sizes the client declared let us refuse before reading a single chunk.
+    declared = [getattr(f, "size", None) for f in files]
+    for file, size in zip(files, declared):
+        if size is not None and size > max_file:
+            raise UploadTooLarge(f"{file.filename} is {size} bytes; the limit is {max_file} bytes per file.")
+    if all(size is not None for size in declared) and sum(declared) > max_total:
+        raise UploadTooLarge(f"Uploads total {sum(declared)} bytes; the limit is {max_total} bytes per request.")
+
+    uploads = []
+    total = 0
+    try:
+        for file in files:
+            upload = Upload(file.filename, file.content_type, file.file)
+            uploads.append(upload)
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                upload.update(chunk)
+                total += len(chunk)
+                if upload.size > max_file:
+                    raise UploadTooLarge(f"{file.filename} is over the limit of {max_file} bytes per file.")
+                if total > max_total:
+                    raise UploadTooLarge(f"Uploads are over the limit of {max_total} bytes per request.")
+            # The Upload owns the spool now; FastAPI closes the UploadFile when the response is sent.
+            file.file = io.BytesIO()
+    except BaseException:
+        close_uploads(uploads)
+        raise
+    return uploads
+
+def close_uploads(uploads):
+    for upload in uploads:
+        upload.close()
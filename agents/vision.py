@@ -1,57 +1,166 @@
 import os
 import json
-from google import genai
-from google.genai import types
+import hashlib
+import threading
 from .state import AgentState
+from .cache import LRUCache, SQLiteCache, TieredCache
+from .clients import get_genai_client
+from .telemetry import record_payload
+from .resilience import get_policy
+
+VISION_PROMPT = (
+    "Analyze these images of a cricket player list. "
+    "Extract a JSON mapping where:\n"
+    "- Keys are Player Names (string).\n"
+    "- Values are a list of their assigned codes (e.g. ['T1-1', 'T2-5']).\n"
+    "Return ONLY raw JSON. No markdown formatting."
+)
+
+# --- Mapping Cache ---
+# Content-addressed, so identical screenshots never expire; size caps do the eviction.
+_mapping_cache = None
+_mapping_cache_lock = threading.Lock()
+
+def get_mapping_cache():
+    global _mapping_cache
+    with _mapping_cache_lock:
+        if _mapping_cache is None:
+            memory = LRUCache(int(os.getenv("VISION_CACHE_SIZE", "128")))
+            db_path = os.getenv("VISION_CACHE_DB")
+            disk = SQLiteCache(
+                db_path, table="vision_cache",
+                max_entries=int(os.getenv("VISION_CACHE_DB_SIZE", "5000"))
+            ) if db_path else None
+            _mapping_cache = TieredCache(memory, disk, name="vision")
+        return _mapping_cache
+
+def set_mapping_cache(cache):
+    """Swap in any object with get(key) / set(key, value). Pass None to reset to the default."""
+    global _mapping_cache
+    with _mapping_cache_lock:
+        _mapping_cache = cache
+
+def mapping_cache_key(image_bytes, prompt: str, model_name: str, digests=None) -> str:
+    digest = hashlib.sha256()
+    digest.update(model_name.encode())
+    digest.update(b"\0")
+    digest.update(prompt.encode())
+    if digests:
+        # Upload sha256s were taken while the files streamed in; no need to hash the bytes again.
+        for image_digest in digests:
+            digest.update(b"sha256:" + image_digest.encode())
+        return digest.hexdigest()
+    for img in image_bytes:
+        # Length-prefix each image so the order and boundaries are part of the key.
+        digest.update(len(img).to_bytes(8, "big"))
+        digest.update(img)
+    return digest.hexdigest()
+
+def state_cache_key(state: AgentState, model_name: str = None) -> str:
+    return mapping_cache_key(state["image_bytes"], VISION_PROMPT, model_name or _model_name(), state.get("image_digests"))
+
+def _release_images(state: AgentState):
+    # Nothing after vision looks at the screenshots; don't carry them through the rest of the run.
+    state["image_bytes"] = []
 
 def get_client():
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError("GOOGLE_API_KEY not found in environment.")
-    return genai.Client(api_key=api_key)
+    return get_genai_client()
+
+def _model_name() -> str:
+    # Default to the fast, multimodal model
+    return os.getenv("MODEL_NAME", "gemini-2.5-flash")
+
+def _cached_mappings(cache_key: str):
+    cached = get_mapping_cache().get(cache_key)
+    if cached is None:
+        return None
+    print("   ⚡ Vision cache hit")
+    return {player: list(codes) for player, codes in cached.items()}
+
+def _build_contents(state: AgentState):
+    from google.genai import types
+    contents_parts = [VISION_PROMPT]
+
+    record_payload("vision_request", sum(len(img) for img in state["image_bytes"]))
+
+    # Attach images
+    mime_types = state.get("image_mime_types") or ["image/jpeg"] * len(state["image_bytes"])
+    for img_bytes, mime_type in zip(state["image_bytes"], mime_types):
+        contents_parts.append(
+            types.Part.from_bytes(data=img_bytes, mime_type=mime_type)
+        )
+    return contents_parts
+
+def _generation_config():
+    from google.genai import types
+    return types.GenerateContentConfig(
+        response_mime_type="application/json"
+    )
+
+def _parse_mappings(cache_key: str, response_text: str):
+    # Clean JSON
+    raw_text = response_text.strip()
+    if raw_text.startswith("```"):
+        raw_text = raw_text.replace("```json", "").replace("```", "")
+
+    mappings = json.loads(raw_text)
+    get_mapping_cache().set(cache_key, {player: list(codes) for player, codes in mappings.items()})
+    return mappings
 
 def vision_node(state: AgentState) -> AgentState:
     print(f"--- [Step 1] Vision: Processing {len(state['image_bytes'])} images ---")
-    
+
     try:
+        model_name = _model_name()
+        cache_key = state_cache_key(state, model_name)
+        cached = _cached_mappings(cache_key)
+        if cached is not None:
+            state["player_mappings"] = cached
+            _release_images(state)
+            return state
+
         client = get_client()
-        # Default to the fast, multimodal model
-        model_name = os.getenv("MODEL_NAME", "gemini-2.5-flash")
-
-        contents_parts = []
-        prompt_text = (
-            "Analyze these images of a cricket player list. "
-            "Extract a JSON mapping where:\n"
-            "- Keys are Player Names (string).\n"
-            "- Values are a list of their assigned codes (e.g. ['T1-1', 'T2-5']).\n"
-            "Return ONLY raw JSON. No markdown formatting."
-        )
-        contents_parts.append(prompt_text)
+        contents = _build_contents(state)
+        response = get_policy("gemini").call(lambda: client.models.generate_content(
+            model=model_name,
+            contents=contents,
+            config=_generation_config()
+        ))
+
+        state["player_mappings"] = _parse_mappings(cache_key, response.text)
+        _release_images(state)
+        return state
+
+    except Exception as e:
+        print(f"Vision Error: {e}")
+        state["final_results"] = {"error": f"Vision processing failed: {str(e)}"}
+        return state
 
-        # Attach images
-        for img_bytes in state["image_bytes"]:
-            contents_parts.append(
-                types.Part.from_bytes(data=img_bytes, mime_type="image/jpeg")
-            )
+async def vision_node_async(state: AgentState) -> AgentState:
+    print(f"--- [Step 1] Vision: Processing {len(state['image_bytes'])} images (async) ---")
+
+    try:
+        model_name = _model_name()
+        cache_key = state_cache_key(state, model_name)
+        cached = _cached_mappings(cache_key)
+        if cached is not None:
+            state["player_mappings"] = cached
+            _release_images(state)
+            return state
 
-        response = client.models.generate_content(
+        client = get_client()
+        contents = _build_contents(state)
+        response = await get_policy("gemini").acall(lambda: client.aio.models.generate_content(
             model=model_name,
-            contents=contents_parts,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json"
-            )
-        )
-        
-        # Clean JSON
-        raw_text = response.text.strip()
-        if raw_text.startswith("```"):
-            raw_text = raw_text.replace("```json", "").replace("```", "")
-            
-        mappings = json.loads(raw_text)
-        state["player_mappings"] = mappings
+            contents=contents,
+            config=_generation_config()
+        ))
+
+        state["player_mappings"] = _parse_mappings(cache_key, response.text)
+        _release_images(state)
         return state
 
     except Exception as e:
         print(f"Vision Error: {e}")
         state["final_results"] = {"error": f"Vision processing failed: {str(e)}"}
-        return state
\ No newline at end of file
+        return state
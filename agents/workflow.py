@@ -1,31 +1,277 @@
+import os
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, wait, FIRST_COMPLETED
 from .state import AgentState
-from .vision import vision_node
-from .scraper import scraper_node
+from .vision import vision_node, vision_node_async
+from .scraper import scraper_node, scraper_node_async, resolve_commentary
 from .auditor import auditor_node
-from .analyst import analyst_node
+from .analyst import analyst_node, analyst_node_async
 from .forecaster import forecaster_node
-from .commentator import commentator_node
+from .commentator import commentator_node, commentator_node_async
+from .limits import stage_slot
+from .telemetry import span, FALLBACKS
 
-def run_workflow(state: AgentState) -> AgentState:
+# Parallel Intelligence Layer
+ANALYST_TIMEOUT = float(os.getenv("ANALYST_TIMEOUT", "20"))
+FORECASTER_TIMEOUT = float(os.getenv("FORECASTER_TIMEOUT", "5"))
+COMMENTATOR_TIMEOUT = float(os.getenv("COMMENTATOR_TIMEOUT", "30"))
+
+# Used when a node overruns its timeout or crashes outright.
+def _analysis_fallback(state): return "Analysis unavailable."
+def _forecast_fallback(state): return {}
+def _summary_fallback(state): return f"{state['final_results'].get('winner', 'Unknown')} won."
+
+# Each node owns exactly one key of final_results: (key, node, timeout in seconds, fallback).
+INTELLIGENCE_LAYER = [
+    ("analysis", analyst_node, ANALYST_TIMEOUT, _analysis_fallback),
+    ("forecast", forecaster_node, FORECASTER_TIMEOUT, _forecast_fallback),
+    ("sarcastic_summary", commentator_node, COMMENTATOR_TIMEOUT, _summary_fallback),
+]
+
+# Shared across requests so a burst doesn't spawn a thread pool per call.
+_intelligence_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("INTELLIGENCE_WORKERS", "12")),
+    thread_name_prefix="intelligence",
+)
+
+def _stage_name(node) -> str:
+    return node.__name__.replace("_async", "").replace("_node", "").lstrip("_")
+
+def _timed(stage: str, node, state: AgentState) -> AgentState:
+    with span(stage) as s:
+        state = node(state)
+        if "error" in (state.get("final_results") or {}):
+            s.outcome = "error"
+    return state
+
+def _branch(state: AgentState) -> AgentState:
+    # Shallow copy with a private final_results so concurrent nodes never share a dict.
+    branch = dict(state)
+    branch["final_results"] = dict(state.get("final_results") or {})
+    return branch
+
+def run_intelligence_layer(state: AgentState) -> AgentState:
+    started = time.monotonic()
+    pending = [
+        # copy_context() carries the request's trace id into the worker thread.
+        (key, node, timeout, fallback, _intelligence_pool.submit(
+            contextvars.copy_context().run, _timed, _stage_name(node), node, _branch(state)
+        ))
+        for key, node, timeout, fallback in INTELLIGENCE_LAYER
+    ]
+
+    outputs = {}
+    for key, node, timeout, fallback, future in pending:
+        # Every node's deadline is measured from the fan-out, not from when we got to it.
+        remaining = max(0.0, started + timeout - time.monotonic())
+        try:
+            branch = future.result(timeout=remaining)
+            if key in branch.get("final_results", {}):
+                outputs[key] = branch["final_results"][key]
+        except FutureTimeout:
+            print(f"⏱️ {node.__name__} timed out after {timeout}s")
+            FALLBACKS.inc(stage=_stage_name(node), reason="timeout")
+            outputs[key] = fallback(state)
+        except Exception as e:
+            print(f"❌ {node.__name__} failed: {e}")
+            FALLBACKS.inc(stage=_stage_name(node), reason="error")
+            outputs[key] = fallback(state)
+
+    # Merge in declaration order so the result is the same whichever node finished first.
+    for key, _, _, _ in INTELLIGENCE_LAYER:
+        if key in outputs:
+            state["final_results"][key] = outputs[key]
+
+    print(f"--- Intelligence layer finished in {time.monotonic() - started:.2f}s ---")
+    return state
+
+# Async counterparts of INTELLIGENCE_LAYER: (key, stage, node, timeout, fallback).
+# Pure-Python nodes are wrapped so every entry is awaitable.
+async def _forecaster_node_async(state: AgentState) -> AgentState:
+    return forecaster_node(state)
+
+ASYNC_INTELLIGENCE_LAYER = [
+    ("analysis", "analyst", analyst_node_async, ANALYST_TIMEOUT, _analysis_fallback),
+    ("forecast", "forecaster", _forecaster_node_async, FORECASTER_TIMEOUT, _forecast_fallback),
+    ("sarcastic_summary", "commentator", commentator_node_async, COMMENTATOR_TIMEOUT, _summary_fallback),
+]
+
+_NO_OUTPUT = object()
+
+async def run_stage(stage: str, node, state: AgentState) -> AgentState:
+    """Runs one async node under its stage's concurrency limit and timing span."""
+    async with stage_slot(stage):
+        with span(stage) as s:
+            state = await node(state)
+            if "error" in (state.get("final_results") or {}):
+                s.outcome = "error"
+        return state
+
+def _emit(on_stage, stage: str, payload: dict):
+    if on_stage is not None:
+        on_stage(stage, payload)
+
+async def run_intelligence_layer_async(state: AgentState, on_stage=None) -> AgentState:
+    started = time.monotonic()
+
+    async def guarded(key, stage, node, timeout, fallback):
+        try:
+            branch = await asyncio.wait_for(run_stage(stage, node, _branch(state)), timeout=timeout)
+            value = branch.get("final_results", {}).get(key, _NO_OUTPUT)
+        except asyncio.TimeoutError:
+            print(f"⏱️ {node.__name__} timed out after {timeout}s")
+            FALLBACKS.inc(stage=stage, reason="timeout")
+            value = fallback(state)
+        except Exception as e:
+            print(f"❌ {node.__name__} failed: {e}")
+            FALLBACKS.inc(stage=stage, reason="error")
+            value = fallback(state)
+        # Report each node as soon as it lands; the merge below still waits for all of them.
+        if value is not _NO_OUTPUT:
+            _emit(on_stage, stage, {key: value})
+        return value
+
+    outputs = await asyncio.gather(*[guarded(*entry) for entry in ASYNC_INTELLIGENCE_LAYER])
+
+    # gather() preserves order, so the merge is deterministic.
+    for (key, _, _, _, _), value in zip(ASYNC_INTELLIGENCE_LAYER, outputs):
+        if value is not _NO_OUTPUT:
+            state["final_results"][key] = value
+
+    print(f"--- Intelligence layer finished in {time.monotonic() - started:.2f}s ---")
+    return state
+
+# --- Stage Graph ---
+# The stages before the intelligence layer, as a dependency graph. A stage starts as soon as
+# every stage it needs has finished, so vision and the scraper (which only needs the URLs)
+# run side by side and the auditor joins them. Each stage works on its own branch of the state
+# and only the keys it produces are merged back. The first stage to fail ends the run: queued
+# and async stages are cancelled, and a running sync stage is abandoned (its result is dropped).
+#
+# (stage, node, async node or None to run `node` inline, stages it needs, state keys it produces,
+#  payload for on_stage)
+PIPELINE = [
+    ("vision", vision_node, vision_node_async, (), ("player_mappings", "image_bytes"),
+     lambda s: {"player_mappings": s["player_mappings"]}),
+    ("scraper", scraper_node, scraper_node_async, (), ("match_scores", "match_commentary", "pending_commentary"),
+     lambda s: {"match_scores": s["match_scores"]}),
+    ("auditor", auditor_node, None, ("vision", "scraper"), ("final_results",),
+     lambda s: dict(s["final_results"])),
+]
+
+# Separate from the intelligence pool so a burst of scrapes can't starve the LLM fan-out.
+_stage_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv("STAGE_WORKERS", "16")),
+    thread_name_prefix="stage",
+)
+
+def _ready(pipeline, finished: set, started: set):
+    return [
+        entry for entry in pipeline
+        if entry[0] not in started and all(need in finished for need in entry[3])
+    ]
+
+def _merge(state: AgentState, entry, branch: AgentState) -> bool:
+    """Copies a finished stage's outputs into state. Returns False (and records the error) if it failed."""
+    if "error" in (branch.get("final_results") or {}):
+        state["final_results"] = branch["final_results"]
+        return False
+    for key in entry[4]:
+        if key in branch:
+            state[key] = branch[key]
+    return True
+
+def _cancelled(stages):
+    if stages:
+        print(f"🛑 Cancelled {', '.join(sorted(stages))} after an earlier stage failed")
+
+def run_graph(state: AgentState, pipeline=None) -> AgentState:
+    pipeline = PIPELINE if pipeline is None else pipeline
+    finished, started, running = set(), set(), {}
     try:
-        # Sequential
-        state = vision_node(state)
-        if "error" in state.get("final_results", {}): return state
+        while len(finished) < len(pipeline):
+            for entry in _ready(pipeline, finished, started):
+                started.add(entry[0])
+                # copy_context() carries the request's trace id into the worker thread.
+                running[_stage_pool.submit(
+                    contextvars.copy_context().run, _timed, entry[0], entry[1], _branch(state)
+                )] = entry
+            if not running:
+                raise RuntimeError(f"Stages can never start: {sorted(e[0] for e in pipeline if e[0] not in started)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                entry = running.pop(future)
+                if not _merge(state, entry, future.result()):
+                    return state
+                finished.add(entry[0])
+        return state
+    finally:
+        for future in running:
+            future.cancel()
+        _cancelled({entry[0] for entry in running.values()})
+
+async def _run_graph_stage(entry, state: AgentState) -> AgentState:
+    stage, node, async_node = entry[:3]
+    if async_node is None:
+        return _timed(stage, node, state)
+    return await run_stage(stage, async_node, state)
+
+async def run_graph_async(state: AgentState, on_stage=None, pipeline=None) -> AgentState:
+    pipeline = PIPELINE if pipeline is None else pipeline
+    finished, started, running = set(), set(), {}
+    try:
+        while len(finished) < len(pipeline):
+            for entry in _ready(pipeline, finished, started):
+                started.add(entry[0])
+                running[asyncio.ensure_future(_run_graph_stage(entry, _branch(state)))] = entry
+            if not running:
+                raise RuntimeError(f"Stages can never start: {sorted(e[0] for e in pipeline if e[0] not in started)}")
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                entry = running.pop(task)
+                if not _merge(state, entry, task.result()):
+                    return state
+                finished.add(entry[0])
+                _emit(on_stage, entry[0], entry[5](state))
+        return state
+    finally:
+        for task in running:
+            task.cancel()
+        _cancelled({entry[0] for entry in running.values()})
 
-        state = scraper_node(state)
+async def run_workflow_async(state: AgentState, on_stage=None) -> AgentState:
+    """
+    Same pipeline as run_workflow, awaiting the async SDKs instead of holding a thread.
+    on_stage(stage, payload) is called with each stage's output as soon as it is ready.
+    """
+    try:
+        # Vision and scraper in parallel, then the auditor.
+        state = await run_graph_async(state, on_stage)
         if "error" in state.get("final_results", {}): return state
 
-        state = auditor_node(state)
+        state = await run_intelligence_layer_async(state, on_stage)
+
+        # Normally already in, since the commentator waited for it.
+        state = await resolve_commentary(state)
+        return state
+
+    except Exception as e:
+        state["final_results"] = {"error": f"Workflow Error: {str(e)}"}
+        return state
+
+def run_workflow(state: AgentState) -> AgentState:
+    try:
+        # Vision and scraper in parallel, then the auditor.
+        state = run_graph(state)
         if "error" in state.get("final_results", {}): return state
 
         # Parallel Intelligence Layer
-        # (In a real async system, these would run simultaneously)
-        state = analyst_node(state)
-        state = forecaster_node(state)
-        state = commentator_node(state)
-        
+        state = run_intelligence_layer(state)
+
         return state
 
     except Exception as e:
         state["final_results"] = {"error": f"Workflow Error: {str(e)}"}
-        return state
\ No newline at end of file
+        return state
@@ -1,67 +1,532 @@
+import os
+import json
+import time
 import asyncio
+from contextlib import asynccontextmanager
 from typing import List
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, Request, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from dotenv import load_dotenv
-from agents.workflow import run_workflow
+from agents.workflow import run_workflow_async
+from agents.limits import AdmissionController, Overloaded
+from agents.browser_pool import start_browser_pool, shutdown_browser_pool, get_browser_pool
+from agents.scraper import get_scrape_cache, SCRAPER_MODE
+from agents.scrape_service import get_scrape_service, shutdown_scrape_service
+from agents.vision import get_mapping_cache
+from agents.preprocess import preprocess_images_async
+from agents.jobs import JobStore
+from agents.batch import new_league_state, batch_plan, run_batch_async
+from agents.store import get_results_store, DEFAULT_LEAGUE, match_id_from_url
+from agents.scraper import is_match_finished
+from agents.form import get_form_book, load_form_history
+from agents.live import LiveTracker
+from agents.vision import vision_node_async
+from agents.workflow import run_stage
+from agents.resilience import breaker_stats
+from agents.batcher import vertex_batch_stats
+from agents.clients import warm_up
+from agents.uploads import read_uploads, close_uploads, BodySizeLimit, UploadTooLarge
+from agents.telemetry import (
+    REGISTRY, HTTP_DURATION, new_trace_id, set_trace_id, current_trace_id,
+    record_payload, set_component_stats
+)
 
 load_dotenv()
 
-app = FastAPI(title="The 12th Man API")
+# --- Startup ---
+
+# background: accept traffic straight away and warm SDKs/Chromium behind it (first requests may still pay).
+# blocking: finish warming before the app reports ready. off: everything loads on first use.
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "background")
+STARTUP_WARMUP_SHUTDOWN_WAIT = 10
+
+async def _warm_up():
+    started = time.perf_counter()
+    # One warm Chromium per process instead of one per request, unless scrapes go to worker processes.
+    if SCRAPER_MODE == "local":
+        try:
+            await asyncio.to_thread(start_browser_pool)
+        except Exception as e:
+            print(f"⚠️ Browser pool failed to start, will retry on first scrape: {e}")
+    timings = await asyncio.to_thread(warm_up)
+    steps = ", ".join(f"{name} {seconds}s" for name, seconds in timings.items())
+    print(f"🔥 Warm-up done in {time.perf_counter() - started:.2f}s ({steps})")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if SCRAPER_MODE == "service":
+        await asyncio.to_thread(get_scrape_service().start)
+    warming = None
+    if STARTUP_WARMUP == "blocking":
+        await _warm_up()
+    elif STARTUP_WARMUP == "background":
+        warming = asyncio.create_task(_warm_up())
+    # Rebuild rolling form from stored history once; after that each match is folded in as it finishes.
+    if get_results_store() is not None:
+        try:
+            loaded = await asyncio.to_thread(load_form_history, get_results_store())
+            print(f"📈 Form loaded from {loaded} finished matches")
+        except Exception as e:
+            print(f"⚠️ Could not load form history: {e}")
+    yield
+    # Live sessions would otherwise keep polling into a closed browser pool.
+    for tracker in list(live_trackers.values()):
+        tracker.job.task.cancel()
+    # A browser launch can't be interrupted midway; let it finish so shutdown below closes it.
+    if warming is not None and not warming.done():
+        await asyncio.wait([warming], timeout=STARTUP_WARMUP_SHUTDOWN_WAIT)
+    await asyncio.to_thread(shutdown_browser_pool)
+    await asyncio.to_thread(shutdown_scrape_service)
+
+app = FastAPI(title="The 12th Man API", lifespan=lifespan)
+
+# Bounded concurrency: excess requests queue briefly, then get turned away with Retry-After.
+admission = AdmissionController()
+jobs = JobStore()
 
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
 
+# Oversized uploads are refused while the body arrives, before the multipart form is parsed.
+app.add_middleware(BodySizeLimit)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    # Every request gets a trace id (or keeps the caller's) that follows it through the agents.
+    trace_id = request.headers.get("X-Trace-Id") or new_trace_id()
+    set_trace_id(trace_id)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Trace-Id"] = trace_id
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_DURATION.observe(
+            time.perf_counter() - started,
+            route=getattr(route, "path", "unmatched"),
+            method=request.method,
+            status=status
+        )
+
+@app.get("/metrics")
+async def metrics():
+    set_component_stats("browser_pool", get_browser_pool().stats())
+    if SCRAPER_MODE != "local":
+        set_component_stats("scrape_service", await asyncio.to_thread(get_scrape_service().stats))
+    set_component_stats("scrape_cache", get_scrape_cache().stats())
+    set_component_stats("vision_cache", get_mapping_cache().stats())
+    set_component_stats("admission", admission.stats())
+    set_component_stats("jobs", {"tracked": len(jobs)})
+    for dependency, stats in breaker_stats().items():
+        set_component_stats(f"breaker_{dependency}", stats)
+    set_component_stats("vertex_batcher", vertex_batch_stats())
+    if get_results_store() is not None:
+        set_component_stats("results_store", await asyncio.to_thread(get_results_store().stats))
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/health")
+async def health():
+    return {
+        "status": "ok",
+        "browser_pool": get_browser_pool().stats(),
+        "scrape_service": await asyncio.to_thread(get_scrape_service().stats) if SCRAPER_MODE != "local" else None,
+        "scrape_cache": get_scrape_cache().stats(),
+        "vision_cache": get_mapping_cache().stats(),
+        "admission": admission.stats(),
+        "jobs": len(jobs),
+        "results_store": await asyncio.to_thread(get_results_store().stats) if get_results_store() is not None else None,
+        "form": get_form_book().stats(),
+        "breakers": breaker_stats(),
+        "vertex_batcher": vertex_batch_stats(),
+    }
+
 @app.post("/api/calculate")
 async def calculate_settlements(
     match_url: str = Form(...), 
     commentary_url: str = Form(...),
-    files: List[UploadFile] = File(...)
+    files: List[UploadFile] = File(...),
+    league: str = Form(DEFAULT_LEAGUE)
 ):
     if not files:
         raise HTTPException(status_code=400, detail="No files uploaded")
 
-    print(f"📥 Processing: {match_url}")
-
-    image_bytes_list = []
-    for file in files:
-        content = await file.read()
-        image_bytes_list.append(content)
-
-    initial_state = {
-        "image_bytes": image_bytes_list,
-        "match_url": match_url,
-        "commentary_url": commentary_url,
-        "player_mappings": {},
-        "match_scores": {},
-        "match_commentary": [],
-        "final_results": {}
+    try:
+        async with admission.admit():
+            return await _settle(match_url, commentary_url, await _read_uploads(files), league)
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+async def _read_uploads(files: List[UploadFile]):
+    try:
+        uploads = await read_uploads(files)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    for upload in uploads:
+        record_payload("upload", upload.size)
+    return uploads
+
+async def _prepare_state(match_url: str, commentary_url: str, uploads, close: bool = True):
+    # Raw bytes only exist between here and preprocessing; the state carries the shrunk copies.
+    # Large uploads are spooled to disk, so read them off the event loop.
+    try:
+        image_bytes_list = await asyncio.to_thread(lambda: [upload.read() for upload in uploads])
+        digests = [upload.sha256 for upload in uploads]
+    finally:
+        if close:
+            close_uploads(uploads)
+
+    # Shrink screenshots off the event loop before they go anywhere near Gemini.
+    image_bytes_list, mime_types, image_stats = await preprocess_images_async(image_bytes_list)
+    print(f"🖼️ Preprocessed {image_stats['images_in']} images, saved {image_stats['bytes_saved']} bytes")
+
+    initial_state = new_league_state(match_url, commentary_url, image_bytes_list, mime_types, digests)
+    return initial_state, image_stats
+
+def _response_data(final_state, image_stats) -> dict:
+    res = final_state.get("final_results", {})
+    return {
+        "winner": res.get("winner"),
+        "winner_score": res.get("winner_score"),
+        "total_pot": res.get("total_pot_gbp"),
+        "leaderboard": res.get("leaderboard"),
+        "sarcastic_summary": res.get("sarcastic_summary"),
+        "analysis": res.get("analysis"),
+        "forecast": res.get("forecast"),
+        "settlements": res.get("settlements"),
+        "player_mappings": final_state.get("player_mappings"),
+        "detailed_scores": final_state.get("match_scores"),
+        "image_stats": image_stats
     }
 
+async def _persist(match_url: str, league: str, data: dict, finished: bool = False):
+    # Only final scores count towards form; ingest is idempotent per match, so many leagues are fine.
+    if finished:
+        get_form_book().ingest(match_id_from_url(match_url), data.get("detailed_scores") or {})
+
+    # History is a convenience; a failed write must never fail the settlement itself.
+    store = get_results_store()
+    if store is None:
+        return
     try:
-        final_state = await asyncio.to_thread(run_workflow, initial_state)
+        await asyncio.to_thread(store.save_settlement, match_url, league, data, current_trace_id(), finished)
+    except Exception as e:
+        print(f"⚠️ Could not store settlement for {match_url}: {e}")
+
+async def _settle(match_url: str, commentary_url: str, uploads, league: str = DEFAULT_LEAGUE):
+    print(f"📥 Processing [{current_trace_id()}]: {match_url}")
+
+    initial_state, image_stats = await _prepare_state(match_url, commentary_url, uploads)
+
+    try:
+        final_state = await run_workflow_async(initial_state)
         res = final_state.get("final_results", {})
         
         if "error" in res:
             raise HTTPException(status_code=500, detail=res["error"])
 
+        data = _response_data(final_state, image_stats)
+        await _persist(match_url, league, data, is_match_finished(final_state.get("match_commentary", [])))
+
         return {
             "status": "success",
-            "data": {
-                "winner": res.get("winner"),
-                "winner_score": res.get("winner_score"),
-                "total_pot": res.get("total_pot_gbp"),
-                "sarcastic_summary": res.get("sarcastic_summary"),
-                "analysis": res.get("analysis"),
-                "forecast": res.get("forecast"),
-                "settlements": res.get("settlements"),
-                "player_mappings": final_state.get("player_mappings"),
-                "detailed_scores": final_state.get("match_scores")
-            }
+            "trace_id": current_trace_id(),
+            "data": data
         }
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- Batch: many leagues, shared scrapes and vision calls ---
+
+@app.post("/api/batch")
+async def settle_batch(
+    manifest: str = Form(...),
+    files: List[UploadFile] = File(...),
+    stream: bool = Form(False),
+    intelligence: bool = Form(True)
+):
+    """
+    manifest is a JSON list of {"league", "match_url", "commentary_url", "files": [upload filenames]}.
+    Returns one document, or JSON lines as each league settles when stream=true.
+    """
+    try:
+        entries = json.loads(manifest)
+        assert isinstance(entries, list) and entries
+    except Exception:
+        raise HTTPException(status_code=400, detail="manifest must be a non-empty JSON list")
+
+    received = await _read_uploads(files)
+    # The manifest refers to screenshots by filename, so each name must pick out exactly one upload.
+    names = [upload.filename for upload in received]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        close_uploads(received)
+        raise HTTPException(status_code=400, detail=f"Duplicate upload filenames: {duplicates}")
+    uploads = {upload.filename: upload for upload in received}
+    prepared = []
+    try:
+        for entry in entries:
+            missing = [name for name in entry.get("files", []) if name not in uploads]
+            if not entry.get("files") or missing or "match_url" not in entry:
+                raise HTTPException(status_code=400, detail=f"Bad manifest entry for league {entry.get('league')!r}: missing {missing or 'files/match_url'}")
+            # Leagues can share screenshots, so the uploads stay open until every entry is prepared.
+            prepared.append(await _prepare_state(
+                entry["match_url"], entry.get("commentary_url", entry["match_url"]),
+                [uploads[name] for name in entry["files"]], close=False
+            ))
+    finally:
+        close_uploads(received)
+
+    states = [state for state, _ in prepared]
+    plan = batch_plan(states)
+    print(f"📦 Batch [{current_trace_id()}]: {plan}")
+
+    def line(index, final_state):
+        res = final_state.get("final_results", {})
+        result = {"league": entries[index].get("league"), "match_url": final_state["match_url"]}
+        if "error" in res:
+            result.update(status="error", error=res["error"])
+        else:
+            result.update(status="success", data=_response_data(final_state, prepared[index][1]))
+        return result
+
+    async def settled(index, final_state):
+        result = line(index, final_state)
+        if result["status"] == "success":
+            finished = is_match_finished(final_state.get("match_commentary", []))
+            await _persist(result["match_url"], result["league"], result["data"], finished)
+        return result
+
+    # The whole batch counts as one workflow against admission control.
+    try:
+        if not stream:
+            async with admission.admit():
+                results = [None] * len(states)
+                async for index, final_state in run_batch_async(states, intelligence):
+                    results[index] = await settled(index, final_state)
+            return {"status": "success", "trace_id": current_trace_id(), "plan": plan, "leagues": results}
+
+        admission.check()
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    trace_id = current_trace_id()
+
+    async def ndjson():
+        # The body is produced after the middleware returns, so carry the trace id over.
+        set_trace_id(trace_id)
+        try:
+            async with admission.admit():
+                yield json.dumps({"plan": plan, "trace_id": trace_id}) + "\n"
+                async for index, final_state in run_batch_async(states, intelligence):
+                    yield json.dumps(await settled(index, final_state)) + "\n"
+        except Overloaded as e:
+            yield json.dumps({"status": "error", "error": str(e), "status_code": e.status_code}) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+# --- Jobs: submit now, poll or stream stage results as they land ---
+
+@app.post("/api/jobs", status_code=202)
+async def submit_job(
+    match_url: str = Form(...),
+    commentary_url: str = Form(...),
+    files: List[UploadFile] = File(...),
+    league: str = Form(DEFAULT_LEAGUE)
+):
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+
+    try:
+        admission.check()
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    # Uploads are closed once this request returns, so spool them now.
+    uploads = await _read_uploads(files)
+
+    job = jobs.create()
+    job.trace_id = current_trace_id()
+    job.task = asyncio.create_task(_run_job(job, match_url, commentary_url, uploads, league))
+    print(f"📥 Job {job.id}: {match_url}")
+
+    return {
+        "job_id": job.id,
+        "trace_id": job.trace_id,
+        "status": job.status,
+        "status_url": f"/api/jobs/{job.id}",
+        "events_url": f"/api/jobs/{job.id}/events"
+    }
+
+async def _run_job(job, match_url: str, commentary_url: str, uploads, league: str = DEFAULT_LEAGUE):
+    try:
+        async with admission.admit():
+            job.start()
+            initial_state, image_stats = await _prepare_state(match_url, commentary_url, uploads)
+            final_state = await run_workflow_async(initial_state, on_stage=job.publish)
+
+            res = final_state.get("final_results", {})
+            if "error" in res:
+                job.fail(res["error"])
+            else:
+                data = _response_data(final_state, image_stats)
+                await _persist(match_url, league, data, is_match_finished(final_state.get("match_commentary", [])))
+                job.succeed(data)
+    except asyncio.CancelledError:
+        # Shutdown or a cancelled task: end the job so status pollers and event subscribers don't wait forever.
+        job.fail("Cancelled", 503)
+        raise
+    except Overloaded as e:
+        job.fail(str(e), e.status_code)
+    except Exception as e:
+        job.fail(f"Workflow Error: {str(e)}")
+    finally:
+        close_uploads(uploads)
+
+def _get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+@app.get("/api/jobs/{job_id}")
+async def job_status(job_id: str):
+    return _get_job(job_id).snapshot()
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    job = _get_job(job_id)
+
+    async def sse():
+        async for event in job.stream():
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+    return StreamingResponse(
+        sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# --- History: served from the results store, no pipeline run ---
+# Store calls are blocking SQLite behind a lock that settlement writes also hold, so they run on a thread.
+
+def _store():
+    store = get_results_store()
+    if store is None:
+        raise HTTPException(status_code=503, detail="Results store is disabled (set RESULTS_DB to enable it)")
+    return store
+
+@app.get("/api/settlements")
+async def list_settlements(league: str = None, limit: int = 50):
+    return {"settlements": await asyncio.to_thread(_store().list_settlements, league, min(limit, 500))}
+
+@app.get("/api/settlements/{match_id}")
+async def get_settlement(match_id: str, league: str = DEFAULT_LEAGUE):
+    settlement = await asyncio.to_thread(_store().get_settlement, match_id, league)
+    if settlement is None:
+        raise HTTPException(status_code=404, detail="No stored settlement for this match and league")
+    return settlement
+
+@app.get("/api/players/{player}/history")
+async def player_history(player: str, league: str = None, limit: int = 100):
+    return {"player": player, "league": league, "matches": await asyncio.to_thread(_store().player_history, player, league, min(limit, 1000))}
+
+@app.get("/api/leagues/{league}/season")
+async def season_totals(league: str):
+    return {"league": league, "players": await asyncio.to_thread(_store().season_totals, league)}
+
+# --- Live: extract mappings once, then poll the scorecard and push leaderboard changes ---
+
+MAX_LIVE_MATCHES = int(os.getenv("MAX_LIVE_MATCHES", "20"))
+live_trackers = {}
+
+@app.post("/api/live", status_code=202)
+async def start_live(
+    match_url: str = Form(...),
+    commentary_url: str = Form(...),
+    files: List[UploadFile] = File(...),
+    league: str = Form(DEFAULT_LEAGUE),
+    interval: float = Form(None)
+):
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+
+    try:
+        if len(live_trackers) >= MAX_LIVE_MATCHES:
+            raise Overloaded("Too many live matches being tracked.", admission.retry_after, 429)
+        admission.check()
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    uploads = await _read_uploads(files)
+
+    job = jobs.create("live")
+    job.trace_id = current_trace_id()
+    tracker = live_trackers[job.id] = LiveTracker(job, interval)
+    job.task = asyncio.create_task(_run_live(tracker, match_url, commentary_url, uploads, league))
+    print(f"📡 Live {job.id}: {match_url} every {tracker.interval}s")
+
+    return {
+        "live_id": job.id,
+        "trace_id": job.trace_id,
+        "interval": tracker.interval,
+        "status_url": f"/api/jobs/{job.id}",
+        "events_url": f"/api/jobs/{job.id}/events",
+        "stop_url": f"/api/live/{job.id}"
+    }
+
+async def _run_live(tracker, match_url: str, commentary_url: str, uploads, league: str):
+    job = tracker.job
+
+    async def extract_mappings(state):
+        # Only the vision call counts against admission; polling is cheap and long-lived.
+        async with admission.admit():
+            return await run_stage("vision", vision_node_async, state)
+
+    try:
+        initial_state, image_stats = await _prepare_state(match_url, commentary_url, uploads)
+        await tracker.run(initial_state, extract_mappings)
+        if job.status == "succeeded" and job.result.get("finished"):
+            await _persist(match_url, league, _response_data(tracker.state, image_stats), finished=True)
+    except asyncio.CancelledError:
+        tracker.stop()
+    except Overloaded as e:
+        job.fail(str(e), e.status_code)
+    except Exception as e:
+        job.fail(f"Live Error: {str(e)}")
+    finally:
+        close_uploads(uploads)
+        live_trackers.pop(job.id, None)
+
+@app.delete("/api/live/{live_id}")
+async def stop_live(live_id: str):
+    tracker = live_trackers.get(live_id)
+    if tracker is None:
+        raise HTTPException(status_code=404, detail="No live match with this id is running")
+    tracker.job.task.cancel()
+    await asyncio.gather(tracker.job.task, return_exceptions=True)
+    return tracker.job.snapshot()
@@ -1,11 +1,23 @@
+import os
+import json
+import time
+import hashlib
 import streamlit as st
 import requests
 import pandas as pd
-import json
+from requests.adapters import HTTPAdapter
 
 st.set_page_config(page_title="The 12th Man", page_icon="🏏", layout="wide", initial_sidebar_state="expanded")
 
-API_URL = "[http://127.0.0.1:8000/api/calculate](http://127.0.0.1:8000/api/calculate)"
+# --- API Client Settings ---
+API_BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:8000").rstrip("/")
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "5"))
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "30"))
+# Longest silence tolerated on the event stream before falling back to polling.
+API_STREAM_TIMEOUT = float(os.getenv("API_STREAM_TIMEOUT", "120"))
+JOB_WAIT_TIMEOUT = float(os.getenv("JOB_WAIT_TIMEOUT", "600"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "3600"))
 
 st.markdown("""
     <style>
@@ -23,12 +35,257 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# --- API Client ---
+# Every widget interaction reruns this script, so nothing below may start a pipeline run on its
+# own: a job is only submitted when the button is pressed with inputs we have not seen before,
+# and a finished job's result is cached per input hash.
+
+class JobPending(Exception):
+    pass
+
+class JobFailed(Exception):
+    pass
+
+class JobGone(Exception):
+    pass
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """One keep-alive session for the whole frontend process."""
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    return session
+
+@st.cache_resource
+def known_jobs() -> dict:
+    """input hash -> job id, shared by every browser session so identical inputs reuse one run."""
+    return {}
+
+def input_hash(match_url: str, commentary_url: str, files) -> str:
+    digest = hashlib.sha256(f"{match_url}\n{commentary_url}\n".encode())
+    for f in files:
+        digest.update(hashlib.sha256(f.getvalue()).digest())
+    return digest.hexdigest()
+
+def submit_job(match_url: str, commentary_url: str, files) -> str:
+    response = get_session().post(
+        f"{API_BASE_URL}/api/jobs",
+        data={"match_url": match_url, "commentary_url": commentary_url},
+        files=[("files", (f.name, f.getvalue(), f.type)) for f in files],
+        timeout=(API_CONNECT_TIMEOUT, API_READ_TIMEOUT),
+    )
+    if response.status_code in (429, 503):
+        retry = response.headers.get("Retry-After", "a few")
+        raise JobFailed(f"The API is busy, try again in {retry} seconds.")
+    response.raise_for_status()
+    return response.json()["job_id"]
+
+@st.cache_data(ttl=RESULT_CACHE_TTL, max_entries=64, show_spinner=False)
+def job_result(key: str, _job_id: str) -> dict:
+    """
+    Result of a finished job, cached per input hash (the job id is not part of the cache key).
+    Unfinished and failed jobs raise, and exceptions are never cached.
+    """
+    response = get_session().get(f"{API_BASE_URL}/api/jobs/{_job_id}", timeout=(API_CONNECT_TIMEOUT, API_READ_TIMEOUT))
+    if response.status_code == 404:
+        raise JobGone(_job_id)
+    response.raise_for_status()
+    snapshot = response.json()
+    if snapshot["status"] == "failed":
+        raise JobFailed(snapshot.get("error") or "Unknown error")
+    if snapshot["status"] != "succeeded":
+        raise JobPending(snapshot["status"])
+    return snapshot["result"]
+
+def job_events(job_id: str):
+    """Yields (stage, payload) as the API publishes them: over SSE, or by polling if the stream drops."""
+    seen = set()
+    try:
+        with get_session().get(f"{API_BASE_URL}/api/jobs/{job_id}/events", stream=True,
+                               timeout=(API_CONNECT_TIMEOUT, API_STREAM_TIMEOUT)) as response:
+            response.raise_for_status()
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: ") and event:
+                    seen.add(event)
+                    yield event, json.loads(line[len("data: "):])
+                    if event == "done":
+                        return
+    except requests.RequestException as e:
+        print(f"⚠️ Event stream for job {job_id} dropped ({e}); polling instead")
+
+    deadline = time.monotonic() + JOB_WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        response = get_session().get(f"{API_BASE_URL}/api/jobs/{job_id}", timeout=(API_CONNECT_TIMEOUT, API_READ_TIMEOUT))
+        if response.status_code == 404:
+            raise JobGone(job_id)
+        response.raise_for_status()
+        snapshot = response.json()
+        for stage in snapshot["stages"]:
+            if stage not in seen:
+                seen.add(stage)
+                yield stage, snapshot["partial"][stage]
+        if snapshot["status"] in ("succeeded", "failed"):
+            yield "done", {"status": snapshot["status"], "error": snapshot.get("error")}
+            return
+        time.sleep(JOB_POLL_INTERVAL)
+    raise TimeoutError(f"Job {job_id} did not finish within {JOB_WAIT_TIMEOUT:.0f}s")
+
+# Stage payloads use the workflow's field names; the final result uses the API's.
+RESULT_FIELDS = {"match_scores": "detailed_scores", "total_pot_gbp": "total_pot"}
+
+def merge_stage(data: dict, payload: dict):
+    for field, value in payload.items():
+        data[RESULT_FIELDS.get(field, field)] = value
+
+# --- Rendering (no API calls from here down) ---
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def breakdown_frame(mappings: dict, scores: dict) -> pd.DataFrame:
+    rows = []
+    for p, codes in mappings.items():
+        r = {"Player": p}
+        tot = 0
+        for i, c in enumerate(codes, 1):
+            val = scores.get(c, 0)
+            r[f"Code {i}"] = f"{c} ({val})"
+            tot += val
+        r["Total Runs"] = tot
+        rows.append(r)
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame(rows)
+    cols = ["Player", "Total Runs"] + [c for c in df.columns if c.startswith("Code")]
+    return df[[c for c in cols if c in df.columns]]
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def payments_frame(settlements: dict) -> pd.DataFrame:
+    df_pay = pd.DataFrame(list(settlements.items()), columns=["Player", "Amount Due"])
+    df_pay["Amount Due"] = df_pay["Amount Due"].map("£{:.2f}".format)
+    return df_pay
+
+def render_leaderboard(slot, data: dict, sort_by: str):
+    if data.get("winner") is None:
+        return
+    winner = data.get("winner", "Unknown")
+    score = data.get("winner_score", 0)
+    pot = data.get("total_pot") or 0.0
+    sarcasm = data.get("sarcastic_summary") or "🎙️ The commentator is still warming up..."
+
+    with slot.container():
+        # --- RESULTS ---
+        st.divider()
+        c1, c2, c3 = st.columns([1, 2, 1])
+        with c1: st.metric("💰 Total Pot", f"£{pot:.2f}")
+        with c2:
+            st.markdown(f"""
+            <div class="winner-card">
+                <h3>🏆 WINNER</h3>
+                <h1 style="margin:0; font-size: 3rem;">{winner}</h1>
+                <p style="margin:0; font-size: 1.2rem;">{score} Runs</p>
+                <hr style="border-top:1px solid rgba(0,0,0,0.2);">
+                <p style="font-style: italic;">"{sarcasm}"</p>
+            </div>""", unsafe_allow_html=True)
+        with c3: st.metric("➗ Formula", "Diff / 5")
+
+        # --- TABLE ---
+        st.markdown("### 📊 Breakdown")
+        df = breakdown_frame(data.get("player_mappings") or {}, data.get("detailed_scores") or {})
+        if not df.empty:
+            df = df.sort_values(sort_by, ascending=(sort_by == "Player"))
+            def highlight(s): return ['background-color: #d4edda' if v == winner else '' for v in s]
+            st.dataframe(df.style.apply(highlight, subset=['Player']), use_container_width=True, hide_index=True)
+
+        # --- PAYMENTS ---
+        settlements = data.get("settlements", {})
+        if settlements:
+            st.markdown("### 💸 Payments")
+            col_pay, _ = st.columns([1, 1])
+            with col_pay: st.dataframe(payments_frame(settlements), use_container_width=True, hide_index=True)
+
+def render_insights(slot, data: dict):
+    if data.get("winner") is None:
+        return
+    with slot.container():
+        # --- INSIGHTS ---
+        st.divider()
+        ca, cb = st.columns(2)
+        with ca:
+            if data.get("analysis"):
+                st.info(f"**📈 Analyst:**\n\n{data.get('analysis')}")
+            else:
+                st.info("**📈 Analyst:** ⏳ thinking...")
+        with cb:
+            fc = data.get("forecast")
+            if fc:
+                st.success(f"**🔥 Hot Pick:** {fc.get('hot_pick')} ({fc.get('reason')})")
+            else:
+                st.success("**🔥 Hot Pick:** ⏳ crunching form...")
+
+def show_job(key: str, job_id: str, sort_by: str):
+    # Leaderboard first, LLM panels underneath as they land.
+    leaderboard_slot, insights_slot = st.empty(), st.empty()
+    try:
+        data = job_result(key, job_id)
+    except JobPending:
+        data = None
+    except JobGone:
+        known_jobs().pop(key, None)
+        st.warning("⚠️ The API no longer has this result (it may have restarted). Press Calculate to run it again.")
+        return
+    except (JobFailed, requests.RequestException) as e:
+        known_jobs().pop(key, None)
+        st.error(f"Error: {e}")
+        return
+
+    if data is None:
+        data = {}
+        with st.status("📡 Working on it...", expanded=False) as status:
+            try:
+                for stage, payload in job_events(job_id):
+                    if stage == "done":
+                        break
+                    if stage == "status":
+                        status.update(label=f"📡 Job {payload.get('status')}...")
+                        continue
+                    merge_stage(data, payload)
+                    status.write(f"✅ {stage}")
+                    status.update(label=f"📡 {stage} finished...")
+                    render_leaderboard(leaderboard_slot, data, sort_by)
+                    render_insights(insights_slot, data)
+            except JobGone:
+                known_jobs().pop(key, None)
+                status.update(label="❌ Lost track of the job", state="error")
+                st.warning("⚠️ The API no longer has this job (it may have restarted). Press Calculate to run it again.")
+                return
+            except (TimeoutError, requests.RequestException) as e:
+                # Polling gave up or the API errored: forget the job so Calculate starts afresh.
+                known_jobs().pop(key, None)
+                status.update(label="❌ Lost track of the job", state="error")
+                st.error(f"Error: {e}")
+                return
+            status.update(label="✅ Success!", state="complete")
+        try:
+            data = job_result(key, job_id)
+        except (JobFailed, JobGone, requests.RequestException) as e:
+            known_jobs().pop(key, None)
+            st.error(f"Error: {e}")
+            return
+
+    render_leaderboard(leaderboard_slot, data, sort_by)
+    render_insights(insights_slot, data)
+
 with st.sidebar:
-    st.image("[https://cdn-icons-png.flaticon.com/512/1055/1055670.png](https://cdn-icons-png.flaticon.com/512/1055/1055670.png)", width=80)
+    st.image("https://cdn-icons-png.flaticon.com/512/1055/1055670.png", width=80)
     st.markdown("### ⚙️ Match Setup")
     match_url = st.text_input("🔗 Scorecard URL")
     commentary_url = st.text_input("🔗 Commentary URL")
     uploaded_files = st.file_uploader("📸 Screenshots", type=["jpg", "png"], accept_multiple_files=True)
+    st.markdown("### 📊 View")
+    sort_by = st.selectbox("Sort breakdown by", ["Total Runs", "Player"])
 
 st.markdown('<div class="main-header"><h1>🏏 The 12th Man</h1><p>Powered by Google Vertex AI (Gemini + Gemma)</p></div>', unsafe_allow_html=True)
 
@@ -36,74 +293,19 @@ if st.button("🚀 Calculate Results", type="primary"):
     if not match_url or not commentary_url or not uploaded_files:
         st.warning("⚠️ Missing Inputs.")
     else:
-        try:
-            with st.status("📡 Connecting to Google Cloud API...", expanded=True) as status:
-                files_payload = [("files", (f.name, f.getvalue(), f.type)) for f in uploaded_files]
-                payload = {"match_url": match_url, "commentary_url": commentary_url}
-                
-                response = requests.post(API_URL, data=payload, files=files_payload)
-                response.raise_for_status()
-                data = response.json().get("data", {})
-                status.update(label="✅ Success!", state="complete", expanded=True)
-
-                # --- RESULTS ---
-                st.divider()
-                winner = data.get("winner", "Unknown")
-                score = data.get("winner_score", 0)
-                pot = data.get("total_pot", 0.0)
-                sarcasm = data.get("sarcastic_summary", "")
-
-                c1, c2, c3 = st.columns([1, 2, 1])
-                with c1: st.metric("💰 Total Pot", f"£{pot:.2f}")
-                with c2: 
-                    st.markdown(f"""
-                    <div class="winner-card">
-                        <h3>🏆 WINNER</h3>
-                        <h1 style="margin:0; font-size: 3rem;">{winner}</h1>
-                        <p style="margin:0; font-size: 1.2rem;">{score} Runs</p>
-                        <hr style="border-top:1px solid rgba(0,0,0,0.2);">
-                        <p style="font-style: italic;">"{sarcasm}"</p>
-                    </div>""", unsafe_allow_html=True)
-                with c3: st.metric("➗ Formula", "Diff / 5")
-
-                # --- INSIGHTS ---
-                st.divider()
-                ca, cb = st.columns(2)
-                with ca: st.info(f"**📈 Analyst:**\n\n{data.get('analysis')}")
-                with cb: 
-                    fc = data.get("forecast", {})
-                    st.success(f"**🔥 Hot Pick:** {fc.get('hot_pick')} ({fc.get('reason')})")
-
-                # --- TABLE ---
-                st.markdown("### 📊 Breakdown")
-                mappings = data.get("player_mappings", {})
-                scores = data.get("detailed_scores", {})
-                rows = []
-                for p, codes in mappings.items():
-                    r = {"Player": p}
-                    tot = 0
-                    for i, c in enumerate(codes, 1):
-                        val = scores.get(c, 0)
-                        r[f"Code {i}"] = f"{c} ({val})"
-                        tot += val
-                    r["Total Runs"] = tot
-                    rows.append(r)
-                
-                if rows:
-                    df = pd.DataFrame(rows)
-                    cols = ["Player", "Total Runs"] + [c for c in df.columns if c.startswith("Code")]
-                    existing = [c for c in cols if c in df.columns]
-                    def highlight(s): return ['background-color: #d4edda' if v == winner else '' for v in s]
-                    st.dataframe(df[existing].style.apply(highlight, subset=['Player']), use_container_width=True, hide_index=True)
-
-                # --- PAYMENTS ---
-                settlements = data.get("settlements", {})
-                if settlements:
-                    st.markdown("### 💸 Payments")
-                    df_pay = pd.DataFrame(list(settlements.items()), columns=["Player", "Amount Due"])
-                    df_pay["Amount Due"] = df_pay["Amount Due"].map("£{:.2f}".format)
-                    col_pay, _ = st.columns([1, 1])
-                    with col_pay: st.dataframe(df_pay, use_container_width=True, hide_index=True)
-
-        except Exception as e:
-            st.error(f"Error: {e}")
\ No newline at end of file
+        key = input_hash(match_url, commentary_url, uploaded_files)
+        st.session_state.active = key
+        if key not in known_jobs():
+            try:
+                known_jobs()[key] = submit_job(match_url, commentary_url, uploaded_files)
+            except Exception as e:
+                st.session_state.active = None
+                st.error(f"Error: {e}")
+
+active = st.session_state.get("active")
+job_id = known_jobs().get(active) if active else None
+if job_id:
+    try:
+        show_job(active, job_id, sort_by)
+    except Exception as e:
+        st.error(f"Error: {e}")
@@ -0,0 +1,218 @@
+"""
+Local stand-ins for everything the pipeline talks to, for repeatable benchmarks:
+a replay HTTP server for the ESPNcricinfo pages, and fake genai / Vertex AI clients
+with configurable latency and error profiles.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import threading
+import urllib.request
+from functools import partial
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bs4 import BeautifulSoup
+from agents import clients, scraper
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures")
+
+# Codes from tests/fixtures/scorecard.html, split between three league players.
+BENCH_MAPPINGS = {
+    "Ravi": ["T1-1", "T1-3", "T2-4"],
+    "Nilay": ["T1-2", "T2-1", "T2-3"],
+    "Sam": ["T1-4", "T1-5", "T2-2"],
+}
+
+class LatencyProfile:
+    """Per-call latency (mean +/- uniform jitter, in ms) and a failure rate."""
+
+    def __init__(self, mean_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, seed: int = None):
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.mean_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        return delay, failed
+
+    def wait(self, name: str):
+        delay, failed = self._draw()
+        time.sleep(delay)
+        if failed:
+            raise RuntimeError(f"{name}: injected failure")
+
+    async def await_(self, name: str):
+        delay, failed = self._draw()
+        await asyncio.sleep(delay)
+        if failed:
+            raise RuntimeError(f"{name}: injected failure")
+
+# --- Replay server ---
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    def __init__(self, pages, profile, *args, **kwargs):
+        self.pages = pages
+        self.profile = profile
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        page = self.pages.get(self.path.split("?")[0])
+        if page is None:
+            self.send_error(404)
+            return
+        try:
+            self.profile.wait("page")
+        except RuntimeError:
+            self.send_error(503)
+            return
+        body = page.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+class ReplayServer:
+    """Serves recorded scorecard/commentary HTML at /scorecard and /commentary on localhost."""
+
+    def __init__(self, scorecard_path: str = None, commentary_path: str = None, profile: LatencyProfile = None):
+        pages = {}
+        for route, path in (("/scorecard", scorecard_path or os.path.join(FIXTURES, "scorecard.html")),
+                            ("/commentary", commentary_path or os.path.join(FIXTURES, "commentary.html"))):
+            with open(path, encoding="utf-8") as f:
+                pages[route] = f.read()
+        self.profile = profile or LatencyProfile()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_ReplayHandler, pages, self.profile))
+        self._thread = threading.Thread(target=self._server.serve_forever, name="replay-server", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def urls(self, request_id=None):
+        # A per-request query string defeats the scrape cache unless the caller wants it warm.
+        suffix = f"?r={request_id}" if request_id is not None else ""
+        return f"{self.base_url}/scorecard{suffix}", f"{self.base_url}/commentary{suffix}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+# --- Browserless scraping (for machines without Chromium) ---
+
+async def _fetch_pages_over_http(page, match_url: str, commentary_url: str, on_scorecard=None):
+    """Same contract as scraper._fetch_pages, fetched with urllib instead of Playwright."""
+    def get(url):
+        with urllib.request.urlopen(url, timeout=30) as response:
+            return response.read().decode()
+
+    def commentary_lines():
+        soup = BeautifulSoup(get(commentary_url), "html.parser")
+        lines = []
+        banner = soup.select_one("div.ds-text-tight-m")
+        if banner:
+            lines.append(f"RESULT: {banner.get_text()}")
+        return lines + [c.get_text().strip() for c in soup.select("div.ci-html-content")[:5]]
+
+    commentary = asyncio.ensure_future(asyncio.to_thread(commentary_lines))
+    scorecard_html = await asyncio.to_thread(get, match_url)
+    if on_scorecard is not None:
+        on_scorecard(scorecard_html, {})
+    return scorecard_html, {}, await commentary
+
+class HttpPool:
+    """Drop-in for BrowserPool.run/arun that hands jobs no page; pairs with _fetch_pages_over_http."""
+
+    def run(self, job, timeout: float = None):
+        return asyncio.run(asyncio.wait_for(job(None), timeout))
+
+    async def arun(self, job):
+        return await job(None)
+
+    def stats(self):
+        return {"mode": "http"}
+
+def use_http_scraper():
+    scraper._fetch_pages = _fetch_pages_over_http
+    scraper.get_browser_pool = lambda: HttpPool()
+
+# --- Fake SDK clients ---
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+class _Models:
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+
+    @staticmethod
+    def _reply(contents):
+        # Vision sends [prompt, image parts...]; the analyst sends a plain prompt.
+        if isinstance(contents, list):
+            return _Response(json.dumps(BENCH_MAPPINGS))
+        return _Response("Won on the back of a composed top order.")
+
+    def generate_content(self, model=None, contents=None, config=None):
+        self.profile.wait("genai")
+        return self._reply(contents)
+
+class _AsyncModels(_Models):
+    async def generate_content(self, model=None, contents=None, config=None):
+        await self.profile.await_("genai")
+        return self._reply(contents)
+
+class FakeGenaiClient:
+    def __init__(self, profile: LatencyProfile):
+        self.models = _Models(profile)
+        self.aio = type("Aio", (), {"models": _AsyncModels(profile)})()
+
+class _Prediction:
+    def __init__(self, count: int):
+        self.predictions = ["What a finish, if you enjoy watching paint dry.<end_of_turn>"] * count
+
+class FakeVertexEndpoint:
+    """Latency is per predict call, whatever the batch size, like a GPU-backed endpoint."""
+
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+        self.batch_sizes = []
+
+    def predict(self, instances=None):
+        self.batch_sizes.append(len(instances))
+        self.profile.wait("vertex")
+        return _Prediction(len(instances))
+
+    async def predict_async(self, instances=None):
+        self.batch_sizes.append(len(instances))
+        await self.profile.await_("vertex")
+        return _Prediction(len(instances))
+
+def install_fake_clients(genai_profile: LatencyProfile, vertex_profile: LatencyProfile):
+    """Points the shared client getters in agents.clients at the fakes."""
+    os.environ.setdefault("VERTEX_ENDPOINT_ID", "bench-endpoint")
+    project = os.getenv("GOOGLE_PROJECT_ID")
+    region = os.getenv("GOOGLE_REGION", "us-central1")
+    clients._genai_client = FakeGenaiClient(genai_profile)
+    clients._vertex_endpoints[(project, region, os.environ["VERTEX_ENDPOINT_ID"])] = FakeVertexEndpoint(vertex_profile)
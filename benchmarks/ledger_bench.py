@@ -0,0 +1,75 @@
+"""
+Auditor benchmark: auditor_node per match vs the vectorised season ledger.
+
+    python benchmarks/ledger_bench.py [--players 10000] [--matches 100] [--codes-per-player 2]
+
+Checks that every match result is identical, then reports wall time for a single match and for
+the whole season, plus how many payments net-transfer minimisation saves.
+"""
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from agents.auditor import auditor_node
+from agents.ledger import settle_season
+
+CODES = [f"T{team}-{pos}" for team in (1, 2) for pos in range(1, 12)]
+
+def make_season(players: int, matches: int, codes_per_player: int, seed: int = 12):
+    rng = random.Random(seed)
+    season = []
+    for _ in range(matches):
+        mappings = {f"Player {i}": rng.sample(CODES, codes_per_player) for i in range(players)}
+        scores = {code: rng.randint(0, 120) for code in CODES}
+        season.append((mappings, scores))
+    return season
+
+def audit_loop(season):
+    results = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for mappings, scores in season:
+            state = {"player_mappings": mappings, "match_scores": scores, "final_results": {}}
+            results.append(auditor_node(state)["final_results"])
+    return results
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=10_000)
+    parser.add_argument("--matches", type=int, default=100)
+    parser.add_argument("--codes-per-player", type=int, default=2)
+    args = parser.parse_args()
+
+    season = make_season(args.players, args.matches, args.codes_per_player)
+    print(f"🏏 {args.players} players x {args.matches} matches")
+
+    single_loop, t_single_loop = timed(audit_loop, season[:1])
+    single_ledger, t_single_ledger = timed(settle_season, season[:1])
+    print(f"   single match   auditor_node {t_single_loop * 1000:8.1f} ms   ledger {t_single_ledger * 1000:8.1f} ms")
+
+    loop_results, t_loop = timed(audit_loop, season)
+    ledger, t_ledger = timed(settle_season, season)
+    print(f"   whole season   auditor_node {t_loop * 1000:8.1f} ms   ledger {t_ledger * 1000:8.1f} ms  ({t_loop / t_ledger:.1f}x)")
+
+    _, t_results = timed(lambda: ledger.results)
+    print(f"   building auditor-style dicts for every match: {t_results * 1000:.1f} ms")
+
+    same = single_ledger.results == single_loop and ledger.results == loop_results
+    print(f"   parity with auditor_node: {'✅' if same else '❌'}")
+
+    naive = sum(len(r["settlements"]) for r in loop_results)
+    transfers, t_transfers = timed(ledger.transfers)
+    print(f"   payments: {naive} per-match -> {len(transfers)} net transfers ({t_transfers * 1000:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
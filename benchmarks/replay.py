@@ -0,0 +1,256 @@
+"""
+Offline replay benchmark for the whole settlement pipeline.
+
+Recorded scorecard/commentary HTML is served from a local HTTP server, and Gemini / Vertex AI
+are replaced by fakes with configurable latency and failure rates. Nothing leaves the machine.
+
+    python benchmarks/replay.py --mode workflow --requests 40 --concurrency 1 4 8
+    python benchmarks/replay.py --mode api --genai-latency-ms 800 --vertex-latency-ms 1200 --vertex-error-rate 0.05
+    python benchmarks/replay.py --scraper http --json bench.json   # no Chromium needed
+
+Modes: workflow (run_workflow on a thread pool), async (run_workflow_async), api (POST /api/calculate
+in-process over ASGI). Reports p50/p95/p99 latency and throughput per concurrency level, the same
+percentiles per stage span, and a sequential per-stage memory profile (tracemalloc peak).
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import resource
+import contextlib
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("BROWSER_HEADLESS", "true")
+os.environ.setdefault("RESULTS_DB", "")
+
+from benchmarks.fakes import LatencyProfile, ReplayServer, install_fake_clients, use_http_scraper
+from agents.vision import vision_node
+from agents.scraper import scraper_node, set_scrape_cache
+from agents.auditor import auditor_node
+from agents.workflow import run_workflow, run_workflow_async, run_intelligence_layer
+from agents.vision import set_mapping_cache
+from agents.telemetry import add_span_listener, remove_span_listener, FALLBACKS
+from agents.batcher import vertex_batch_stats
+
+def percentile(samples, pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def summarise(samples) -> dict:
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+    }
+
+def new_state(match_url: str, commentary_url: str, request_id: int, distinct_images: bool):
+    image = f"bench-screenshot-{request_id if distinct_images else 0}".encode()
+    return {
+        "image_bytes": [image],
+        "image_mime_types": ["image/jpeg"],
+        "match_url": match_url,
+        "commentary_url": commentary_url,
+        "player_mappings": {},
+        "match_scores": {},
+        "match_commentary": [],
+        "final_results": {}
+    }
+
+def _ok(state) -> bool:
+    return "error" not in (state.get("final_results") or {})
+
+# --- Drivers: each returns [(latency seconds, ok)] ---
+# Async drivers run on the benchmark's one event loop, so loop-bound state such as
+# stage semaphores and pooled connections carries across levels the way it does in the API server.
+
+def drive_workflow(server, requests: int, concurrency: int, warm: bool, loop):
+    def one(i):
+        started = time.perf_counter()
+        state = run_workflow(new_state(*server.urls(None if warm else i), i, not warm))
+        return time.perf_counter() - started, _ok(state)
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        return list(pool.map(one, range(requests)))
+
+async def _drive_async(server, requests: int, concurrency: int, warm: bool):
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with gate:
+            started = time.perf_counter()
+            state = await run_workflow_async(new_state(*server.urls(None if warm else i), i, not warm))
+            return time.perf_counter() - started, _ok(state)
+
+    return await asyncio.gather(*[one(i) for i in range(requests)])
+
+def drive_async(server, requests: int, concurrency: int, warm: bool, loop):
+    return loop.run_until_complete(_drive_async(server, requests, concurrency, warm))
+
+async def _drive_api(server, requests: int, concurrency: int, warm: bool):
+    import httpx
+    import api
+
+    gate = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def one(i):
+            match_url, commentary_url = server.urls(None if warm else i)
+            image = f"bench-screenshot-{0 if warm else i}".encode()
+            async with gate:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/api/calculate",
+                    data={"match_url": match_url, "commentary_url": commentary_url},
+                    files=[("files", ("shot.jpg", image, "image/jpeg"))],
+                )
+                return time.perf_counter() - started, response.status_code == 200
+
+        return await asyncio.gather(*[one(i) for i in range(requests)])
+
+def drive_api(server, requests: int, concurrency: int, warm: bool, loop):
+    return loop.run_until_complete(_drive_api(server, requests, concurrency, warm))
+
+DRIVERS = {"workflow": drive_workflow, "async": drive_async, "api": drive_api}
+
+# --- Memory: one request, stage by stage ---
+
+def profile_memory(server) -> dict:
+    stages = [
+        ("vision", vision_node),
+        ("scraper", scraper_node),
+        ("auditor", auditor_node),
+        ("intelligence", run_intelligence_layer),
+    ]
+    state = new_state(*server.urls("memory"), -1, True)
+    peaks = {}
+    tracemalloc.start()
+    try:
+        for name, node in stages:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            state = node(state)
+            peaks[name] = round((tracemalloc.get_traced_memory()[1] - baseline) / 1024, 1)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+def run_benchmark(mode: str = "workflow", requests: int = 20, concurrency=(1, 4), warm: bool = False,
+                  scraper: str = "browser", genai: LatencyProfile = None, vertex: LatencyProfile = None,
+                  page: LatencyProfile = None, memory: bool = True) -> dict:
+    genai = genai or LatencyProfile()
+    vertex = vertex or LatencyProfile()
+    install_fake_clients(genai, vertex)
+    if scraper == "http":
+        use_http_scraper()
+
+    report = {"mode": mode, "scraper": scraper, "requests": requests, "warm_cache": warm, "levels": []}
+    loop = asyncio.new_event_loop()
+    try:
+        with ReplayServer(profile=page) as server:
+            for level in concurrency:
+                # Fresh caches per level so levels are comparable.
+                set_scrape_cache(None)
+                set_mapping_cache(None)
+                stage_samples = {}
+                listener = add_span_listener(lambda span: stage_samples.setdefault(span.stage, []).append(span.duration))
+                fallbacks_before = sum(FALLBACKS._values.values())
+                batches_before = vertex_batch_stats()
+                try:
+                    started = time.perf_counter()
+                    results = DRIVERS[mode](server, requests, level, warm, loop)
+                    wall = time.perf_counter() - started
+                finally:
+                    remove_span_listener(listener)
+
+                latencies = [latency for latency, _ in results]
+                batches = vertex_batch_stats()
+                gemma_calls = batches.get("batches", 0) - batches_before.get("batches", 0)
+                gemma_prompts = batches.get("items", 0) - batches_before.get("items", 0)
+                report["levels"].append({
+                    "concurrency": level,
+                    "throughput_rps": round(len(results) / wall, 2),
+                    "failed": sum(1 for _, ok in results if not ok),
+                    "fallbacks": sum(FALLBACKS._values.values()) - fallbacks_before,
+                    "gemma_prompts_per_call": round(gemma_prompts / gemma_calls, 2) if gemma_calls else 0.0,
+                    "latency": summarise(latencies),
+                    "stages": {stage: summarise(samples) for stage, samples in sorted(stage_samples.items())},
+                })
+
+            if memory:
+                set_scrape_cache(None)
+                set_mapping_cache(None)
+                report["memory_kb"] = profile_memory(server)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+    report["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    report["injected"] = {"genai_errors": genai.errors, "vertex_errors": vertex.errors}
+    return report
+
+def print_report(report: dict):
+    print(f"\n🏁 {report['mode']} ({report['scraper']} scraper), {report['requests']} requests per level")
+    for level in report["levels"]:
+        lat = level["latency"]
+        print(f"\n   concurrency {level['concurrency']:>3}: {level['throughput_rps']:>7} req/s   "
+              f"p50 {lat['p50_ms']:>8} ms   p95 {lat['p95_ms']:>8} ms   p99 {lat['p99_ms']:>8} ms   "
+              f"failed {level['failed']}   fallbacks {level['fallbacks']}   "
+              f"gemma prompts/call {level['gemma_prompts_per_call']}")
+        for stage, stats in level["stages"].items():
+            print(f"      {stage:<28} n={stats['count']:<5} p50 {stats['p50_ms']:>8} ms   "
+                  f"p95 {stats['p95_ms']:>8} ms   p99 {stats['p99_ms']:>8} ms")
+    if "memory_kb" in report:
+        print("\n   memory per stage (tracemalloc peak, one request):")
+        for stage, kb in report["memory_kb"].items():
+            print(f"      {stage:<28} {kb:>10} KB")
+    print(f"\n   peak RSS {report['peak_rss_mb']} MB, injected failures {report['injected']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=sorted(DRIVERS), default="workflow")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--scraper", choices=("browser", "http"), default="browser",
+                        help="browser drives Playwright against the replay server; http skips Chromium")
+    parser.add_argument("--warm-cache", action="store_true", help="Same match and screenshots for every request")
+    parser.add_argument("--genai-latency-ms", type=float, default=600)
+    parser.add_argument("--genai-jitter-ms", type=float, default=150)
+    parser.add_argument("--genai-error-rate", type=float, default=0.0)
+    parser.add_argument("--vertex-latency-ms", type=float, default=900)
+    parser.add_argument("--vertex-jitter-ms", type=float, default=200)
+    parser.add_argument("--vertex-error-rate", type=float, default=0.0)
+    parser.add_argument("--page-latency-ms", type=float, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the per-stage memory pass")
+    parser.add_argument("--json", help="Also write the report here, to diff against a previous run")
+    parser.add_argument("--verbose", action="store_true", help="Keep the agents' own log output")
+    args = parser.parse_args()
+
+    # The agents log every step with print(); keep the report readable.
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with quiet:
+        report = run_benchmark(
+            mode=args.mode,
+            requests=args.requests,
+            concurrency=args.concurrency,
+            warm=args.warm_cache,
+            scraper=args.scraper,
+            genai=LatencyProfile(args.genai_latency_ms, args.genai_jitter_ms, args.genai_error_rate, args.seed),
+            vertex=LatencyProfile(args.vertex_latency_ms, args.vertex_jitter_ms, args.vertex_error_rate, args.seed + 1),
+            page=LatencyProfile(args.page_latency_ms, 0, 0, args.seed + 2),
+            memory=not args.no_memory,
+        )
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Scorecard parser benchmark: lxml parse_scorecard vs the original BeautifulSoup walk.
+
+    python benchmarks/scorecard_bench.py [page.html ...] [--runs 20] [--pad-kb 1500]
+
+With no files it uses tests/fixtures/scorecard.html. --pad-kb adds inert markup around the
+tables so the saved fixture is closer to a real ~1-2 MB scorecard page.
+Peak memory is the RSS high-water growth of a fresh process per parser, so lxml's C allocations count too.
+"""
+import os
+import sys
+import time
+import argparse
+import resource
+import statistics
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from agents.scorecard import parse_scorecard, parse_scorecard_legacy
+
+PARSERS = {"lxml": parse_scorecard, "bs4 html.parser": parse_scorecard_legacy}
+DEFAULT_FIXTURE = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures", "scorecard.html")
+
+def pad(html: str, kb: int) -> str:
+    if kb <= 0:
+        return html
+    block = '<div class="ds-p-2"><span class="ds-text-tight-s">filler</span><a href="/x">link</a></div>\n'
+    filler = block * (kb * 1024 // len(block))
+    half = len(filler) // 2
+    return html.replace("<main", filler[:half] + "<main", 1).replace("</main>", "</main>" + filler[half:], 1)
+
+def _rss_kb(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def _peak_rss_kb(name, html, out):
+    # Reset the high-water mark so import-time peaks don't hide the parse (Linux only).
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+    before = _rss_kb("VmRSS:")
+    PARSERS[name](html)
+    out.put(_rss_kb("VmHWM:") - before)
+
+def peak_memory_kb(name: str, html: str) -> int:
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_peak_rss_kb, args=(name, html, out))
+    proc.start()
+    result = out.get()
+    proc.join()
+    return result
+
+def bench(html: str, runs: int):
+    rows = []
+    for name, parser in PARSERS.items():
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            scores = parser(html)
+            timings.append(time.perf_counter() - started)
+        rows.append((name, statistics.median(timings), min(timings), peak_memory_kb(name, html), len(scores)))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="*", default=[DEFAULT_FIXTURE])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--pad-kb", type=int, default=0)
+    args = parser.parse_args()
+
+    for path in args.files:
+        with open(path, encoding="utf-8") as f:
+            html = pad(f.read(), args.pad_kb)
+        fast, legacy = parse_scorecard(html), parse_scorecard_legacy(html)
+        print(f"\n📄 {os.path.basename(path)} ({len(html) / 1024:.0f} KB) - parity: {'✅' if fast == legacy else '❌'}")
+        print(f"   {'parser':<18}{'median ms':>11}{'min ms':>9}{'peak RSS KB':>13}{'scores':>8}")
+        for name, median, best, peak, count in bench(html, args.runs):
+            print(f"   {name:<18}{median * 1000:>11.2f}{best * 1000:>9.2f}{peak:>13}{count:>8}")
+
+if __name__ == "__main__":
+    main()
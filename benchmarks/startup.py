@@ -0,0 +1,134 @@
+"""
+Cold-start benchmark for the API process.
+
+Two numbers matter for autoscaled replicas: how long `import api` takes (measured with
+python -X importtime, so the slowest imports are named), and how long a fresh uvicorn
+process takes to answer its first /api/health.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 5 --top 15 --json startup.json
+    python benchmarks/startup.py --warmup blocking   # time-to-ready when warm-up gates startup
+
+Each run is a new interpreter, so nothing is cached between runs except the OS page cache.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def _env(warmup: str) -> dict:
+    env = dict(os.environ)
+    # No results DB and no Chromium: measure our own imports and startup, not SQLite or a browser launch.
+    env.update({"RESULTS_DB": "", "STARTUP_WARMUP": warmup, "SCRAPER_MODE": env.get("SCRAPER_MODE", "local"),
+                "PYTHONDONTWRITEBYTECODE": "1"})
+    return env
+
+def parse_importtime(stderr: str) -> dict:
+    """Parses `python -X importtime` output into {module: (self_us, cumulative_us)}."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    return modules
+
+def measure_import(module: str = "api", warmup: str = "off") -> dict:
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, env=_env(warmup), capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    modules = parse_importtime(result.stderr)
+    return {"wall_s": round(wall, 3), "import_s": round(modules.get(module, (0, 0))[1] / 1e6, 3), "modules": modules}
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def measure_first_request(warmup: str = "background", timeout: float = 60) -> float:
+    """Seconds from spawning uvicorn until /api/health answers 200."""
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/api/health"
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "api:app", "--port", str(port), "--log-level", "warning"],
+                              cwd=ROOT, env=_env(warmup), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {server.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError(f"no answer from {url} within {timeout}s")
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+def run_benchmark(runs: int = 3, top: int = 10, warmup: str = "background") -> dict:
+    imports = [measure_import() for _ in range(runs)]
+    first_requests = [measure_first_request(warmup) for _ in range(runs)]
+
+    # Slowest modules by cumulative time, averaged across runs.
+    totals = {}
+    for run in imports:
+        for name, (_, cumulative) in run["modules"].items():
+            totals[name] = totals.get(name, 0) + cumulative
+    slowest = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+    return {
+        "runs": runs,
+        "warmup": warmup,
+        "import_api_s": sorted(run["import_s"] for run in imports),
+        "import_api_median_s": sorted(run["import_s"] for run in imports)[runs // 2],
+        "first_request_s": sorted(round(s, 3) for s in first_requests),
+        "first_request_median_s": round(sorted(first_requests)[runs // 2], 3),
+        "slowest_imports_ms": {name: round(total / runs / 1000, 1) for name, total in slowest},
+        "heavy_sdks_loaded": sorted(name for name in ("google.cloud.aiplatform", "google.genai", "playwright", "bs4")
+                                    if name in imports[0]["modules"]),
+    }
+
+def print_report(report: dict):
+    print(f"\n🚀 startup over {report['runs']} runs (STARTUP_WARMUP={report['warmup']})")
+    print(f"   import api          median {report['import_api_median_s']:>7} s   {report['import_api_s']}")
+    print(f"   first /api/health   median {report['first_request_median_s']:>7} s   {report['first_request_s']}")
+    print("\n   slowest imports (cumulative):")
+    for name, ms in report["slowest_imports_ms"].items():
+        print(f"      {name:<40} {ms:>9} ms")
+    loaded = ", ".join(report["heavy_sdks_loaded"]) or "none"
+    print(f"\n   heavy SDKs imported by `import api`: {loaded}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per measurement")
+    parser.add_argument("--top", type=int, default=10, help="How many of the slowest imports to list")
+    parser.add_argument("--warmup", choices=("background", "blocking", "off"), default="background",
+                        help="STARTUP_WARMUP for the time-to-first-request runs")
+    parser.add_argument("--json", help="Also write the report here, to diff against a previous run")
+    args = parser.parse_args()
+
+    report = run_benchmark(runs=max(1, args.runs), top=args.top, warmup=args.warmup)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import pytest
 import os
 import json
+import time
 from dotenv import load_dotenv
 from unittest.mock import MagicMock, patch
 
@@ -67,6 +68,236 @@ def test_forecaster_logic():
     assert forecast["hot_pick"] == "T1-2"
     assert "85" in forecast["reason"]
 
+def test_intelligence_layer_runs_concurrently(monkeypatch):
+    """Verifies the analyst/forecaster/commentator fan-out costs the slowest node, not the sum."""
+    from agents import workflow
+
+    def slow_node(key, value):
+        def node(state):
+            time.sleep(0.3)
+            state["final_results"][key] = value
+            return state
+        return node
+
+    monkeypatch.setattr(workflow, "INTELLIGENCE_LAYER", [
+        ("analysis", slow_node("analysis", "a"), 5, lambda s: None),
+        ("forecast", slow_node("forecast", {"hot_pick": "T1-1"}), 5, lambda s: None),
+        ("sarcastic_summary", slow_node("sarcastic_summary", "s"), 5, lambda s: None),
+    ])
+
+    state = {"final_results": {"winner": "Ravi"}}
+    started = time.monotonic()
+    result = workflow.run_intelligence_layer(state)
+
+    assert time.monotonic() - started < 0.6
+    assert list(result["final_results"]) == ["winner", "analysis", "forecast", "sarcastic_summary"]
+
+def test_intelligence_layer_timeout_uses_fallback(monkeypatch):
+    """Verifies a node that overruns its own timeout is replaced by its fallback."""
+    from agents import workflow
+
+    def hung_node(state):
+        time.sleep(1)
+        state["final_results"]["sarcastic_summary"] = "too late"
+        return state
+
+    monkeypatch.setattr(workflow, "INTELLIGENCE_LAYER", [
+        ("sarcastic_summary", hung_node, 0.1, lambda s: f"{s['final_results']['winner']} won."),
+    ])
+
+    result = workflow.run_intelligence_layer({"final_results": {"winner": "Ravi"}})
+    assert result["final_results"]["sarcastic_summary"] == "Ravi won."
+
+def _graph(vision, scraper, run_async=False):
+    from agents import workflow
+    nodes = lambda node: (None, node) if run_async else (node, None)
+    return [
+        ("vision", *nodes(vision), (), ("player_mappings",), lambda s: {}),
+        ("scraper", *nodes(scraper), (), ("match_scores",), lambda s: {}),
+        ("auditor", workflow.auditor_node, None, ("vision", "scraper"), ("final_results",), lambda s: {}),
+    ]
+
+def test_graph_runs_vision_and_scraper_side_by_side(monkeypatch):
+    """Verifies independent stages overlap, so the join costs the slower one, not the sum."""
+    from agents import workflow
+
+    def vision(state):
+        time.sleep(0.3)
+        state["player_mappings"] = {"Ravi": ["T1-1"]}
+        return state
+
+    def scraper(state):
+        time.sleep(0.3)
+        state["match_scores"] = {"T1-1": 35}
+        return state
+
+    monkeypatch.setattr(workflow, "PIPELINE", _graph(vision, scraper))
+    started = time.monotonic()
+    result = workflow.run_graph({"final_results": {}})
+
+    assert time.monotonic() - started < 0.55
+    assert result["final_results"]["winner"] == "Ravi"
+
+def test_graph_cancels_the_other_branch_on_failure(monkeypatch):
+    """Verifies a failed vision call cancels the in-flight scrape instead of waiting it out."""
+    import asyncio
+    from agents import workflow
+
+    cancelled = []
+
+    async def vision(state):
+        await asyncio.sleep(0.05)
+        state["final_results"] = {"error": "Vision processing failed: boom"}
+        return state
+
+    async def scraper(state):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return state
+
+    monkeypatch.setattr(workflow, "PIPELINE", _graph(vision, scraper, run_async=True))
+
+    async def run():
+        started = time.monotonic()
+        result = await workflow.run_graph_async({"final_results": {}})
+        await asyncio.sleep(0)
+        return result, time.monotonic() - started
+
+    result, elapsed = asyncio.run(run())
+    assert result["final_results"] == {"error": "Vision processing failed: boom"}
+    assert elapsed < 1
+    assert cancelled == [True]
+
+def test_admission_controller_rejects_when_queue_full():
+    """Verifies excess workflows are turned away with a Retry-After instead of piling up."""
+    import asyncio
+    from agents.limits import AdmissionController, Overloaded
+
+    async def scenario():
+        admission = AdmissionController(max_active=1, max_queued=1, queue_timeout=5, retry_after=7)
+        release = asyncio.Event()
+
+        async def hold():
+            async with admission.admit():
+                await release.wait()
+
+        running = asyncio.create_task(hold())
+        queued = asyncio.create_task(hold())
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(Overloaded) as exc:
+            async with admission.admit():
+                pass
+        release.set()
+        await asyncio.gather(running, queued)
+        return exc.value
+
+    rejected = asyncio.run(scenario())
+    assert rejected.status_code == 429
+    assert rejected.retry_after == 7
+
+def test_stage_slots_work_across_event_loops(monkeypatch):
+    """Verifies a contended stage limit still works when a later asyncio.run uses it."""
+    import asyncio
+    from agents import limits
+
+    monkeypatch.setitem(limits.STAGE_LIMITS, "scraper", 1)
+
+    async def contend():
+        async def scrape():
+            async with limits.stage_slot("scraper"):
+                await asyncio.sleep(0.01)
+        await asyncio.gather(*[scrape() for _ in range(3)])
+
+    asyncio.run(contend())
+    asyncio.run(contend())
+
+def test_browser_pool_gives_the_slot_back_when_a_page_cannot_open(monkeypatch):
+    """Verifies a failed context/page setup doesn't leak in_use or the context."""
+    from agents.browser_pool import BrowserPool, _ContextSlot
+
+    class BrokenContext:
+        closed = False
+
+        async def new_page(self):
+            raise RuntimeError("target closed")
+
+        async def close(self):
+            self.closed = True
+
+    context = BrokenContext()
+    pool = BrowserPool(max_concurrency=1)
+
+    async def acquire():
+        return _ContextSlot(context)
+
+    monkeypatch.setattr(pool, "_acquire_context", acquire)
+    try:
+        for _ in range(2):
+            with pytest.raises(RuntimeError, match="target closed"):
+                pool.run(lambda page: None, timeout=5)
+        stats = pool.stats()
+        assert stats["in_use"] == 0
+        assert stats["failed_jobs"] == 2
+        assert context.closed
+    finally:
+        pool.close()
+
+def test_commentary_keeps_the_result_banner_when_balls_time_out():
+    """Verifies a finished match still reads as finished when ball-by-ball never renders."""
+    import asyncio
+    from agents.scraper import _fetch_commentary, is_match_finished
+
+    class Banner:
+        async def inner_text(self):
+            return "India won by 5 wickets"
+
+    class Page:
+        async def goto(self, url, **kwargs):
+            pass
+
+        async def wait_for_selector(self, selector, **kwargs):
+            raise TimeoutError("Timeout 8000ms exceeded")
+
+        async def query_selector(self, selector):
+            return Banner() if selector == "div.ds-text-tight-m" else None
+
+        async def query_selector_all(self, selector):
+            return []
+
+    lines = asyncio.run(_fetch_commentary(Page(), "https://example.com/commentary"))
+    assert lines[0] == "RESULT: India won by 5 wickets"
+    assert is_match_finished(lines)
+
+def test_genai_client_is_shared_across_threads(monkeypatch):
+    """Verifies the genai client is built once and reused, not rebuilt per node call."""
+    from concurrent.futures import ThreadPoolExecutor
+    from agents import clients
+
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    clients.reset_clients()
+    try:
+        with ThreadPoolExecutor(8) as pool:
+            built = list(pool.map(lambda _: clients.get_genai_client(), range(16)))
+        assert all(c is built[0] for c in built)
+    finally:
+        clients.reset_clients()
+
+def test_embedded_scorecard_json_numbers_batters_in_order():
+    """Verifies __NEXT_DATA__ innings map to the same T1-1.. codes as the HTML tables."""
+    from agents.scraper import parse_embedded_scores
+
+    next_data = {"props": {"appPageProps": {"data": {"content": {"innings": [
+        {"inningBatsmen": [{"runs": 45, "battedType": "yes"}, {"runs": None, "battedType": "DNB"}, {"runs": 0, "battedType": "yes"}]},
+        {"inningBatsmen": [{"runs": 12, "battedType": "yes"}]},
+    ]}}}}}
+
+    assert parse_embedded_scores(next_data) == {"T1-1": 45, "T1-2": 0, "T2-1": 12}
+    assert parse_embedded_scores({"props": {}}) == {}
+
 # --- INTEGRATION TESTS (REAL API CALLS) ---
 
 @pytest.mark.skipif(not os.getenv("GOOGLE_API_KEY"), reason="No Google API Key")
@@ -150,4 +381,4 @@ def test_commentator_real_vertex_call():
     # If endpoint is active, we get text. If sleeping/error, we get fallback.
     # We assert that we got *something* back.
     assert len(sarcasm) > 5
-    print(f"Vertex AI Output: {sarcasm}")
\ No newline at end of file
+    print(f"Vertex AI Output: {sarcasm}")
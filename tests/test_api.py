@@ -0,0 +1,229 @@
+import json
+import time
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from agents import uploads
+from agents.store import ResultsStore, set_results_store
+
+async def fake_workflow(state, on_stage=None):
+    """Stands in for the real pipeline: auditor output first, commentary later."""
+    state["player_mappings"] = {"Ravi": ["T1-1"], "Nilay": ["T1-2"]}
+    state["match_scores"] = {"T1-1": 35, "T1-2": 10}
+    state["final_results"] = {
+        "leaderboard": {"Ravi": 35, "Nilay": 10}, "winner": "Ravi", "winner_score": 35,
+        "settlements": {"Nilay": 5.0}, "total_pot_gbp": 5.0
+    }
+    if on_stage:
+        on_stage("auditor", dict(state["final_results"]))
+    await asyncio.sleep(0.05)
+    state["final_results"]["sarcastic_summary"] = "Ravi won."
+    if on_stage:
+        on_stage("commentator", {"sarcastic_summary": "Ravi won."})
+    return state
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(api, "start_browser_pool", lambda: None)
+    monkeypatch.setattr(api, "STARTUP_WARMUP", "off")
+    monkeypatch.setattr(api, "run_workflow_async", fake_workflow)
+    set_results_store(ResultsStore(str(tmp_path / "results.db")))
+    try:
+        with TestClient(api.app) as c:
+            yield c
+    finally:
+        set_results_store(None)
+
+FORM = {"match_url": "https://example.com/scorecard", "commentary_url": "https://example.com/commentary"}
+FILES = [("files", ("shot.jpg", b"not really a jpeg", "image/jpeg"))]
+
+def test_job_is_accepted_immediately_and_completes(client):
+    submitted = client.post("/api/jobs", data=FORM, files=FILES)
+    assert submitted.status_code == 202
+    job_id = submitted.json()["job_id"]
+
+    for _ in range(50):
+        status = client.get(f"/api/jobs/{job_id}").json()
+        if status["status"] == "succeeded":
+            break
+        time.sleep(0.02)
+
+    assert status["status"] == "succeeded"
+    assert status["stages"] == ["auditor", "commentator"]
+    assert status["result"]["winner"] == "Ravi"
+
+def test_job_events_stream_leaderboard_before_commentary(client):
+    job_id = client.post("/api/jobs", data=FORM, files=FILES).json()["job_id"]
+
+    with client.stream("GET", f"/api/jobs/{job_id}/events") as response:
+        events = [line[len("event: "):] for line in response.iter_lines() if line.startswith("event: ")]
+
+    assert events.index("auditor") < events.index("commentator") < events.index("done")
+
+def test_unknown_job_is_404(client):
+    assert client.get("/api/jobs/nope").status_code == 404
+
+def test_trace_id_is_returned_and_metrics_are_exposed(client):
+    response = client.post("/api/calculate", data=FORM, files=FILES, headers={"X-Trace-Id": "abc123"})
+    assert response.status_code == 200
+    assert response.headers["X-Trace-Id"] == "abc123"
+    assert response.json()["trace_id"] == "abc123"
+
+    metrics = client.get("/metrics").text
+    assert 'twelfth_man_http_request_duration_seconds_count{route="/api/calculate",method="POST",status="200"}' in metrics
+    assert "twelfth_man_payload_bytes_bucket" in metrics
+
+def test_oversized_uploads_are_rejected(client, monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_FILE_BYTES", 1024)
+    big = [("files", ("big.jpg", b"x" * 4096, "image/jpeg"))]
+    response = client.post("/api/calculate", data=FORM, files=big)
+    assert response.status_code == 413
+    assert "per file" in response.json()["detail"]
+
+    # A declared Content-Length over the request cap is refused before the body is parsed.
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_TOTAL_BYTES", 0)
+    response = client.post("/api/jobs", data=FORM, files=[("files", ("big.jpg", b"x" * 100_000, "image/jpeg"))])
+    assert response.status_code == 413
+    assert response.headers["X-Trace-Id"]
+
+def test_chunked_uploads_are_capped_while_they_arrive(client, monkeypatch):
+    monkeypatch.setattr(uploads, "MAX_UPLOAD_TOTAL_BYTES", 0)
+    boundary = "bench"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"files\"; filename=\"big.jpg\"\r\n"
+            f"Content-Type: image/jpeg\r\n\r\n").encode() + b"x" * 200_000 + f"\r\n--{boundary}--\r\n".encode()
+
+    def chunks():
+        for i in range(0, len(body), 16 * 1024):
+            yield body[i:i + 16 * 1024]
+
+    # No Content-Length: only counting the body as it arrives can catch this one.
+    response = client.post("/api/jobs", content=chunks(),
+                           headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    assert response.status_code == 413
+    assert "capped" in response.json()["detail"]
+
+def test_uploads_outlive_the_request_for_background_jobs(client, monkeypatch):
+    prepare = api._prepare_state
+
+    async def late_prepare(*args, **kwargs):
+        # By now the response is sent and FastAPI has closed the request's UploadFiles.
+        await asyncio.sleep(0.2)
+        return await prepare(*args, **kwargs)
+
+    monkeypatch.setattr(api, "_prepare_state", late_prepare)
+    job_id = client.post("/api/jobs", data=FORM, files=FILES).json()["job_id"]
+    for _ in range(50):
+        snapshot = client.get(f"/api/jobs/{job_id}").json()
+        if snapshot["status"] in ("succeeded", "failed"):
+            break
+        time.sleep(0.05)
+    assert snapshot["status"] == "succeeded", snapshot.get("error")
+
+def test_settlements_are_served_from_the_store(client):
+    response = client.post("/api/calculate", data={**FORM, "league": "office"}, files=FILES)
+    assert response.status_code == 200
+
+    listed = client.get("/api/settlements", params={"league": "office"}).json()["settlements"]
+    assert [s["winner"] for s in listed] == ["Ravi"]
+
+    stored = client.get(f"/api/settlements/{listed[0]['match_id']}", params={"league": "office"}).json()
+    assert stored["data"]["settlements"] == {"Nilay": 5.0}
+
+    season = client.get("/api/leagues/office/season").json()["players"]
+    assert [(p["player"], p["net_gbp"]) for p in season] == [("Ravi", 5.0), ("Nilay", -5.0)]
+
+    history = client.get("/api/players/Nilay/history").json()["matches"]
+    assert history[0]["runs"] == 10 and history[0]["net_gbp"] == -5.0
+
+def test_batch_streams_one_line_per_league(client, monkeypatch):
+    from agents import batch
+
+    async def fake_scraper(state):
+        state["match_scores"] = {"T1-1": 35, "T1-2": 10}
+        state["match_commentary"] = []
+        return state
+
+    async def fake_vision(state):
+        state["player_mappings"] = {"Ravi": ["T1-1"], "Nilay": ["T1-2"]}
+        return state
+
+    monkeypatch.setattr(batch, "scraper_node_async", fake_scraper)
+    monkeypatch.setattr(batch, "vision_node_async", fake_vision)
+
+    manifest = [
+        {"league": "Office", "match_url": FORM["match_url"], "files": ["office.jpg"]},
+        {"league": "Family", "match_url": FORM["match_url"], "files": ["family.jpg"]},
+    ]
+    files = [
+        ("files", ("office.jpg", b"office shot", "image/jpeg")),
+        ("files", ("family.jpg", b"family shot", "image/jpeg")),
+    ]
+    data = {"manifest": json.dumps(manifest), "stream": "true", "intelligence": "false"}
+
+    with client.stream("POST", "/api/batch", data=data, files=files) as response:
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert lines[0]["plan"] == {"leagues": 2, "unique_matches": 1, "unique_screenshot_sets": 2}
+    assert sorted(l["league"] for l in lines[1:]) == ["Family", "Office"]
+    assert all(l["data"]["winner"] == "Ravi" for l in lines[1:])
+
+def test_cancelled_job_ends_as_failed(monkeypatch):
+    from agents.jobs import Job
+
+    async def slow_workflow(state, on_stage=None):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(api, "run_workflow_async", slow_workflow)
+
+    async def main():
+        job = Job("calculate")
+        task = asyncio.create_task(api._run_job(job, FORM["match_url"], FORM["commentary_url"], []))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return job
+
+    job = asyncio.run(main())
+    assert job.status == "failed" and job.error == "Cancelled"
+    assert job.events[-1]["event"] == "done"
+
+def test_batch_rejects_duplicate_filenames(client):
+    manifest = [{"league": "Office", "match_url": FORM["match_url"], "files": ["shot.jpg"]}]
+    files = [
+        ("files", ("shot.jpg", b"office shot", "image/jpeg")),
+        ("files", ("shot.jpg", b"family shot", "image/jpeg")),
+    ]
+    response = client.post("/api/batch", data={"manifest": json.dumps(manifest)}, files=files)
+    assert response.status_code == 400
+    assert "shot.jpg" in response.json()["detail"]
+
+def test_live_match_can_be_started_and_stopped(client, monkeypatch):
+    from agents import live
+
+    async def fake_vision(state):
+        state["player_mappings"] = {"Ravi": ["T1-1"], "Nilay": ["T1-2"]}
+        return state
+
+    async def fake_scrape(match_url, commentary_url):
+        return {"match_scores": {"T1-1": 12, "T1-2": 30}, "match_commentary": []}
+
+    monkeypatch.setattr(api, "vision_node_async", fake_vision)
+    monkeypatch.setattr(live, "scrape_fresh_async", fake_scrape)
+
+    started = client.post("/api/live", data=FORM, files=FILES)
+    assert started.status_code == 202
+    live_id = started.json()["live_id"]
+
+    for _ in range(50):
+        if "leaderboard" in client.get(f"/api/jobs/{live_id}").json()["stages"]:
+            break
+        time.sleep(0.02)
+
+    stopped = client.delete(f"/api/live/{live_id}").json()
+    assert stopped["status"] == "succeeded"
+    assert stopped["result"]["stopped"] is True
+    assert stopped["partial"]["leaderboard"]["results"]["winner"] == "Nilay"
+    assert client.delete(f"/api/live/{live_id}").status_code == 404
@@ -0,0 +1,66 @@
+import asyncio
+
+from agents import batch
+
+def make_states():
+    # Three leagues: two share a match, two share the same screenshots.
+    return [
+        batch.new_league_state("https://m/1", "https://c/1", [b"office"], ["image/jpeg"]),
+        batch.new_league_state("https://m/1", "https://c/1", [b"family"], ["image/jpeg"]),
+        batch.new_league_state("https://m/2", "https://c/2", [b"office"], ["image/jpeg"]),
+    ]
+
+def test_batch_shares_scrapes_and_vision_calls(monkeypatch):
+    calls = {"scraper": [], "vision": []}
+
+    async def fake_scraper(state):
+        calls["scraper"].append(state["match_url"])
+        state["match_scores"] = {"T1-1": 40, "T1-2": 10} if state["match_url"] == "https://m/1" else {"T1-1": 5, "T1-2": 50}
+        state["match_commentary"] = []
+        return state
+
+    async def fake_vision(state):
+        calls["vision"].append(state["image_bytes"][0])
+        state["player_mappings"] = {"Ravi": ["T1-1"], "Nilay": ["T1-2"]}
+        return state
+
+    monkeypatch.setattr(batch, "scraper_node_async", fake_scraper)
+    monkeypatch.setattr(batch, "vision_node_async", fake_vision)
+
+    states = make_states()
+    assert batch.batch_plan(states) == {"leagues": 3, "unique_matches": 2, "unique_screenshot_sets": 2}
+
+    async def collect():
+        return [item async for item in batch.run_batch_async(states, intelligence=False)]
+
+    results = dict(asyncio.run(collect()))
+
+    assert sorted(calls["scraper"]) == ["https://m/1", "https://m/2"]
+    assert sorted(calls["vision"]) == [b"family", b"office"]
+    assert results[0]["final_results"]["winner"] == "Ravi"
+    assert results[1]["final_results"]["winner"] == "Ravi"
+    assert results[2]["final_results"]["winner"] == "Nilay"
+
+def test_batch_scrape_failure_only_fails_its_leagues(monkeypatch):
+    async def flaky_scraper(state):
+        if state["match_url"] == "https://m/2":
+            state["final_results"] = {"error": "Scraping failed: boom"}
+            return state
+        state["match_scores"] = {"T1-1": 40, "T1-2": 10}
+        state["match_commentary"] = []
+        return state
+
+    async def fake_vision(state):
+        state["player_mappings"] = {"Ravi": ["T1-1"], "Nilay": ["T1-2"]}
+        return state
+
+    monkeypatch.setattr(batch, "scraper_node_async", flaky_scraper)
+    monkeypatch.setattr(batch, "vision_node_async", fake_vision)
+
+    async def collect():
+        return [item async for item in batch.run_batch_async(make_states(), intelligence=False)]
+
+    results = dict(asyncio.run(collect()))
+
+    assert results[0]["final_results"]["winner"] == "Ravi"
+    assert results[2]["final_results"] == {"error": "Scraping failed: boom"}
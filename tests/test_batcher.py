@@ -0,0 +1,102 @@
+import time
+import asyncio
+import threading
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+from agents import batcher, commentator
+from agents.batcher import MicroBatcher
+
+def test_concurrent_submits_share_one_call():
+    calls = []
+
+    def echo(items):
+        calls.append(list(items))
+        return [f"re: {item}" for item in items]
+
+    b = MicroBatcher("test", echo, max_size=4, max_delay=1)
+    try:
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(lambda i: b.submit(i).result(2), range(4)))
+        assert results == [f"re: {i}" for i in range(4)]
+        # Full before the (long) delay ran out.
+        assert len(calls) == 1 and sorted(calls[0]) == [0, 1, 2, 3]
+        assert b.stats()["flushed_full"] == 1
+        assert b.stats()["fill_rate"] == 1.0
+    finally:
+        b.close()
+
+def test_partial_batch_flushes_after_the_delay():
+    b = MicroBatcher("test", lambda items: [item * 2 for item in items], max_size=8, max_delay=0.02)
+    try:
+        started = time.monotonic()
+        assert b.submit(21).result(1) == 42
+        assert time.monotonic() - started < 0.5
+        stats = b.stats()
+        assert stats["flushed_on_delay"] == 1
+        assert stats["fill_rate"] == 0.125
+    finally:
+        b.close()
+
+def test_batch_failure_reaches_every_caller():
+    def boom(items):
+        raise RuntimeError("endpoint down")
+
+    b = MicroBatcher("test", boom, max_size=2, max_delay=1)
+    try:
+        futures = [b.submit(1), b.submit(2)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="endpoint down"):
+                future.result(2)
+        assert b.stats()["failed_batches"] == 1
+    finally:
+        b.close()
+
+def test_items_queue_up_while_the_endpoint_is_busy():
+    """With one slot in flight, requests arriving during a slow call ride in the next batch together."""
+    release = threading.Event()
+    sizes = []
+
+    def slow(items):
+        sizes.append(len(items))
+        if len(sizes) == 1:
+            release.wait(2)
+        return items
+
+    b = MicroBatcher("test", slow, max_size=8, max_delay=0.001, max_inflight=1)
+    try:
+        first = b.submit("a")
+        time.sleep(0.05)
+        rest = [b.submit(i) for i in range(5)]
+        time.sleep(0.05)
+        release.set()
+        assert first.result(2) == "a"
+        assert [f.result(2) for f in rest] == list(range(5))
+        assert sizes == [1, 5]
+    finally:
+        b.close()
+
+def test_async_commentators_are_batched(monkeypatch):
+    class Endpoint:
+        def __init__(self):
+            self.batches = []
+
+        def predict(self, instances=None):
+            self.batches.append(len(instances))
+            return type("Response", (), {"predictions": [f"Roast {i}<end_of_turn>" for i in range(len(instances))]})()
+
+    endpoint = Endpoint()
+    monkeypatch.setenv("VERTEX_ENDPOINT_ID", "batch-test")
+    monkeypatch.setattr(batcher, "get_vertex_endpoint", lambda _: endpoint)
+    batcher.set_vertex_batcher("batch-test", MicroBatcher("vertex", batcher._vertex_predict("batch-test"), max_size=3, max_delay=0.05))
+
+    async def main():
+        states = [{"final_results": {"winner": name}, "match_commentary": []} for name in ("Ravi", "Nilay", "Sam")]
+        return await asyncio.gather(*[commentator.commentator_node_async(s) for s in states])
+
+    try:
+        states = asyncio.run(main())
+        assert [s["final_results"]["sarcastic_summary"] for s in states] == ["Roast 0", "Roast 1", "Roast 2"]
+        assert endpoint.batches == [3]
+    finally:
+        batcher.set_vertex_batcher("batch-test", None)
@@ -0,0 +1,207 @@
+import asyncio
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from agents import scraper
+from agents.cache import LRUCache, SQLiteCache, TieredCache, SingleFlight
+
+def test_lru_cache_evicts_oldest_and_expires():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")          # "b" is now least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    cache.set("short", "x", ttl=0.05)
+    time.sleep(0.1)
+    assert cache.get("short") is None
+
+def test_sqlite_tier_survives_a_fresh_memory_tier(tmp_path):
+    db = str(tmp_path / "cache.db")
+    TieredCache(LRUCache(), SQLiteCache(db)).set("k", {"T1-1": 35}, ttl=60)
+
+    reopened = TieredCache(LRUCache(), SQLiteCache(db))
+    assert reopened.get("k") == {"T1-1": 35}
+    assert reopened.memory.get("k") == {"T1-1": 35}
+
+def test_single_flight_runs_once_for_concurrent_callers():
+    flight = SingleFlight()
+    calls = []
+    gate = threading.Event()
+
+    def slow_fetch():
+        calls.append(1)
+        gate.wait(1)
+        return "scores"
+
+    with ThreadPoolExecutor(5) as pool:
+        futures = [pool.submit(flight.do, "match", slow_fetch) for _ in range(5)]
+        time.sleep(0.1)
+        gate.set()
+        results = [f.result() for f in futures]
+
+    assert results == ["scores"] * 5
+    assert len(calls) == 1
+
+def test_single_flight_survives_a_cancelled_leader():
+    """Cancelling the caller that started a flight must not fail the callers sharing it."""
+    flight = SingleFlight()
+    runs = []
+
+    async def fetch():
+        runs.append(1)
+        await asyncio.sleep(0.1)
+        return "scores"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.ado("match", fetch))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(flight.ado("match", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await follower == "scores"
+
+        # Alone, a cancelled leader stops the work and the next caller starts over.
+        alone = asyncio.ensure_future(flight.ado("other", fetch))
+        await asyncio.sleep(0.01)
+        alone.cancel()
+        await asyncio.sleep(0)
+        assert await flight.ado("other", fetch) == "scores"
+
+    asyncio.run(main())
+    assert len(runs) == 3
+
+def test_scraper_node_serves_cached_scrape(monkeypatch):
+    scraper.set_scrape_cache(TieredCache(LRUCache()))
+    try:
+        scraper.get_scrape_cache().set("m|c", {"match_scores": {"T1-1": 35}, "match_commentary": ["RESULT: won by 7 wickets"]})
+        monkeypatch.setattr(scraper, "get_browser_pool", lambda: (_ for _ in ()).throw(AssertionError("browser used")))
+
+        result = scraper.scraper_node({"match_url": "m", "commentary_url": "c", "final_results": {}})
+        assert result["match_scores"] == {"T1-1": 35}
+        assert scraper.is_match_finished(result["match_commentary"])
+    finally:
+        scraper.set_scrape_cache(None)
+
+class _LoopPool:
+    """Runs browser jobs on the caller's loop, without a page."""
+
+    async def arun(self, job):
+        return await job(None)
+
+def test_scraper_node_async_returns_scores_before_commentary(monkeypatch):
+    async def fetch_pages(page, match_url, commentary_url, on_scorecard=None):
+        on_scorecard(None, {"T1-1": 35})
+        await asyncio.sleep(0.3)
+        return None, {"T1-1": 35}, ["RESULT: won by 7 wickets"]
+
+    monkeypatch.setattr(scraper, "_fetch_pages", fetch_pages)
+    monkeypatch.setattr(scraper, "get_browser_pool", lambda: _LoopPool())
+    scraper.set_scrape_cache(TieredCache(LRUCache()))
+
+    async def main():
+        started = time.monotonic()
+        state = await scraper.scraper_node_async({"match_url": "m", "commentary_url": "c", "final_results": {}})
+        scores_after = time.monotonic() - started
+        assert state["match_scores"] == {"T1-1": 35}
+        assert state["match_commentary"] == []
+
+        state = await scraper.resolve_commentary(state)
+        assert scores_after < 0.2
+        assert "pending_commentary" not in state
+        assert state["match_commentary"] == ["RESULT: won by 7 wickets"]
+
+    try:
+        asyncio.run(main())
+        # The whole scrape is cached once the commentary is in.
+        assert scraper.get_scrape_cache().get("m|c")["match_commentary"] == ["RESULT: won by 7 wickets"]
+    finally:
+        scraper.set_scrape_cache(None)
+
+def test_split_scrape_is_shared_until_its_commentary_is_cached(monkeypatch):
+    fetches = []
+
+    async def fetch_pages(page, match_url, commentary_url, on_scorecard=None):
+        fetches.append(match_url)
+        on_scorecard(None, {"T1-1": 35})
+        await asyncio.sleep(0.2)
+        return None, {"T1-1": 35}, ["RESULT: won by 7 wickets"]
+
+    monkeypatch.setattr(scraper, "_fetch_pages", fetch_pages)
+    monkeypatch.setattr(scraper, "get_browser_pool", lambda: _LoopPool())
+    scraper.set_scrape_cache(TieredCache(LRUCache()))
+
+    async def main():
+        first = await scraper.scraper_node_async({"match_url": "m", "commentary_url": "c", "final_results": {}})
+        # Scores are back but the commentary isn't: the flight is over and the cache is still empty.
+        second = await scraper.scraper_node_async({"match_url": "m", "commentary_url": "c", "final_results": {}})
+        for state in (first, second):
+            await scraper.resolve_commentary(state)
+        return first, second
+
+    try:
+        first, second = asyncio.run(main())
+        assert fetches == ["m"]
+        assert first["match_commentary"] == second["match_commentary"] == ["RESULT: won by 7 wickets"]
+        assert scraper._split_inflight == {}
+        assert scraper.get_scrape_cache().get("m|c")["match_scores"] == {"T1-1": 35}
+    finally:
+        scraper.set_scrape_cache(None)
+
+def test_slow_commentary_falls_back_after_its_own_timeout(monkeypatch):
+    async def fetch_pages(page, match_url, commentary_url, on_scorecard=None):
+        on_scorecard(None, {"T1-1": 35})
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(scraper, "_fetch_pages", fetch_pages)
+    monkeypatch.setattr(scraper, "get_browser_pool", lambda: _LoopPool())
+    monkeypatch.setattr(scraper, "COMMENTARY_TIMEOUT", 0.1)
+    scraper.set_scrape_cache(TieredCache(LRUCache()))
+
+    async def main():
+        state = await scraper.scraper_node_async({"match_url": "m", "commentary_url": "c", "final_results": {}})
+        return await scraper.resolve_commentary(state)
+
+    try:
+        started = time.monotonic()
+        state = asyncio.run(main())
+        assert time.monotonic() - started < 1
+        assert state["match_scores"] == {"T1-1": 35}
+        assert state["match_commentary"] == scraper.COMMENTARY_FALLBACK
+    finally:
+        scraper.set_scrape_cache(None)
+
+def test_vision_node_retry_skips_gemini(monkeypatch):
+    from agents import vision
+
+    calls = []
+    class FakeModels:
+        def generate_content(self, **kwargs):
+            calls.append(kwargs["model"])
+            return type("Response", (), {"text": '{"Ravi": ["T1-1"]}'})()
+    fake_client = type("Client", (), {"models": FakeModels()})()
+
+    vision.set_mapping_cache(TieredCache(LRUCache()))
+    monkeypatch.setattr(vision, "get_client", lambda: fake_client)
+    try:
+        first = vision.vision_node({"image_bytes": [b"img-1", b"img-2"], "final_results": {}})
+        retry = vision.vision_node({"image_bytes": [b"img-1", b"img-2"], "final_results": {}})
+        reordered = vision.vision_node({"image_bytes": [b"img-2", b"img-1"], "final_results": {}})
+
+        assert first["player_mappings"] == retry["player_mappings"] == reordered["player_mappings"] == {"Ravi": ["T1-1"]}
+        assert len(calls) == 2   # the reordered upload is a different key
+        assert vision.get_mapping_cache().stats()["hits"] == 1
+        # Screenshots are let go once vision has them.
+        assert first["image_bytes"] == retry["image_bytes"] == []
+
+        # Digests taken at upload time key the cache without re-hashing the bytes.
+        digests = ["a" * 64, "b" * 64]
+        vision.vision_node({"image_bytes": [b"img-3"], "image_digests": digests, "final_results": {}})
+        vision.vision_node({"image_bytes": [b"img-3"], "image_digests": digests, "final_results": {}})
+        assert len(calls) == 3
+    finally:
+        vision.set_mapping_cache(None)
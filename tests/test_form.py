@@ -0,0 +1,57 @@
+import time
+import pytest
+
+from agents.form import FormBook, FormStats, load_form_history
+from agents.store import ResultsStore
+
+def test_rolling_stats_are_incremental():
+    stats = FormStats()
+    for runs in (10, 20, 30, 40):
+        stats.update(runs)
+
+    assert stats.n == 4
+    assert stats.mean == 25
+    assert stats.m2 / (stats.n - 1) == 500 / 3  # sample variance via Welford
+    assert stats.ewma == pytest.approx(24.67)     # 10 -> 13 -> 18.1 -> 24.67 with alpha 0.3
+    assert list(stats.recent) == [10, 20, 30, 40]
+
+def test_ingest_is_idempotent_per_match():
+    book = FormBook()
+    assert book.ingest("m1", {"T1-1": 50})
+    assert not book.ingest("m1", {"T1-1": 50})
+    assert book.get("T1-1").n == 1
+
+def test_history_outweighs_a_one_off_score():
+    book = FormBook()
+    for i in range(6):
+        book.ingest(f"m{i}", {"T1-1": 60 + i, "T1-2": 5})
+
+    forecast = book.forecast({"T1-1": 30, "T1-2": 45})
+
+    # T1-2's 45 is an outlier against its history; the consistent opener is the better buy.
+    assert forecast["hot_pick"] == "T1-1"
+    assert forecast["confidence"] > 0.5
+    assert forecast["ranked"][0]["matches"] == 6
+
+def test_forecast_is_served_from_aggregates_quickly():
+    book = FormBook()
+    codes = [f"T{t}-{p}" for t in (1, 2) for p in range(1, 12)]
+    for i in range(500):
+        book.ingest(f"m{i}", {code: (i * 7 + n) % 90 for n, code in enumerate(codes)})
+    current = {code: n for n, code in enumerate(codes)}
+
+    started = time.perf_counter()
+    for _ in range(100):
+        book.forecast(current)
+    # Generous bound for slow CI; typically ~0.1 ms per call.
+    assert (time.perf_counter() - started) / 100 < 0.005
+
+def test_form_history_loads_only_finished_matches(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    data = {"winner": "Ravi", "leaderboard": {"Ravi": 10}, "detailed_scores": {"T1-1": 10}}
+    store.save_settlement("https://example.com/live", "office", data)
+    store.save_settlement("https://example.com/done", "office", data, finished=True)
+
+    book = FormBook()
+    assert load_form_history(store, book) == 1
+    assert book.stats() == {"matches": 1, "codes": 1}
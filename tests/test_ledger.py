@@ -0,0 +1,52 @@
+import random
+
+from agents.auditor import auditor_node
+from agents.ledger import settle_match, settle_season, minimise_transfers
+
+CODES = [f"T{team}-{pos}" for team in (1, 2) for pos in range(1, 12)]
+
+def audit(mappings, scores):
+    state = {"player_mappings": mappings, "match_scores": scores, "final_results": {}}
+    return auditor_node(state)["final_results"]
+
+def test_single_match_matches_auditor_node_exactly():
+    rng = random.Random(7)
+    for _ in range(300):
+        # Small score ranges force ties; duplicate and unknown codes are allowed.
+        mappings = {
+            f"P{rng.randint(0, 20)}": [rng.choice(CODES + ["T9-9"]) for _ in range(rng.randint(0, 3))]
+            for _ in range(rng.randint(1, 10))
+        }
+        scores = {code: rng.randint(0, 15) for code in rng.sample(CODES, rng.randint(1, 22))}
+
+        # repr() also catches int/float differences, e.g. 3 vs 3.0.
+        assert repr(settle_match(mappings, scores)) == repr(audit(mappings, scores))
+
+def test_missing_data_matches_auditor_node():
+    assert settle_match({}, {"T1-1": 5}) == audit({}, {"T1-1": 5}) == {"error": "Missing data."}
+
+def test_season_balances_and_net_transfers():
+    mappings = {"Ravi": ["T1-1"], "Nilay": ["T1-2"], "Sam": ["T1-3"]}
+    season = [
+        (mappings, {"T1-1": 50, "T1-2": 40, "T1-3": 0}),   # Ravi wins: Nilay owes 2.0, Sam owes 10.0
+        ({}, {}),                                         # Skipped, like auditor_node's error
+        (mappings, {"T1-1": 10, "T1-2": 60, "T1-3": 10}),  # Nilay wins: Ravi owes 10.0, Sam owes 10.0
+    ]
+    ledger = settle_season(season)
+
+    assert [r.get("winner") for r in ledger.results] == ["Ravi", None, "Nilay"]
+    assert ledger.balances == {"Ravi": 2.0, "Nilay": 18.0, "Sam": -20.0}
+
+    transfers = ledger.transfers()
+    assert sorted((t["from"], t["to"], t["amount_gbp"]) for t in transfers) == [("Sam", "Nilay", 18.0), ("Sam", "Ravi", 2.0)]
+
+def test_minimise_transfers_squares_everyone():
+    balances = {"A": 12.5, "B": -7.25, "C": -5.25, "D": 0.0}
+    transfers = minimise_transfers(balances)
+
+    net = dict.fromkeys(balances, 0.0)
+    for t in transfers:
+        net[t["from"]] += t["amount_gbp"]
+        net[t["to"]] -= t["amount_gbp"]
+    assert all(abs(net[name] + balances[name]) < 1e-9 for name in balances)
+    assert len(transfers) == 2
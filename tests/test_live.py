@@ -0,0 +1,100 @@
+import random
+import asyncio
+
+from agents import live
+from agents.auditor import build_leaderboard, settle_leaderboard
+from agents.jobs import Job
+
+MAPPINGS = {"Ravi": ["T1-1", "T2-3"], "Nilay": ["T1-2", "T1-2"], "Sam": ["T2-1"]}
+
+def test_incremental_totals_match_a_full_recompute():
+    rng = random.Random(3)
+    board = live.LiveLeaderboard(MAPPINGS)
+    scores = {}
+    for _ in range(50):
+        code = rng.choice(["T1-1", "T1-2", "T2-1", "T2-3", "T2-9"])
+        scores[code] = scores.get(code, 0) + rng.choice([0, 1, 4, 6])
+        board.apply(dict(scores))
+        assert board.totals == build_leaderboard(MAPPINGS, scores)
+        assert board.results() == settle_leaderboard(build_leaderboard(MAPPINGS, scores))
+
+def test_tracker_pushes_only_changes_and_roasts_on_events(monkeypatch):
+    snapshots = [
+        ({"T1-1": 10, "T1-2": 5}, []),
+        ({"T1-1": 10, "T1-2": 5}, []),                # no change: no event
+        ({"T1-1": 10, "T1-2": 30}, []),               # Nilay (T1-2 twice) takes the lead
+        ({"T1-1": 55, "T1-2": 30}, ["RESULT: India won by 4 runs"]),
+    ]
+    roasts = []
+
+    async def fake_scrape(match_url, commentary_url):
+        scores, commentary = snapshots.pop(0)
+        return {"match_scores": dict(scores), "match_commentary": commentary}
+
+    async def fake_commentator(state):
+        roasts.append(state["final_results"]["winner"])
+        state["final_results"]["sarcastic_summary"] = "roast"
+        return state
+
+    async def fake_intelligence(state, on_stage=None):
+        state["final_results"]["analysis"] = "done"
+        return state
+
+    async def fake_vision(state):
+        state["player_mappings"] = MAPPINGS
+        return state
+
+    monkeypatch.setattr(live, "scrape_fresh_async", fake_scrape)
+    monkeypatch.setattr(live, "commentator_node_async", fake_commentator)
+    monkeypatch.setattr(live, "run_intelligence_layer_async", fake_intelligence)
+    monkeypatch.setattr(live, "LIVE_COMMENTARY_MIN_GAP", 0)
+
+    async def track():
+        job = Job("live")
+        tracker = live.LiveTracker(job)
+        tracker.interval = 0
+        state = {"match_url": "m", "commentary_url": "c", "final_results": {}}
+        await tracker.run(state, fake_vision)
+        return job, tracker
+
+    job, tracker = asyncio.run(track())
+
+    stages = [e["event"] for e in job.events]
+    assert stages.count("leaderboard") == 3
+    assert roasts == ["Nilay"]  # the final poll ends the match, which goes to the full layer instead
+    assert job.status == "succeeded"
+    assert job.result["finished"] is True and job.result["winner"] == "Nilay"
+    assert job.result["analysis"] == "done"
+    assert tracker.stats() == {"polls": 4, "updates": 3, "commentary_runs": 1}
+
+def test_players_for_lists_every_holder():
+    board = live.LiveLeaderboard(MAPPINGS)
+    assert board.players_for(["T1-2", "T2-3", "T9-9"]) == ["Nilay", "Ravi"]
+
+def test_tracker_fails_without_mappings_or_scores(monkeypatch):
+    async def fake_scrape(match_url, commentary_url):
+        return {"match_scores": {}, "match_commentary": []}
+
+    async def no_mappings(state):
+        state["player_mappings"] = {}
+        return state
+
+    async def fake_vision(state):
+        state["player_mappings"] = MAPPINGS
+        return state
+
+    monkeypatch.setattr(live, "scrape_fresh_async", fake_scrape)
+    monkeypatch.setattr(live, "LIVE_MAX_FAILURES", 2)
+
+    async def track(vision):
+        job = Job("live")
+        tracker = live.LiveTracker(job)
+        tracker.interval = 0
+        await tracker.run({"match_url": "m", "commentary_url": "c", "final_results": {}}, vision)
+        return job
+
+    for vision in (no_mappings, fake_vision):
+        job = asyncio.run(track(vision))
+        assert job.status == "failed"
+        assert "Missing data." in job.error
+        assert "leaderboard" not in [e["event"] for e in job.events]
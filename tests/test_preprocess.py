@@ -0,0 +1,50 @@
+import io
+import asyncio
+from PIL import Image, ImageDraw
+
+from agents import preprocess
+
+def make_screenshot(width=1170, height=2532, fmt="PNG"):
+    """A phone-sized screenshot: white margins around a noisy 'player list' block."""
+    img = Image.new("RGB", (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    for y in range(200, height - 200, 40):
+        draw.text((100, y), f"Player {y} - T1-{y % 11} T2-{y % 7}", fill=(0, 0, 0))
+    out = io.BytesIO()
+    img.save(out, format=fmt)
+    return out.getvalue()
+
+def test_detect_mime_type_reads_real_format():
+    assert preprocess.detect_mime_type(make_screenshot(fmt="PNG")) == "image/png"
+    assert preprocess.detect_mime_type(make_screenshot(fmt="JPEG")) == "image/jpeg"
+    assert preprocess.detect_mime_type(make_screenshot(fmt="GIF")) is None
+
+def test_unsupported_formats_are_always_reencoded():
+    # A tiny GIF beats its JPEG re-encode on size, but Gemini must not get GIF bytes labelled JPEG.
+    gif = make_screenshot(40, 40, fmt="GIF")
+    data, mime = preprocess.preprocess_image(gif)
+    assert mime == "image/jpeg"
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.format == "JPEG"
+
+def test_preprocess_downscales_and_reports_savings(monkeypatch):
+    monkeypatch.setattr(preprocess, "MAX_DIM", 1024)
+    original = make_screenshot()
+
+    images, mimes, stats = preprocess.preprocess_images([original], stitch=False)
+
+    with Image.open(io.BytesIO(images[0])) as img:
+        assert max(img.size) <= 1024
+    assert mimes == ["image/jpeg"]
+    assert stats["bytes_saved"] == len(original) - len(images[0]) > 0
+
+def test_stitch_produces_one_image():
+    shots = [make_screenshot(600, 1200) for _ in range(3)]
+    images, mimes, stats = asyncio.run(preprocess.preprocess_images_async(shots, stitch=True))
+
+    assert len(images) == 1 and mimes == ["image/jpeg"]
+    assert stats["images_in"] == 3 and stats["images_out"] == 1
+
+def test_unreadable_upload_passes_through():
+    images, mimes, _ = preprocess.preprocess_images([b"not an image"], stitch=False)
+    assert images == [b"not an image"]
@@ -0,0 +1,49 @@
+from agents import clients, scraper, limits
+from agents.scraper import set_scrape_cache
+from agents.vision import set_mapping_cache
+
+def test_replay_benchmark_runs_offline(monkeypatch):
+    # Everything the harness patches is restored at teardown.
+    monkeypatch.setenv("RESULTS_DB", "")
+    monkeypatch.setenv("VERTEX_ENDPOINT_ID", "bench-endpoint")
+    monkeypatch.setattr(scraper, "_fetch_pages", scraper._fetch_pages)
+    monkeypatch.setattr(scraper, "get_browser_pool", scraper.get_browser_pool)
+    monkeypatch.setattr(clients, "_genai_client", None)
+    monkeypatch.setattr(clients, "_vertex_endpoints", {})
+
+    from benchmarks.fakes import LatencyProfile
+    from benchmarks.replay import run_benchmark
+
+    try:
+        report = run_benchmark(mode="workflow", requests=4, concurrency=(2,), scraper="http",
+                               genai=LatencyProfile(), vertex=LatencyProfile(), memory=False)
+    finally:
+        set_scrape_cache(None)
+        set_mapping_cache(None)
+
+    level = report["levels"][0]
+    assert level["failed"] == 0
+    assert level["latency"]["count"] == 4
+    assert {"vision", "scraper", "auditor"} <= set(level["stages"])
+    assert report["injected"] == {"genai_errors": 0, "vertex_errors": 0}
+
+def test_async_levels_share_one_loop_past_the_scraper_limit(monkeypatch):
+    monkeypatch.setenv("RESULTS_DB", "")
+    monkeypatch.setenv("VERTEX_ENDPOINT_ID", "bench-endpoint")
+    monkeypatch.setattr(scraper, "_fetch_pages", scraper._fetch_pages)
+    monkeypatch.setattr(scraper, "get_browser_pool", scraper.get_browser_pool)
+    monkeypatch.setattr(clients, "_genai_client", None)
+    monkeypatch.setattr(clients, "_vertex_endpoints", {})
+    monkeypatch.setitem(limits.STAGE_LIMITS, "scraper", 1)
+
+    from benchmarks.fakes import LatencyProfile
+    from benchmarks.replay import run_benchmark
+
+    try:
+        report = run_benchmark(mode="async", requests=4, concurrency=(3, 3), scraper="http",
+                               genai=LatencyProfile(), vertex=LatencyProfile(), page=LatencyProfile(20), memory=False)
+    finally:
+        set_scrape_cache(None)
+        set_mapping_cache(None)
+
+    assert [level["failed"] for level in report["levels"]] == [0, 0]
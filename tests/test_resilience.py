@@ -0,0 +1,131 @@
+import time
+import asyncio
+import pytest
+
+from agents import resilience, commentator, batcher
+from agents.resilience import Policy, CircuitBreaker, CircuitOpen, DeadlineExceeded, remaining_deadline
+
+class Flaky:
+    def __init__(self, failures, error=RuntimeError("boom")):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return "ok"
+
+def test_retries_transient_failures_then_succeeds():
+    flaky = Flaky(2)
+    policy = Policy("test", deadline=5, retries=2, backoff=0)
+    assert policy.call(flaky) == "ok"
+    assert flaky.calls == 3
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+
+def test_client_errors_are_not_retried():
+    error = RuntimeError("bad request")
+    error.code = 400
+    flaky = Flaky(5, error)
+    with pytest.raises(RuntimeError):
+        Policy("test", deadline=5, retries=3, backoff=0).call(flaky)
+    assert flaky.calls == 1
+
+def test_breaker_opens_rejects_then_recovers_after_a_trial_call():
+    now = [0.0]
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    policy = Policy("test", deadline=5, retries=0, breaker=breaker)
+    flaky = Flaky(2)
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            policy.call(flaky)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpen):
+        policy.call(flaky)
+    assert flaky.calls == 2   # rejected without touching the dependency
+
+    now[0] = 11
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert policy.call(flaky) == "ok"
+    assert breaker.stats()["state"] == "closed"
+    assert breaker.stats()["times_opened"] == 1
+
+def test_breaker_counts_calls_not_attempts_and_ignores_client_errors():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10)
+    policy = Policy("test", deadline=5, retries=3, backoff=0, breaker=breaker)
+
+    # Four failed attempts, one failed call.
+    with pytest.raises(RuntimeError):
+        policy.call(Flaky(4))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    bad_request = RuntimeError("bad request")
+    bad_request.code = 400
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            policy.call(Flaky(1, bad_request))
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()["consecutive_failures"] == 1
+
+def test_cancelled_trial_call_does_not_wedge_the_breaker():
+    now = [0.0]
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    policy = Policy("test", deadline=60, retries=0, breaker=breaker)
+    with pytest.raises(RuntimeError):
+        policy.call(Flaky(1))
+
+    async def hang():
+        await asyncio.sleep(10)
+
+    async def ok():
+        return "ok"
+
+    now[0] = 11
+    # The trial call is cut off from outside, like the intelligence layer's wait_for.
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(asyncio.wait_for(policy.acall(hang), 0.05))
+    assert asyncio.run(policy.acall(ok)) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_sync_calls_see_their_remaining_deadline():
+    assert remaining_deadline() is None
+    left = Policy("test", deadline=2, retries=0).call(remaining_deadline)
+    assert 0 < left <= 2
+
+def test_async_deadline_cuts_off_a_hung_call():
+    async def hang():
+        await asyncio.sleep(10)
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(Policy("test", deadline=0.1, retries=2, backoff=0).acall(hang))
+    assert time.monotonic() - started < 1
+
+def test_hedged_request_wins_when_the_first_is_slow():
+    calls = []
+
+    async def call():
+        calls.append(len(calls))
+        await asyncio.sleep(2 if len(calls) == 1 else 0.01)
+        return f"attempt {len(calls)}"
+
+    started = time.monotonic()
+    result = asyncio.run(Policy("test", deadline=5, retries=0, hedge_after=0.05).acall(call))
+    assert result == "attempt 2"
+    assert time.monotonic() - started < 1
+
+def test_open_breaker_sends_commentator_straight_to_fallback(monkeypatch):
+    breaker = CircuitBreaker("vertex", failure_threshold=1)
+    breaker.record_failure()
+    resilience.set_policy("vertex", Policy("vertex", breaker=breaker))
+    monkeypatch.setenv("VERTEX_ENDPOINT_ID", "123")
+    monkeypatch.setattr(batcher, "get_vertex_endpoint", lambda _: pytest.fail("endpoint should not be called"))
+    try:
+        state = commentator.commentator_node({"final_results": {"winner": "Ravi"}, "match_commentary": []})
+        assert state["final_results"]["sarcastic_summary"] == "Ravi won."
+    finally:
+        resilience.set_policy("vertex", None)
+        batcher.set_vertex_batcher("123", None)
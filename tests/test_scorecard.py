@@ -0,0 +1,27 @@
+import os
+import pytest
+
+from agents.scorecard import parse_scorecard, parse_scorecard_legacy
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "scorecard.html")
+
+@pytest.fixture
+def scorecard_html():
+    with open(FIXTURE, encoding="utf-8") as f:
+        return f.read()
+
+def test_parses_both_batting_innings_from_fixture(scorecard_html):
+    scores = parse_scorecard(scorecard_html)
+
+    # Extras, Total and Did-not-bat rows are skipped; bowling and fall-of-wickets tables too.
+    assert scores == {
+        "T1-1": 45, "T1-2": 0, "T1-3": 71, "T1-4": 12, "T1-5": 23, "T1-6": 3,
+        "T2-1": 28, "T2-2": 9, "T2-3": 52, "T2-4": 31, "T2-5": 14,
+    }
+
+def test_matches_legacy_parser(scorecard_html):
+    assert parse_scorecard(scorecard_html) == parse_scorecard_legacy(scorecard_html)
+
+def test_handles_empty_and_unrelated_pages():
+    assert parse_scorecard("") == {}
+    assert parse_scorecard("<html><body><p>Match starts soon</p></body></html>") == {}
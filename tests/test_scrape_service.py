@@ -0,0 +1,96 @@
+import os
+import time
+import asyncio
+import pytest
+
+from agents import scrape_service
+from agents.scrape_service import ScrapeService, ScrapeError, WorkerCrashed
+
+def fake_fetch(match_url, commentary_url, timeout=None):
+    """Stands in for a browser scrape inside the worker processes."""
+    if "crash" in match_url:
+        os._exit(1)
+    if "hang" in match_url:
+        time.sleep(60)
+    if "slow" in match_url:
+        time.sleep(1)
+    if "fail" in match_url:
+        raise RuntimeError("page did not load")
+    return {"T1-1": len(match_url)}, [f"RESULT: pid {os.getpid()}"]
+
+@pytest.fixture
+def service():
+    svc = ScrapeService(workers=2, concurrency=2, job_timeout=5, max_jobs=3, fetch=fake_fetch).start()
+    try:
+        yield svc
+    finally:
+        svc.close()
+
+def test_jobs_run_in_worker_processes_and_workers_are_recycled(service):
+    async def scrape_all():
+        return await asyncio.gather(*[service.afetch(f"https://m/{i}", "c") for i in range(10)])
+
+    results = asyncio.run(scrape_all())
+    assert [scores["T1-1"] for scores, _ in results] == [len(f"https://m/{i}") for i in range(10)]
+    assert all(str(os.getpid()) not in commentary[0] for _, commentary in results)
+
+    # 10 jobs at 3 per worker means workers were retired and replaced along the way.
+    for _ in range(50):
+        if service.stats()["recycled"] >= 2:
+            break
+        time.sleep(0.1)
+    assert service.stats()["recycled"] >= 2
+    assert service.fetch("https://m/after", "c", timeout=30)[0] == {"T1-1": len("https://m/after")}
+
+def test_job_errors_and_crashes_fail_only_their_job(service):
+    with pytest.raises(ScrapeError, match="page did not load"):
+        service.fetch("https://fail", "c", timeout=30)
+
+    with pytest.raises(WorkerCrashed):
+        service.fetch("https://crash", "c", timeout=30)
+    assert service.fetch("https://m/ok", "c", timeout=30)[0] == {"T1-1": len("https://m/ok")}
+    assert service.stats()["crashed"] == 1
+
+def test_cancelled_fetch_does_not_break_the_service(service):
+    async def give_up():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(service.afetch("https://slow", "c"), 0.2)
+
+    asyncio.run(give_up())
+    # The worker answers after the caller is gone; the result collector must shrug that off.
+    time.sleep(1.5)
+    assert all(thread.is_alive() for thread in service._threads)
+    assert service.fetch("https://m/ok", "c", timeout=30)[0] == {"T1-1": len("https://m/ok")}
+
+def test_fetch_timeout_gives_up_the_queued_job():
+    svc = ScrapeService(workers=1, concurrency=1, job_timeout=5, fetch=fake_fetch).start()
+    try:
+        busy = svc.submit("https://slow", "c")
+        with pytest.raises(TimeoutError):
+            svc.fetch("https://m/queued", "c", timeout=0.2)
+        assert len(svc._pending) == 1
+        # The timed-out job never reaches a worker; the next one runs straight after the slow one.
+        assert busy.result(timeout=30)[0] == {"T1-1": len("https://slow")}
+        assert svc.stats()["backlog"] == 0
+        assert svc.fetch("https://m/ok", "c", timeout=30)[0] == {"T1-1": len("https://m/ok")}
+        assert svc._pending == {}
+    finally:
+        svc.close()
+
+def test_hung_worker_is_killed_and_replaced(monkeypatch):
+    monkeypatch.setattr(scrape_service, "SCRAPE_HUNG_GRACE", 0)
+    svc = ScrapeService(workers=1, concurrency=1, job_timeout=0.5, fetch=fake_fetch).start()
+    try:
+        with pytest.raises(WorkerCrashed):
+            svc.fetch("https://hang", "c", timeout=30)
+        assert svc.stats()["hung"] == 1
+        assert svc.fetch("https://m/ok", "c", timeout=30)[0] == {"T1-1": len("https://m/ok")}
+    finally:
+        svc.close()
+
+def test_remote_service_needs_an_authkey(monkeypatch):
+    monkeypatch.setattr(scrape_service, "SCRAPE_SERVICE_AUTHKEY", None)
+    with pytest.raises(ScrapeError, match="SCRAPE_SERVICE_AUTHKEY"):
+        scrape_service.RemoteScrapeService()
+    with pytest.raises(SystemExit):
+        scrape_service.main([])
@@ -0,0 +1,25 @@
+import os
+import sys
+import subprocess
+
+from benchmarks.startup import parse_importtime
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+HEAVY = ("google.cloud.aiplatform", "google.genai", "playwright", "bs4")
+
+def test_importing_api_leaves_heavy_sdks_unloaded():
+    check = "import sys, api; print(','.join(m for m in %r if m in sys.modules))" % (HEAVY,)
+    env = dict(os.environ, RESULTS_DB="")
+    result = subprocess.run([sys.executable, "-c", check], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1:] in ([], [""])
+
+def test_parse_importtime():
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 |   _io",
+        "import time:      2500 |    3100000 | google.cloud.aiplatform",
+        "something else entirely",
+    ])
+    assert parse_importtime(stderr) == {"_io": (120, 120), "google.cloud.aiplatform": (2500, 3100000)}
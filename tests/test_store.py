@@ -0,0 +1,57 @@
+from agents.store import ResultsStore, match_id_from_url, get_results_store, set_results_store
+
+URL = "https://www.espncricinfo.com/series/ipl-2024-1410320/csk-vs-rcb-1st-match-1422119/full-scorecard"
+
+def settlement(winner, leaderboard, settlements, pot):
+    return {
+        "winner": winner,
+        "winner_score": leaderboard[winner],
+        "total_pot": pot,
+        "leaderboard": leaderboard,
+        "settlements": settlements,
+        "player_mappings": {player: [f"T1-{i}"] for i, player in enumerate(leaderboard, 1)},
+        "detailed_scores": {f"T1-{i}": runs for i, runs in enumerate(leaderboard.values(), 1)},
+    }
+
+def test_match_id_prefers_cricinfo_id():
+    assert match_id_from_url(URL) == "1422119"
+    assert match_id_from_url("https://example.com/some/match") == match_id_from_url("https://example.com/some/match ")
+
+def test_persistence_is_off_unless_configured(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("RESULTS_DB", raising=False)
+    set_results_store(None)
+    try:
+        assert get_results_store() is None
+        assert list(tmp_path.iterdir()) == []
+    finally:
+        set_results_store(None)
+
+def test_store_serves_history_and_season_totals(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    first = settlement("Ravi", {"Ravi": 50, "Nilay": 40}, {"Nilay": 2.0}, 2.0)
+    store.save_settlement(URL, "office", first, trace_id="t1")
+    store.save_settlement(URL.replace("1422119", "1422120"), "office",
+                          settlement("Nilay", {"Ravi": 10, "Nilay": 60}, {"Ravi": 10.0}, 10.0))
+    store.save_settlement(URL, "family", first)
+
+    assert store.get_settlement("1422119", "office")["data"] == first
+    assert store.get_settlement("1422119", "nope") is None
+    assert [s["league"] for s in store.list_settlements("office")] == ["office", "office"]
+    assert store.match_scores("1422119") == {"T1-1": 50, "T1-2": 40}
+
+    totals = {row["player"]: row for row in store.season_totals("office")}
+    assert totals["Nilay"]["net_gbp"] == 8.0 and totals["Nilay"]["wins"] == 1
+    assert totals["Ravi"]["net_gbp"] == -8.0 and totals["Ravi"]["runs"] == 60
+
+    history = store.player_history("Ravi", league="office")
+    assert [h["match_id"] for h in history] == ["1422120", "1422119"]
+    assert history[1]["is_winner"] is True
+
+def test_resettling_a_match_replaces_it(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    store.save_settlement(URL, "office", settlement("Ravi", {"Ravi": 20, "Nilay": 10}, {"Nilay": 2.0}, 2.0))
+    store.save_settlement(URL, "office", settlement("Nilay", {"Ravi": 20, "Nilay": 45}, {"Ravi": 5.0}, 5.0))
+
+    assert store.stats() == {"settlements": 1, "matches": 1}
+    assert {row["player"]: row["net_gbp"] for row in store.season_totals("office")} == {"Nilay": 5.0, "Ravi": -5.0}